@@ -0,0 +1,119 @@
+"""
+Benchmark for the bitmap index of QueryOlxFacts.py
+Answers filtered report queries over FactOfferSnapshot twice, once scanning
+the key columns of every fact (ColumnarFacts.fact_filter) and once ANDing and
+ORing the roaring bitmaps of a BitmapIndex, at several fact counts, and checks
+that both paths give the same rows. The facts are sampled with replacement
+from the real star schema to reach each count.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from GenerateOlxHousePrice import parse_count
+from ImportOlxHousePrice import (
+    BACKENDS, CSV_FILE, DEFAULT_BACKEND, DEFAULT_COLUMNAR_BACKEND, DEFAULT_DATABASE, DEFAULT_SERVER,
+    StarSchemaBuilder, fits_column_types, get_backend, new_import_stats, np, read_and_convert,
+)
+from QueryOlxFacts import BitmapIndex, ColumnarFacts, read_database, read_star_dir, timed
+
+DEFAULT_COUNTS = "63k,1M,10M"
+
+# (label, where, grouped by): slicers of the reports and the Olx Offers Snapshot cube
+QUERIES = [
+    ("Region: Masovia by rooms", {("DimLocation", "Region"): ["Masovia"]}, ("DimProperty", "RoomsCategory")),
+    ("Region: Masovia, Silesia; primary by month",
+     {("DimLocation", "Region"): ["Masovia", "Silesia"], ("DimMarket", "MarketLabel"): ["primary"]},
+     ("DimDate", "Label")),
+    ("Private; 4+ rooms; Greater Poland by city",
+     {("DimOffer", "OfferType"): ["Private"], ("DimProperty", "RoomsCategory"): ["4+"],
+      ("DimLocation", "Region"): ["Greater Poland"]},
+     ("DimLocation", "City")),
+    ("Estate Agency; aftermarket; March by region",
+     {("DimOffer", "OfferType"): ["Estate Agency"], ("DimMarket", "MarketLabel"): ["aftermarket"],
+      ("DimDate", "MonthLabel"): ["March"]},
+     ("DimLocation", "Region")),
+]
+
+
+def load_tables(backend_name, server, database, star_dir, input_file):
+    """Return the star schema tables from star_dir, a database, or built in memory from a CSV file."""
+    if star_dir:
+        return read_star_dir(star_dir)
+    if input_file:
+        values = (values for _, values in read_and_convert(input_file, new_import_stats()) if fits_column_types(values))
+        return StarSchemaBuilder().add_rows(values).tables()
+    db = get_backend(backend_name, server, database)
+    conn = db.connect()
+    tables = {table: list(rows) for table, rows in read_database(db.cursor(conn)).items()}
+    conn.close()
+    return tables
+
+
+def sample_facts(facts, count, seed):
+    """Return count facts drawn from facts with replacement, all of them when count is their number."""
+    if count == len(facts):
+        return facts
+    if facts.backend == "numpy":
+        rows = np.random.default_rng(seed).integers(0, len(facts), count)
+    else:
+        rows = random.Random(seed).choices(range(len(facts)), k=count)
+    return facts.take(rows)
+
+
+def main(backend_name=DEFAULT_BACKEND, server=DEFAULT_SERVER, database=DEFAULT_DATABASE, star_dir=None,
+         input_file=None, columnar_backend=DEFAULT_COLUMNAR_BACKEND, counts=DEFAULT_COUNTS, repeat=3, seed=1):
+    """Time every query with a scan and with the bitmap index at each fact count."""
+    try:
+        fact_counts = [parse_count(value) for value in counts.split(",")]
+    except ValueError:
+        print(f"Invalid --facts: {counts}")
+        return 1
+
+    source = ColumnarFacts(load_tables(backend_name, server, database, star_dir, input_file), columnar_backend)
+    print(f"Star schema: {len(source):,} facts ({source.backend}), repeat: {repeat}")
+
+    mismatches = 0
+    for count in fact_counts:
+        facts = sample_facts(source, count, seed)
+        start = time.perf_counter()
+        index = BitmapIndex(facts)
+        build = time.perf_counter() - start
+        print(f"\n{len(facts):,} facts: index built in {build:.3f}s, {index.nbytes() / 1024 / 1024:.1f} MB")
+
+        for label, where, (table, column) in QUERIES:
+            facts.index = None
+            scan, expected = timed(lambda: facts.summarize(table, column, where), repeat)
+            facts.index = index
+            # The first run ORs the key bitmaps of each filter value, later runs reuse them
+            index.value_bitmaps.clear()
+            first, _ = timed(lambda: facts.summarize(table, column, where), 1)
+            bitmap, rows = timed(lambda: facts.summarize(table, column, where), repeat)
+            facts.index = None
+            selected = len(index.select(where))
+            mismatches += rows != expected
+            status = "" if rows == expected else "  MISMATCH"
+            print(f"  {label:<45} {selected:>10,} facts  scan {scan * 1000:8.2f} ms"
+                  f"  bitmap {first * 1000:8.2f} ms first, {bitmap * 1000:8.2f} ms  {scan / bitmap:6.2f}x{status}")
+
+    print(f"\n  mismatched queries: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the bitmap index of QueryOlxFacts.py with a scan of the fact key columns")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=list(BACKENDS), help=f"Database backend (default: {DEFAULT_BACKEND})")
+    parser.add_argument("--server", default=DEFAULT_SERVER, help=f"SQL Server name (default: {DEFAULT_SERVER})")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help=f"Database name, or database file for sqlite (default: {DEFAULT_DATABASE})")
+    parser.add_argument("--star-dir", help="Load the CSV files written by ImportOlxHousePrice.py --star-dir instead of a database")
+    parser.add_argument("--input", help=f"Build the star schema in memory from a CSV file such as {CSV_FILE} instead of a database")
+    parser.add_argument("--columnar-backend", default=DEFAULT_COLUMNAR_BACKEND, choices=["auto", "numpy", "array"], help=f"Column arrays, auto picks numpy when installed (default: {DEFAULT_COLUMNAR_BACKEND})")
+    parser.add_argument("--facts", default=DEFAULT_COUNTS, help=f"Comma separated fact counts such as 63k or 1M (default: {DEFAULT_COUNTS})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query, best time is reported (default: 3)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the fact sampling (default: 1)")
+
+    args = parser.parse_args()
+    sys.exit(main(args.backend, args.server, args.database, args.star_dir, args.input, args.columnar_backend,
+                  args.facts, args.repeat, args.seed))
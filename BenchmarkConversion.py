@@ -0,0 +1,112 @@
+"""
+Micro-benchmark for row conversion in ImportOlxHousePrice.py
+Compares the per-cell COLUMN_DEFS path (validate_and_convert_row) with the
+compiled conversion plan (convert_fields) and the columnar engine
+(convert_chunk_columnar) on the same CSV rows held in memory, and checks that
+all of them make the same accept/reject decisions.
+"""
+
+import argparse
+import csv
+import sys
+import time
+
+from ImportOlxHousePrice import (
+    CSV_FILE, COLUMN_DEFS, DEFAULT_BATCH_SIZE, compile_conversion_plan, convert_chunk_columnar, convert_fields,
+    np, open_csv, validate_and_convert_row,
+)
+
+
+def load_rows(filepath):
+    """Load header and positional rows into memory so only conversion is timed."""
+    with open_csv(filepath) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        rows = [fields for fields in reader if fields]
+    return header, rows
+
+
+def run_column_defs(header, rows):
+    """Convert rows the original way: one dict per row, one lambda per cell."""
+    dict_rows = [dict(zip(header, fields)) for fields in rows]
+    start = time.perf_counter()
+    results = []
+    for row_num, row in enumerate(dict_rows, start=2):
+        converted, is_valid, _, _ = validate_and_convert_row(row_num, row)
+        results.append(tuple(converted[col_name] for col_name in COLUMN_DEFS) if is_valid else None)
+    return time.perf_counter() - start, results
+
+
+def _fallback(header, fields):
+    """Same fallback as convert_rows: the detailed path decides."""
+    converted, is_valid, _, _ = validate_and_convert_row(0, dict(zip(header, fields)))
+    return tuple(converted[col_name] for col_name in COLUMN_DEFS) if is_valid else None
+
+
+def run_compiled_plan(header, rows):
+    """Convert rows with the plan compiled once for the header."""
+    start = time.perf_counter()
+    plan = compile_conversion_plan(header)
+    results = []
+    for fields in rows:
+        values = convert_fields(plan, fields)
+        results.append(values if values is not None else _fallback(header, fields))
+    return time.perf_counter() - start, results
+
+
+def run_columnar(header, rows, backend, chunk_size=DEFAULT_BATCH_SIZE):
+    """Convert rows chunk by chunk with the columnar engine."""
+    start = time.perf_counter()
+    plan = compile_conversion_plan(header)
+    results = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        converted = convert_chunk_columnar(plan, chunk, backend)
+        results.extend(values if values is not None else _fallback(header, fields)
+                       for fields, values in zip(chunk, converted))
+    return time.perf_counter() - start, results
+
+
+def _same_values(a, b):
+    """Compare result tuples, treating NaN as equal to NaN."""
+    if a is None or b is None:
+        return a is b
+    return all(x == y or (x != x and y != y) for x, y in zip(a, b))
+
+
+def main(filepath=None, repeat=3):
+    """Run each conversion path and print its best time."""
+    header, rows = load_rows(filepath or CSV_FILE)
+    print(f"Rows: {len(rows)}, repeat: {repeat}")
+
+    paths = [
+        ("column_defs", run_column_defs),
+        ("compiled_plan", run_compiled_plan),
+        ("columnar_array", lambda h, r: run_columnar(h, r, "array")),
+    ]
+    if np is not None:
+        paths.append(("columnar_numpy", lambda h, r: run_columnar(h, r, "numpy")))
+
+    best = {}
+    results = {}
+    for name, func in paths:
+        for _ in range(repeat):
+            elapsed, results[name] = func(header, rows)
+            best[name] = min(best.get(name, elapsed), elapsed)
+        print(f"  {name:<15} {best[name]:.3f}s  {len(rows) / best[name]:,.0f} rows/s"
+              f"  {best['column_defs'] / best[name]:.2f}x")
+
+    mismatches = 0
+    for name, _ in paths[1:]:
+        mismatches += sum(1 for a, b in zip(results["column_defs"], results[name]) if not _same_values(a, b))
+    print(f"  mismatched rows: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare COLUMN_DEFS conversion with the compiled plan and the columnar engine")
+    parser.add_argument("--input", default=CSV_FILE, help=f"CSV file to convert (default: {CSV_FILE})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per path, best time is reported (default: 3)")
+
+    args = parser.parse_args()
+    sys.exit(main(args.input, args.repeat))
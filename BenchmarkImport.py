@@ -0,0 +1,219 @@
+"""
+Import benchmark harness
+Runs the Import step pipeline (read -> convert -> write) on the reference export
+or on a synthetic file from GenerateOlxHousePrice.py, and reports rows/sec, peak
+RSS and the time spent in each stage. Every run is saved as a JSON file tagged
+with the git commit, so results can be compared across commits with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from GenerateOlxHousePrice import parse_count, write_csv
+from ImportOlxHousePrice import (
+    CSV_FILE, DEFAULT_BATCH_SIZE, DEFAULT_COLUMNAR_BACKEND, DEFAULT_VALIDATION_ENGINE, ImportMetrics, batch_rows,
+    get_backend, new_import_stats, read_and_convert, write_batches,
+)
+
+DEFAULT_RESULTS_DIR = "benchmark_results"
+
+
+def peak_rss_kb(who="self"):
+    """Peak resident set size in KB of this process or its largest child, or None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN).ru_maxrss
+    # macOS reports bytes, Linux reports KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=Path(__file__).parent, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_input(input_path=None, rows=None, seed=0, data_dir=None):
+    """Return the CSV to benchmark, generating (and caching) a synthetic one for rows."""
+    if not rows:
+        return input_path or CSV_FILE
+
+    count = parse_count(rows)
+    path = Path(data_dir or tempfile.gettempdir()) / f"olx_synthetic_{count}_{seed}.csv"
+    if not path.exists():
+        print(f"Generating {count:,} synthetic rows into {path}")
+        write_csv(str(path) + ".tmp", count, seed)
+        os.replace(str(path) + ".tmp", path)
+    return str(path)
+
+
+def run_benchmark(filepath, backend_name="sqlite", database=None, batch_size=DEFAULT_BATCH_SIZE,
+                  engine=DEFAULT_VALIDATION_ENGINE, columnar_backend=DEFAULT_COLUMNAR_BACKEND, workers=1):
+    """Run the import pipeline once and return the measurements.
+
+    backend_name "none" converts without writing anywhere. Without a database
+    sqlite writes to a new temporary file; any other backend needs one, and
+    the staging table in it is truncated.
+    """
+    metrics = ImportMetrics(enabled=True)
+    stats = new_import_stats()
+
+    db = conn = cursor = None
+    if backend_name != "none":
+        if database is None and backend_name == "sqlite":
+            database = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+        db = get_backend(backend_name, database=database)
+        conn = db.connect()
+        cursor = db.cursor(conn)
+        db.create_staging_table(cursor)
+        db.metrics = metrics
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    converted = read_and_convert(filepath, stats, engine, columnar_backend, batch_size, workers, metrics)
+    batches = batch_rows(converted, batch_size)
+    if db is None:
+        for batch in batches:
+            stats["inserted"] += len(batch)
+    else:
+        write_batches(db, cursor, batches, stats, metrics)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    if conn is not None:
+        conn.close()
+
+    total_rows = stats["inserted"] + stats["rejected"]
+
+    return {
+        "rows": total_rows,
+        "inserted": stats["inserted"],
+        "rejected": stats["rejected"],
+        "rejected_columns": dict(stats["rejected_columns"]),
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "rows_per_sec": round(total_rows / wall, 1) if wall else None,
+        "stage_seconds": {name: round(stage["wall_seconds"], 4) for name, stage in metrics.stage_totals().items()},
+        "stage_cpu_seconds": {name: round(stage["cpu_seconds"], 4) for name, stage in metrics.stage_totals().items()},
+        "batches": metrics.batch_count,
+        "batch_latency_buckets": metrics.batch_histogram(),
+        "db_round_trips": metrics.round_trips,
+        "peak_rss_kb": peak_rss_kb(),
+        "peak_rss_worker_kb": peak_rss_kb("children") if workers > 1 else None,
+    }
+
+
+def save_result(result, results_dir=DEFAULT_RESULTS_DIR):
+    """Write one run to results_dir as <commit>-<timestamp>.json and return the path."""
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = Path(results_dir) / f"{result['commit'] or 'nocommit'}-{stamp}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def compare(baseline_path, candidate_path):
+    """Print the change in throughput, memory and stage times between two result files."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(candidate_path, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    def line(label, old, new, unit):
+        if old is None or new is None:
+            print(f"  {label:<16} {old!s:>12} -> {new!s:>12}")
+            return
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {label:<16} {old:>12,.2f} -> {new:>12,.2f} {unit:<6} {change}")
+
+    print(f"Baseline:  {baseline['commit']} {baseline['config']}")
+    print(f"Candidate: {candidate['commit']} {candidate['config']}")
+    line("rows/sec", baseline["result"]["rows_per_sec"], candidate["result"]["rows_per_sec"], "rows/s")
+    line("wall", baseline["result"]["wall_seconds"], candidate["result"]["wall_seconds"], "s")
+    line("peak RSS", baseline["result"]["peak_rss_kb"], candidate["result"]["peak_rss_kb"], "KB")
+    for stage in ("read", "convert", "write"):
+        old = baseline["result"]["stage_seconds"].get(stage)
+        new = candidate["result"]["stage_seconds"].get(stage)
+        line(f"{stage} stage", old, new, "s")
+    return 0
+
+
+def main(input_path=None, rows=None, seed=0, data_dir=None, backend_name="sqlite", database=None,
+         batch_size=DEFAULT_BATCH_SIZE, engine=DEFAULT_VALIDATION_ENGINE, columnar_backend=DEFAULT_COLUMNAR_BACKEND,
+         workers=1, results_dir=DEFAULT_RESULTS_DIR):
+    """Run one benchmark configuration, print it and save it."""
+    if backend_name == "sqlserver" and not database:
+        print("--backend sqlserver needs --database; the staging table of that database is truncated")
+        return 1
+
+    filepath = prepare_input(input_path, rows, seed, data_dir)
+    config = {
+        "input": os.path.basename(filepath),
+        "input_bytes": os.path.getsize(filepath),
+        "backend": backend_name,
+        "batch_size": batch_size,
+        "validation_engine": engine,
+        "columnar_backend": columnar_backend,
+        "workers": workers,
+    }
+
+    result = run_benchmark(filepath, backend_name, database, batch_size, engine, columnar_backend, workers)
+    record = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "result": result,
+    }
+
+    print(f"\nBenchmark: {config}")
+    print(f"  Rows: {result['rows']:,} ({result['inserted']:,} inserted, {result['rejected']:,} rejected)")
+    print(f"  Wall: {result['wall_seconds']:.2f}s, CPU: {result['cpu_seconds']:.2f}s")
+    print(f"  Throughput: {result['rows_per_sec']:,.0f} rows/s")
+    print(f"  Peak RSS: {result['peak_rss_kb']} KB")
+    for stage, seconds in result["stage_seconds"].items():
+        print(f"  {stage:<8} {seconds:.3f}s")
+    print(f"Saved to {save_result(record, results_dir)}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the OLX import pipeline")
+    parser.add_argument("--input", help=f"CSV file to import (default: {CSV_FILE})")
+    parser.add_argument("--rows", help="Benchmark a synthetic file of this size instead, e.g. 1M, 10M, 50M")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic file (default: 0)")
+    parser.add_argument("--data-dir", help="Where synthetic files are cached (default: system temp dir)")
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "sqlserver", "none"], help="Where rows are written, none = convert only (default: sqlite)")
+    parser.add_argument("--database", help="Database (file) to write to, required for sqlserver; its staging table is truncated (default: a new temporary SQLite file)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Rows per batch (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--validation-engine", default=DEFAULT_VALIDATION_ENGINE, choices=["plan", "columnar"], help=f"Validation engine (default: {DEFAULT_VALIDATION_ENGINE})")
+    parser.add_argument("--columnar-backend", default=DEFAULT_COLUMNAR_BACKEND, choices=["auto", "numpy", "array"], help=f"Columnar backend (default: {DEFAULT_COLUMNAR_BACKEND})")
+    parser.add_argument("--workers", type=int, default=1, help="Parse/validate processes (default: 1)")
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR, help=f"Directory for result JSON files (default: {DEFAULT_RESULTS_DIR})")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="Compare two saved result files instead of running")
+
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(compare(*args.compare))
+    sys.exit(main(args.input, args.rows, args.seed, args.data_dir, args.backend, args.database, args.batch_size,
+                  args.validation_engine, args.columnar_backend, args.workers, args.results_dir))
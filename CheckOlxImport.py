@@ -0,0 +1,428 @@
+"""
+Consistency checks of ImportOlxHousePrice.py on the SQLite backend
+Copies the reference export into a temporary directory, with every
+--reject-every'th row given a population the staging table's CHECK constraint
+rejects, then runs the importer on it and compares what it loaded:
+
+- connections: the Import step with --connections 1 and with --connections N
+  must stage exactly the valid rows; one connection keeps them in file order.
+- incremental: an --incremental import into an empty table must stage every
+  valid row, duplicates included; running it again must add nothing, and an
+  --incremental import of the uncorrupted export must add just the rows the
+  database rejected the first time, over --connections N.
+- star: the star schema the Python data engine builds (StarSchemaBuilder)
+  must hold the same dimension members and fact rows as OlxData.sql run on
+  the same staging table, translated to SQLite below. Surrogate keys are
+  compared through the members they stand for, except DateKey, which
+  OlxData.sql assigns in YearMonth order.
+- bulk: the native BCP data file and format file that --load-mode bulk
+  hands to BULK INSERT, written by write_bulk_files, must decode through
+  the format file to exactly the rows the Import step stages, and reject
+  the rows the database rejects; the BULK INSERT statement must name both
+  files.
+- reports: on that star schema, every OlxReports dataset answered by the
+  in-memory engine of QueryOlxFacts.py must match its .rdl CommandText, which
+  reads the FactOfferBy* aggregates, and the same dataset scanned from
+  FactOfferSnapshot, for all regions and for each region alone.
+
+Exits with 1 if any check fails.
+"""
+
+import argparse
+import calendar
+import contextlib
+import csv
+import io
+import re
+import sqlite3
+import struct
+import sys
+import tempfile
+import unicodedata
+from pathlib import Path
+
+import ImportOlxHousePrice
+from ImportOlxHousePrice import (
+    BCP_NATIVE_TYPES, COLUMN_DEFS, CSV_FILE, STAR_TABLES, build_bulk_insert_sql, fits_column_types,
+    new_import_stats, open_csv, read_and_convert, write_bulk_files,
+)
+from QueryOlxFacts import REPORT_DATASETS, ColumnarFacts, compare_with_sql, read_database
+
+CHECKS = ["connections", "incremental", "bulk", "star", "reports"]
+# Passes validation but is out of range for the int column, so only the database rejects it
+REJECTED_POPULATION = "3000000000"
+
+# The AreaCategory / AreaCode case expressions of OlxData.sql over a clean area column
+_AREA_BOUNDS = [(20, "00-19", 1), (30, "20-29", 2), (40, "30-39", 3), (50, "40-49", 4), (60, "50-59", 5),
+                (70, "60-69", 6), (80, "70-79", 7), (90, "80-89", 8), (100, "90-99", 9)]
+
+
+def _area_case(column, value, missing="null", last=None):
+    whens = " ".join(f"when {column} < {bound} then {value(label, code)}" for bound, label, code in _AREA_BOUNDS)
+    return f"case when {column} is null then {missing} {whens} else {last} end"
+
+
+AREA_CATEGORY = _area_case("CleanArea", lambda label, code: f"'{label}'", last="'100+'")
+AREA_CODE = _area_case("{column}", lambda label, code: str(code), missing="{missing}", last="10")
+# month(convert(date, [month] + ' 18, 2022', 113)): English month names and their abbreviations
+MONTH_NUMBER = "case " + " ".join(f"when lower(trim(month)) in ('{calendar.month_name[i].lower()}', "
+                                  f"'{calendar.month_abbr[i].lower()}') then {i}" for i in range(1, 13)) + " end"
+CLEAN_AREA = "case when area is null then null when area > 1500 then round(area / 100.0, 2) else area end"
+
+# OlxData.sql in SQLite, loading temp copies of the star schema tables from main.olx_house_price
+REFERENCE_SQL = f"""
+create temp table DimMarket (MarketKey integer primary key, MarketLabel);
+insert into temp.DimMarket (MarketLabel) select distinct market from main.olx_house_price;
+
+create temp table DimOffer (OfferKey integer primary key, OfferType);
+insert into temp.DimOffer (OfferType) select distinct offer_type from main.olx_house_price;
+
+create temp table DimProperty (PropertyKey integer primary key, PropertyType, Floor, AreaCategory, AreaCode,
+    RoomsCategory);
+insert into temp.DimProperty (PropertyType, Floor, AreaCategory, AreaCode, RoomsCategory)
+select distinct PropertyType, floor, {AREA_CATEGORY}, {AREA_CODE.format(column="CleanArea", missing="null")},
+    case when rooms < 4 then cast(rooms as text) else '4+' end
+from (select offer_type_of_building as PropertyType, floor, rooms, {CLEAN_AREA} as CleanArea
+      from main.olx_house_price);
+
+create temp table DimDate (DateKey integer primary key, Label, YearMonth, Year, Month, MonthLabel, Quarter,
+    QuarterLabel);
+insert into temp.DimDate (Year, YearMonth, Month, MonthLabel, Label, Quarter, QuarterLabel)
+select distinct year, year * 100 + monthNumeric, monthNumeric, month, month || ' ' || year,
+    (monthNumeric - 1) / 3 + 1, 'Q' || ((monthNumeric - 1) / 3 + 1) || ' ' || year
+from (select distinct year, month, {MONTH_NUMBER} as monthNumeric from main.olx_house_price)
+order by 2;
+
+create temp table DimLocation (LocationKey integer primary key, Country, City, Region, Longtitude, Latitude,
+    Population, StatusCode, StatusLabel);
+insert into temp.DimLocation (Country, City, Region, Longtitude, Latitude, Population, StatusCode, StatusLabel)
+select distinct 'Poland', city_name, voivodeship, longitude, latitude, population,
+    coalesce(csm.StatusCode, 3), coalesce(csm.StatusName, 'Small town')
+from main.olx_house_price ohp
+left join temp.CityStatusMap csm on polish_ci_ai(ohp.city_name) = polish_ci_ai(csm.CityName);
+
+create temp table FactOfferSnapshot as
+select distinct o.OfferKey, m.MarketKey, d.DateKey, l.LocationKey, p.PropertyKey, olx.CleanArea as Area,
+    olx.price as Price
+from (select *, {CLEAN_AREA} as CleanArea from main.olx_house_price) olx
+join temp.DimDate d on d.Year = olx.year and d.MonthLabel = olx.month
+join temp.DimLocation l on l.City = olx.city_name
+join temp.DimMarket m on m.MarketLabel = olx.market
+join temp.DimOffer o on o.OfferType = olx.offer_type
+join temp.DimProperty p on ifnull(p.PropertyType, 'Unknown') = ifnull(olx.offer_type_of_building, 'Unknown')
+    and ifnull(p.Floor, 100) = ifnull(olx.floor, 100)
+    and case when p.RoomsCategory = '4+' then 4 else cast(p.RoomsCategory as int) end = olx.rooms
+    and {AREA_CODE.format(column="olx.CleanArea", missing="-1")} = ifnull(p.AreaCode, -1);
+"""
+
+# The fact rows with their keys replaced by the members they stand for
+FACT_MEMBERS_SQL = """
+select o.OfferType, m.MarketLabel, d.Label, l.City, l.Region, l.Longtitude, l.Latitude, l.Population,
+    l.StatusCode, l.StatusLabel, p.PropertyType, p.Floor, p.AreaCategory, p.AreaCode, p.RoomsCategory, f.Area, f.Price
+from {schema}.FactOfferSnapshot f
+join {schema}.DimOffer o on o.OfferKey = f.OfferKey
+join {schema}.DimMarket m on m.MarketKey = f.MarketKey
+join {schema}.DimDate d on d.DateKey = f.DateKey
+join {schema}.DimLocation l on l.LocationKey = f.LocationKey
+join {schema}.DimProperty p on p.PropertyKey = f.PropertyKey
+"""
+
+
+def write_input(source, path, reject_every):
+    """Copy source to path, making every reject_every'th row one the database rejects. Returns the copied rows."""
+    with open_csv(source) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [fields for fields in reader if fields]
+    population = header.index("population")
+    if reject_every:
+        for fields in rows[reject_every - 1::reject_every]:
+            fields[population] = REJECTED_POPULATION
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return len(rows)
+
+
+def expected_rows(path):
+    """Return the rows of path the staging table should hold, in file order."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [values for _, values in read_and_convert(path, new_import_stats()) if fits_column_types(values)]
+
+
+def staged_rows(database):
+    """Return the staging table's rows in insert order."""
+    columns = ", ".join(f"[{col_name}]" for col_name in COLUMN_DEFS)
+    with contextlib.closing(sqlite3.connect(database)) as conn:
+        return [tuple(row) for row in conn.execute(f"SELECT {columns} FROM olx_house_price ORDER BY rowid")]
+
+
+def run_import(workdir, name, **options):
+    """Run ImportOlxHousePrice.main on the SQLite backend in workdir, quietly. Returns (exit code, database)."""
+    database = str(Path(workdir) / f"{name}.db")
+    defaults = {"backend": "sqlite", "database": database,
+                "checkpoint_file": str(Path(workdir) / f"{name}.checkpoint.json"),
+                "fingerprint_index": str(Path(workdir) / f"{name}.fingerprints.db"),
+                "dimension_cache": str(Path(workdir) / f"{name}.dimensions.json")}
+    with contextlib.redirect_stdout(io.StringIO()):
+        code = ImportOlxHousePrice.main(**{**defaults, **options})
+    return code, database
+
+
+def _report(label, ok, detail=""):
+    print(f"  {label:<80} {'ok' if ok else 'FAILED'}{'  ' + detail if detail else ''}")
+    return 0 if ok else 1
+
+
+def check_connections(workdir, input_file, expected, connections, batch_size):
+    """Stage the input over one connection and over several and compare both with the expected rows."""
+    failures = 0
+    code, database = run_import(workdir, "connections-1", step="Import", inputs=[input_file], connections=1,
+                                batch_size=batch_size)
+    single = staged_rows(database)
+    failures += _report("Import --connections 1: exit code", code == 0, str(code))
+    failures += _report("Import --connections 1: valid rows in file order", single == expected,
+                        f"{len(single)} of {len(expected)} rows")
+
+    code, database = run_import(workdir, f"connections-{connections}", step="Import", inputs=[input_file],
+                                connections=connections, batch_size=batch_size)
+    several = staged_rows(database)
+    failures += _report(f"Import --connections {connections}: exit code", code == 0, str(code))
+    # Writers commit their batches in any order, so only the rows themselves are compared
+    failures += _report(f"Import --connections {connections}: same rows as --connections 1",
+                        sorted(several, key=repr) == sorted(single, key=repr), f"{len(several)} rows")
+    return failures
+
+
+def expected_format_columns():
+    """Return the (host type, prefix length, data length, column name) the format file should give each column."""
+    columns = []
+    for col_name, col_def in COLUMN_DEFS.items():
+        sql_type = col_def["sql_type"]
+        if sql_type in BCP_NATIVE_TYPES:
+            host_type, prefix_len, data_len, _ = BCP_NATIVE_TYPES[sql_type]
+        else:
+            # nvarchar(n): UTF-16LE with a two-byte length prefix
+            host_type, prefix_len, data_len = "SQLNCHAR", 2, int(re.search(r"\((\d+)\)", sql_type).group(1)) * 2
+        columns.append((host_type, prefix_len, data_len, col_name))
+    return columns
+
+
+def read_format_file(path):
+    """Parse a non-XML BCP format file. Returns (version, [(host type, prefix length, data length, column name)])."""
+    with open(path, encoding="ascii", newline="") as f:
+        lines = f.read().split("\r\n")
+    version, count = lines[0], int(lines[1])
+    columns = []
+    for line in lines[2:2 + count]:
+        _, host_type, prefix_len, data_len, _, _, col_name, _ = line.split("\t")
+        columns.append((host_type, int(prefix_len), int(data_len), col_name))
+    return version, columns
+
+
+def decode_native_file(path, columns):
+    """Decode a native BCP data file laid out as the format file columns. Returns its rows."""
+    formats = {host_type: fmt for host_type, _, _, fmt in BCP_NATIVE_TYPES.values()}
+    with open(path, "rb") as f:
+        data = f.read()
+    rows = []
+    pos = 0
+    while pos < len(data):
+        values = []
+        for host_type, prefix_len, data_len, col_name in columns:
+            prefix_fmt = "<b" if prefix_len == 1 else "<h"
+            (length,) = struct.unpack_from(prefix_fmt, data, pos)
+            pos += prefix_len
+            if length == -1:
+                values.append(None)
+                continue
+            if length > data_len:
+                raise ValueError(f"{col_name}: field of {length} bytes, the format file allows {data_len}")
+            field = data[pos:pos + length]
+            pos += length
+            values.append(field.decode("utf-16-le") if host_type == "SQLNCHAR"
+                          else struct.unpack(formats[host_type], field)[0])
+        rows.append(tuple(values))
+    return rows
+
+
+def check_bulk(workdir, input_file, total, batch_size):
+    """Write the bulk load files for the input, decode them and compare them with the rows the Import step stages."""
+    failures = 0
+    code, database = run_import(workdir, "bulk", step="Import", inputs=[input_file], connections=1,
+                                batch_size=batch_size)
+    staged = staged_rows(database)
+    failures += _report("Import --connections 1: exit code", code == 0, str(code))
+
+    stats = new_import_stats()
+    bulk_dir = Path(workdir) / "bulk"
+    with contextlib.redirect_stdout(io.StringIO()):
+        data_path, format_path, written = write_bulk_files(read_and_convert(input_file, stats), bulk_dir, stats)
+
+    version, columns = read_format_file(format_path)
+    failures += _report("Format file: version 10.0 and a native field per staging column",
+                        version == "10.0" and columns == expected_format_columns(), f"{len(columns)} columns")
+    try:
+        decoded = decode_native_file(data_path, columns)
+    except (ValueError, struct.error) as e:
+        return failures + _report("Data file: decodes through the format file", False, str(e))
+    failures += _report("Data file: same rows as the Import step stages, in file order", decoded == staged,
+                        f"{len(decoded)} of {len(staged)} rows")
+    failures += _report("Data file: rows the database rejects left out", written == len(decoded)
+                        and stats["rejected"] == total - len(staged), f"{stats['rejected']} rejected")
+
+    bulk_sql = build_bulk_insert_sql(data_path, format_path)
+    failures += _report("BULK INSERT: loads the data file through the format file",
+                        f"FROM '{data_path}'" in bulk_sql and f"FORMATFILE = '{format_path}'" in bulk_sql
+                        and "TABLOCK" in bulk_sql and "MAXERRORS = 0" in bulk_sql)
+    return failures
+
+
+def polish_ci_ai(name):
+    """Fold a city name for the Polish_100_CI_AI comparison of OlxData.sql: no case, no accents, ł as l."""
+    if name is None:
+        return None
+    decomposed = unicodedata.normalize("NFD", name.lower().translate({ord("ł"): "l"}))
+    return "".join(char for char in decomposed if unicodedata.category(char) != "Mn")
+
+
+def city_status_map(path="OlxData.sql"):
+    """Return the (CityName, StatusCode, StatusName) rows OlxData.sql inserts into #CityStatusMap."""
+    with open(path, encoding="utf-8") as f:
+        sql_content = f.read()
+    return [(city, int(code), status)
+            for city, code, status in re.findall(r"\(N'([^']+)',\s*(\d+),\s*N'([^']+)'\)", sql_content)]
+
+
+def compare_star_schema(database):
+    """Load REFERENCE_SQL next to the star schema in database. Returns [(table, reference rows, built rows)]."""
+    with contextlib.closing(sqlite3.connect(database)) as conn:
+        conn.create_function("polish_ci_ai", 1, polish_ci_ai, deterministic=True)
+        conn.execute("create temp table CityStatusMap (CityName, StatusCode, StatusName)")
+        conn.executemany("insert into temp.CityStatusMap values (?, ?, ?)", city_status_map())
+        conn.executescript(REFERENCE_SQL)
+
+        results = []
+        for table, columns in STAR_TABLES.items():
+            if table == "FactOfferSnapshot":
+                continue
+            # Only the DimDate keys follow from OlxData.sql, the other members are compared without theirs
+            names = [col_name for col_name, _ in (columns if table == "DimDate" else columns[1:])]
+            sql = "select " + ", ".join(f"[{col_name}]" for col_name in names) + " from {schema}." + table
+            results.append((table, sorted(conn.execute(sql.format(schema="temp")), key=repr),
+                            sorted(conn.execute(sql.format(schema="main")), key=repr)))
+        results.append(("FactOfferSnapshot", sorted(conn.execute(FACT_MEMBERS_SQL.format(schema="temp")), key=repr),
+                        sorted(conn.execute(FACT_MEMBERS_SQL.format(schema="main")), key=repr)))
+        return results
+
+
+def check_star(workdir, input_file, batch_size):
+    """Build the star schema with the Python data engine and compare it with OlxData.sql on the same staged rows."""
+    failures = 0
+    code, database = run_import(workdir, "star", inputs=[input_file], data_engine="python", batch_size=batch_size)
+    failures += _report("Import, Schema and Data with --data-engine python: exit code", code == 0, str(code))
+    if code != 0:
+        return failures
+    for table, expected, built in compare_star_schema(database):
+        failures += _report(f"{table}: same rows as OlxData.sql", built == expected,
+                            f"{len(built)} of {len(expected)} rows")
+    return failures
+
+
+def check_reports(workdir, input_file, batch_size):
+    """Answer every report dataset in memory and compare it with its .rdl SQL and its fact scan on SQLite."""
+    failures = 0
+    code, database = run_import(workdir, "reports", inputs=[input_file], data_engine="python", batch_size=batch_size)
+    failures += _report("Import, Schema and Data with --data-engine python: exit code", code == 0, str(code))
+    if code != 0:
+        return failures
+    with contextlib.closing(sqlite3.connect(database)) as conn:
+        cursor = conn.cursor()
+        facts = ColumnarFacts(read_database(cursor))
+        all_regions = sorted({row[3] for row in facts.dimensions["DimLocation"].values()})
+        for (report, dataset), (query, _) in REPORT_DATASETS.items():
+            param_sets = ([{"Region": all_regions}] + [{"Region": [region]} for region in all_regions]
+                          if dataset == "AveragePriceM2" else [{}])
+            mismatched = {"report SQL": 0, "fact scan": 0}
+            for params in param_sets:
+                for source, _, same in compare_with_sql(cursor, report, dataset, params, query(facts, params)):
+                    mismatched[source] += not same
+            for source, count in mismatched.items():
+                failures += _report(f"{report}: {dataset}: same rows as the {source}", count == 0,
+                                    f"{len(param_sets) - count} of {len(param_sets)} parameter sets")
+    return failures
+
+
+def check_incremental(workdir, input_file, expected, fixed_file, fixed_expected, connections, batch_size):
+    """Load the input incrementally three times and compare the staged rows after each run."""
+    failures = 0
+    options = {"step": "Import", "incremental": True, "batch_size": batch_size}
+    code, database = run_import(workdir, "incremental", inputs=[input_file], connections=1, **options)
+    first = staged_rows(database)
+    failures += _report("Import --incremental into an empty table: exit code", code == 0, str(code))
+    failures += _report("Import --incremental into an empty table: valid rows in file order", first == expected,
+                        f"{len(first)} of {len(expected)} rows")
+
+    code, database = run_import(workdir, "incremental", inputs=[input_file], connections=1, **options)
+    again = staged_rows(database)
+    failures += _report("Import --incremental again: exit code", code == 0, str(code))
+    failures += _report("Import --incremental again: no rows added", again == first, f"{len(again)} rows")
+
+    code, database = run_import(workdir, "incremental", inputs=[fixed_file], connections=connections, **options)
+    fixed = staged_rows(database)
+    failures += _report(f"Import --incremental of the fixed rows, --connections {connections}: exit code",
+                        code == 0, str(code))
+    failures += _report(f"Import --incremental of the fixed rows, --connections {connections}: rejected rows added",
+                        sorted(fixed, key=repr) == sorted(fixed_expected, key=repr),
+                        f"{len(fixed) - len(again)} added, {len(fixed)} of {len(fixed_expected)} rows")
+    return failures
+
+
+def main(input_file=CSV_FILE, checks=None, connections=4, batch_size=1000, reject_every=997):
+    """Run the checks on a copy of input_file and print each result."""
+    checks = checks or CHECKS
+    unknown = [name for name in checks if name not in CHECKS]
+    if unknown:
+        print(f"Invalid check: {', '.join(unknown)}, allowed: {', '.join(CHECKS)}")
+        return 1
+    if connections < 2:
+        print("Invalid --connections, must be at least 2")
+        return 1
+
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix="olx-check-") as workdir:
+        path = str(Path(workdir) / "input.csv")
+        total = write_input(input_file, path, reject_every)
+        expected = expected_rows(path)
+        print(f"Input: {total} rows, {total - len(expected)} for the database to reject, "
+              f"batch size {batch_size}")
+        if "connections" in checks:
+            failures += check_connections(workdir, path, expected, connections, batch_size)
+        if "incremental" in checks:
+            fixed_path = str(Path(workdir) / "fixed.csv")
+            write_input(input_file, fixed_path, 0)
+            failures += check_incremental(workdir, path, expected, fixed_path, expected_rows(fixed_path),
+                                          connections, batch_size)
+        if "bulk" in checks:
+            failures += check_bulk(workdir, path, total, batch_size)
+        if "star" in checks:
+            failures += check_star(workdir, path, batch_size)
+        if "reports" in checks:
+            failures += check_reports(workdir, path, batch_size)
+
+    print(f"  failed checks: {failures}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the importer on the SQLite backend against the reference export")
+    parser.add_argument("--input", default=CSV_FILE, help=f"CSV file to copy as the input (default: {CSV_FILE})")
+    parser.add_argument("--check", action="append", choices=CHECKS, help="Check to run, repeat for several (default: all)")
+    parser.add_argument("--connections", type=int, default=4, help="Writer connections compared with one (default: 4)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per insert batch (default: 1000)")
+    parser.add_argument("--reject-every", type=int, default=997, help="Make every Nth row one the database rejects, 0 for none (default: 997)")
+
+    args = parser.parse_args()
+    sys.exit(main(input_file=args.input, checks=args.check, connections=args.connections, batch_size=args.batch_size,
+                  reject_every=args.reject_every))
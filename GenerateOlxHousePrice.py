@@ -0,0 +1,146 @@
+"""
+Synthetic OLX house price CSV generator
+Writes files with the same header and layout as olx_house_price_Q122.csv, at any
+size, for benchmarking the importer. Cities, titles and categories are sampled
+from the reference export when it is available, and the export's quirks are
+reproduced at configurable rates: quoted titles with commas, quotes and line
+breaks, European decimal commas, areas missing their decimal point (4223 for
+42.23), out-of-range floors and missing required values.
+"""
+
+import argparse
+import csv
+import random
+import sys
+from pathlib import Path
+
+from ImportOlxHousePrice import CSV_FILE, open_csv
+
+HEADER = [
+    "offer_title", "price", "price_per_meter", "offer_type", "floor", "area", "rooms",
+    "offer_type_of_building", "market", "city_name", "voivodeship", "month", "year",
+    "population", "longitude", "latitude",
+]
+
+# Used when the reference export is not available
+FALLBACK_TEMPLATES = [
+    ["Mieszkanie 2 pokojowe", "", "", "Private", "1", "", "2", "Housing Block", "aftermarket",
+     "Warszawa", "Masovia", "January", "2022", "1790658", "21.0067249", "52.2319581"],
+    ["Kawalerka na sprzedaż", "", "", "Estate Agency", "3", "", "1", "Apartment Building", "primary",
+     "Kraków", "Lesser Poland", "February", "2022", "779115", "19.9367001", "50.0619474"],
+    ["Przestronne mieszkanie", "", "", "Private", "0", "", "3", "Tenement", "aftermarket",
+     "Łódź", "Lodzkie", "March", "2022", "672185", "19.4557163", "51.7687323"],
+]
+
+TITLE_EXTRAS = ["balkon", "garaż", "blisko centrum", "nowe", "do remontu", "widok", "ogródek"]
+
+DEFAULT_RATES = {
+    "title_comma": 0.3,
+    "title_quote": 0.02,
+    "title_newline": 0.001,
+    "decimal_comma": 0.01,
+    "missing_decimal": 0.001,
+    "bad_floor": 0.001,
+    "missing_price": 0.0005,
+}
+
+
+def parse_count(value):
+    """Parse a row count such as 63000, 63k, 1M or 50M."""
+    value = value.strip().lower()
+    multiplier = 1
+    if value.endswith("k"):
+        multiplier, value = 1_000, value[:-1]
+    elif value.endswith("m"):
+        multiplier, value = 1_000_000, value[:-1]
+    return int(float(value) * multiplier)
+
+
+def load_templates(reference=CSV_FILE):
+    """Load rows of the reference export to sample cities, titles and categories from."""
+    if not reference or not Path(reference).exists():
+        return FALLBACK_TEMPLATES
+
+    with open_csv(reference) as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return [fields for fields in reader if len(fields) == len(HEADER)] or FALLBACK_TEMPLATES
+
+
+def _decimal(value, rng, rates):
+    """Format a two-decimal number, sometimes with a European decimal comma."""
+    text = f"{value:.2f}".rstrip("0").rstrip(".")
+    if rng.random() < rates["decimal_comma"]:
+        return text.replace(".", ",")
+    return text
+
+
+def generate_rows(count, seed=0, rates=None, templates=None):
+    """Yield count synthetic rows as lists of strings."""
+    rates = dict(DEFAULT_RATES, **(rates or {}))
+    templates = templates or load_templates()
+    rng = random.Random(seed)
+
+    for _ in range(count):
+        row = list(rng.choice(templates))
+
+        title = row[0]
+        if rng.random() < rates["title_comma"]:
+            title = f"{title}, {rng.choice(TITLE_EXTRAS)}"
+        if rng.random() < rates["title_quote"]:
+            title = f'"{rng.choice(TITLE_EXTRAS).title()}" {title}'
+        if rng.random() < rates["title_newline"]:
+            title = f"{title}\n{rng.choice(TITLE_EXTRAS)}"
+        row[0] = title
+
+        area = round(rng.uniform(18, 120), 2)
+        price_per_meter = round(rng.uniform(3500, 18000), 2)
+        price = round(area * price_per_meter, -2)
+
+        row[1] = "" if rng.random() < rates["missing_price"] else str(int(price))
+        row[2] = _decimal(price_per_meter, rng, rates)
+        if rng.random() < rates["missing_decimal"]:
+            row[5] = str(int(round(area * 100)))
+        else:
+            row[5] = _decimal(area, rng, rates)
+        if rng.random() < rates["bad_floor"]:
+            row[4] = rng.choice(["-1", "300", "1000"])
+
+        yield row
+
+
+def write_csv(filepath, count, seed=0, rates=None, reference=CSV_FILE, progress_every=1_000_000):
+    """Write a synthetic export with a UTF-8 BOM, like the original file."""
+    templates = load_templates(reference)
+    with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(HEADER)
+        for i, row in enumerate(generate_rows(count, seed, rates, templates), start=1):
+            writer.writerow(row)
+            if progress_every and i % progress_every == 0:
+                print(f"  {i:,} rows written")
+    return filepath
+
+
+def main(output, rows, seed=0, reference=CSV_FILE, rates=None):
+    """Generate one synthetic file."""
+    count = parse_count(rows)
+    print(f"Generating {count:,} rows into {output} (seed {seed})")
+    write_csv(output, count, seed, rates, reference)
+    print(f"Done: {Path(output).stat().st_size / 1024 / 1024:,.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic OLX house price CSV")
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    parser.add_argument("--rows", default="1M", help="Number of rows, e.g. 63k, 1M, 10M, 50M (default: 1M)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, same seed gives the same file (default: 0)")
+    parser.add_argument("--reference", default=CSV_FILE, help=f"Export to sample cities and titles from (default: {CSV_FILE})")
+    for name, rate in DEFAULT_RATES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}-rate", type=float, default=rate, dest=name,
+                            help=f"Share of rows with this quirk (default: {rate})")
+
+    args = parser.parse_args()
+    sys.exit(main(args.output, args.rows, args.seed, args.reference,
+                  {name: getattr(args, name) for name in DEFAULT_RATES}))
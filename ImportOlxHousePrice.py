@@ -2,20 +2,92 @@
 CSV to SQL Server importer
 Reads CSV with proper handling of embedded commas and imports to olx_house_price table.
 Handles locale-independent number parsing and robust error handling.
+The database is reached through a backend: SQL Server (pyodbc) or a SQLite stand-in.
 """
 
+import bz2
 import csv
-import pyodbc
+import glob
+import gzip
+import hashlib
+import io
+import math
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import unicodedata
 import sys
 import argparse
+import collections
+import itertools
+import json
+import lzma
+import operator
+import tempfile
+import threading
+import time
+import queue
+from contextlib import contextmanager
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-from decimal import InvalidOperation
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
 
 # Configuration - can be overridden by command-line arguments
 CSV_FILE = "olx_house_price_Q122.csv"
 DEFAULT_SERVER = "."
 DEFAULT_DATABASE = "OlxQa"
 DEFAULT_STEP = "All"
+DEFAULT_BACKEND = "sqlserver"
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_LOAD_MODE = "rows"
+DEFAULT_VALIDATION_ENGINE = "plan"
+DEFAULT_COLUMNAR_BACKEND = "auto"
+DEFAULT_WORKERS = 1
+DEFAULT_CONNECTIONS = 1
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+DEFAULT_BULK_DIR = tempfile.gettempdir()
+DEFAULT_FINGERPRINT_INDEX = "olx_house_price.fingerprints.db"
+DEFAULT_CHECKPOINT_FILE = "olx_house_price.checkpoint.json"
+DEFAULT_DIMENSION_CACHE = "olx_house_price.dimensions.json"
+DEFAULT_ROW_GROUP_SIZE = 128 * 1024
+DEFAULT_DATA_ENGINE = "sql"
+DEFAULT_FACT_LOAD = "distinct"
+SET_BASED_FACT_SCRIPT = "OlxFactSetBased.sql"
+FACT_LOAD_MARKER = "if not exists (select 1 from FactOfferSnapshot)"
+FACT_CLEANUP_MARKER = "-- Drop the staging columns and index of the fact load"
+EMIT_FILES = {"parquet": "olx_house_price.parquet", "arrow": "olx_house_price.arrow"}
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+MAX_REJECTED_SAMPLES = 20
+
+# A quoted CSV value, and a line break followed by an empty line
+_QUOTED_VALUE = re.compile(rb'"[^"]*"')
+_BLANK_LINE = re.compile(rb'\n(?=\r?\n)')
+BATCH_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
 TABLE_NAME = "[dbo].[olx_house_price]"
 
 # Column mappings and type conversions
@@ -37,9 +109,164 @@ COLUMN_DEFS = {
     "latitude": {"sql_type": "float", "nullable": False, "converter": lambda x: _parse_float(x)},
 }
 
+INSERT_SQL_TEMPLATE = """
+INSERT INTO {table_name} (
+    [price], [price_per_meter], [offer_type], [floor], [area], [rooms],
+    [offer_type_of_building], [market], [city_name], [voivodeship], [month], [year],
+    [population], [longitude], [latitude]
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# SQLite column type and CHECK standing in for each SQL Server type, so out-of-range values fail like they would there
+SQLITE_TYPES = {
+    "float": ("REAL", "BETWEEN -1.79e308 AND 1.79e308"),
+    "tinyint": ("INTEGER", "BETWEEN 0 AND 255"),
+    "smallint": ("INTEGER", "BETWEEN -32768 AND 32767"),
+    "int": ("INTEGER", "BETWEEN -2147483648 AND 2147483647"),
+}
+
+# Native BCP host types: sql_type -> (host type, prefix length, data length, struct format)
+BCP_NATIVE_TYPES = {
+    "float": ("SQLFLT8", 1, 8, "<d"),
+    "tinyint": ("SQLTINYINT", 1, 1, "<B"),
+    "smallint": ("SQLSMALLINT", 1, 2, "<h"),
+    "int": ("SQLINT", 1, 4, "<i"),
+}
+
+# Arrow type names for the --emit file; nvarchar columns are strings
+ARROW_TYPES = {
+    "float": "float64",
+    "tinyint": "uint8",
+    "smallint": "int16",
+    "int": "int32",
+}
+
+# Value range of the integer types, checked before rows are written to the --emit file
+INTEGER_RANGES = {
+    "tinyint": (0, 255),
+    "smallint": (-32768, 32767),
+    "int": (-2147483648, 2147483647),
+}
+
+# Low-cardinality text columns that are dictionary-encoded in the --emit file
+DICTIONARY_COLUMNS = ("offer_type", "market", "voivodeship", "month")
+
+# Star schema tables of OlxSchema.sql in load order, with SQLite column types
+STAR_TABLES = {
+    "DimOffer": [("OfferKey", "INTEGER PRIMARY KEY"), ("OfferType", "TEXT NOT NULL")],
+    "DimMarket": [("MarketKey", "INTEGER PRIMARY KEY"), ("MarketLabel", "TEXT NOT NULL")],
+    "DimDate": [
+        ("DateKey", "INTEGER PRIMARY KEY"), ("Label", "TEXT NOT NULL"), ("YearMonth", "INTEGER NOT NULL"),
+        ("Year", "INTEGER NOT NULL"), ("Month", "INTEGER NOT NULL"), ("MonthLabel", "TEXT NOT NULL"),
+        ("Quarter", "INTEGER NOT NULL"), ("QuarterLabel", "TEXT"),
+    ],
+    "DimLocation": [
+        ("LocationKey", "INTEGER PRIMARY KEY"), ("Country", "TEXT"), ("City", "TEXT NOT NULL"),
+        ("Region", "TEXT NOT NULL"), ("Longtitude", "REAL NOT NULL"), ("Latitude", "REAL NOT NULL"),
+        ("Population", "INTEGER NOT NULL"), ("StatusCode", "INTEGER"), ("StatusLabel", "TEXT NOT NULL"),
+    ],
+    "DimProperty": [
+        ("PropertyKey", "INTEGER PRIMARY KEY"), ("PropertyType", "TEXT"), ("Floor", "INTEGER"),
+        ("AreaCategory", "TEXT"), ("AreaCode", "INTEGER"), ("RoomsCategory", "TEXT NOT NULL"),
+    ],
+    "FactOfferSnapshot": [
+        ("OfferKey", "INTEGER NOT NULL REFERENCES DimOffer(OfferKey)"),
+        ("MarketKey", "INTEGER NOT NULL REFERENCES DimMarket(MarketKey)"),
+        ("DateKey", "INTEGER NOT NULL REFERENCES DimDate(DateKey)"),
+        ("LocationKey", "INTEGER NOT NULL REFERENCES DimLocation(LocationKey)"),
+        ("PropertyKey", "INTEGER NOT NULL REFERENCES DimProperty(PropertyKey)"),
+        ("Area", "REAL"), ("Price", "REAL NOT NULL"),
+    ],
+}
+
+# FactOfferSnapshot summed per LocationKey, DateKey and PropertyKey for the OlxReports price reports;
+# SumPriceM2 and OffersWithArea only count facts with an area
+_AGGREGATE_MEASURES = [("Offers", "INTEGER NOT NULL"), ("OffersWithArea", "INTEGER NOT NULL"),
+                       ("SumPrice", "REAL NOT NULL"), ("SumPriceM2", "REAL NOT NULL")]
+AGGREGATE_TABLES = {
+    "FactOfferByLocation": [("LocationKey", "INTEGER PRIMARY KEY")] + _AGGREGATE_MEASURES,
+    "FactOfferByDate": [("DateKey", "INTEGER PRIMARY KEY")] + _AGGREGATE_MEASURES,
+    "FactOfferByProperty": [("PropertyKey", "INTEGER PRIMARY KEY")] + _AGGREGATE_MEASURES,
+}
+
+# Natural key columns of each dimension, in the order StarSchemaBuilder keys its members
+DIMENSION_NATURAL_KEYS = {
+    "DimOffer": ["OfferType"],
+    "DimMarket": ["MarketLabel"],
+    "DimDate": ["Year", "MonthLabel"],
+    "DimLocation": ["City", "Region", "Longtitude", "Latitude", "Population", "StatusCode", "StatusLabel"],
+    "DimProperty": ["PropertyType", "Floor", "AreaCategory", "AreaCode", "RoomsCategory"],
+}
+
+# Name/value stamps of the loaded data, e.g. the version of the dimension tables
+ETL_STATE_TABLE = [("Name", "TEXT PRIMARY KEY"), ("Value", "INTEGER NOT NULL")]
+DIMENSION_VERSION = "DimensionVersion"
+# Counts the Import and Data steps that committed, so report result caches know when to drop their results
+LOAD_GENERATION = "LoadGeneration"
+# The highest fact key summed into the aggregate tables, absent when they must be summed from every fact
+AGGREGATED_FACT_KEY = "AggregatedFactKey"
+
+# The #CityStatusMap of OlxData.sql; every other city is a small town
+CITY_STATUS_MAP = {
+    "Warszawa": (1, "National Capital"),
+    "Białystok": (2, "Regional capital"),
+    "Bydgoszcz": (2, "Regional capital"),
+    "Toruń": (2, "Regional capital"),
+    "Gdańsk": (2, "Regional capital"),
+    "Gorzów Wielkopolski": (2, "Regional capital"),
+    "Zielona Góra": (2, "Regional capital"),
+    "Katowice": (2, "Regional capital"),
+    "Kielce": (2, "Regional capital"),
+    "Kraków": (2, "Regional capital"),
+    "Lublin": (2, "Regional capital"),
+    "Łódź": (2, "Regional capital"),
+    "Olsztyn": (2, "Regional capital"),
+    "Opole": (2, "Regional capital"),
+    "Poznań": (2, "Regional capital"),
+    "Rzeszów": (2, "Regional capital"),
+    "Szczecin": (2, "Regional capital"),
+    "Wrocław": (2, "Regional capital"),
+}
+SMALL_TOWN_STATUS = (3, "Small town")
+
+# Month names SET LANGUAGE English accepts in convert(date, ...), full or abbreviated
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+               "November", "December"]
+MONTH_NUMBERS = {name.lower(): number for number, full in enumerate(MONTH_NAMES, start=1)
+                 for name in (full, full[:3])}
+
+# AreaCategory and AreaCode of CleanArea below each upper bound; larger areas are 100+ / 10
+AREA_BUCKETS = [(20, "00-19", 1), (30, "20-29", 2), (40, "30-39", 3), (50, "40-49", 4), (60, "50-59", 5),
+                (70, "60-69", 6), (80, "70-79", 7), (90, "80-89", 8), (100, "90-99", 9)]
+
 REQUIRED_FIELDS = ["price", "price_per_meter", "rooms", "year", "population", "longitude", "latitude", "offer_type", "market", "city_name", "voivodeship"]
 
 
+def _to_float(value):
+    """Convert a stripped, non-empty string to float, accepting a decimal comma."""
+    try:
+        # Replace comma with period (handle European decimal separator)
+        return float(value.replace(",", "."))
+    except (ValueError, InvalidOperation):
+        return None
+
+
+def _to_int(value):
+    """Convert a stripped, non-empty string to int, dropping any decimal part."""
+    try:
+        return int(float(value.replace(",", ".")))
+    except (ValueError, InvalidOperation):
+        return None
+
+
+def _to_tinyint(value):
+    """Convert a stripped, non-empty string to a tinyint (0-255)."""
+    int_val = _to_int(value)
+    if int_val is not None and 0 <= int_val <= 255:
+        return int_val
+    return None
+
+
 def _parse_float(value):
     """Parse float with locale-independent handling of commas and dots."""
     if not value or not isinstance(value, str):
@@ -49,12 +276,7 @@ def _parse_float(value):
     if not value:
         return None
 
-    try:
-        # Replace comma with period (handle European decimal separator)
-        normalized = value.replace(",", ".")
-        return float(normalized)
-    except (ValueError, InvalidOperation):
-        return None
+    return _to_float(value)
 
 
 def _parse_int(value):
@@ -66,11 +288,7 @@ def _parse_int(value):
     if not value:
         return None
 
-    try:
-        # Remove any decimal part if present
-        return int(float(value.replace(",", ".")))
-    except (ValueError, InvalidOperation):
-        return None
+    return _to_int(value)
 
 
 def _parse_tinyint(value):
@@ -82,30 +300,424 @@ def _parse_tinyint(value):
     if not value:
         return None
 
-    try:
-        int_val = int(float(value.replace(",", ".")))
-        if 0 <= int_val <= 255:
-            return int_val
-        return None
-    except (ValueError, InvalidOperation):
-        return None
+    return _to_tinyint(value)
+
+
+# Converters used by the compiled plan; they expect values that are already stripped and non-empty
+PLAN_CONVERTERS = {
+    "float": _to_float,
+    "tinyint": _to_tinyint,
+    "smallint": _to_int,
+    "int": _to_int,
+}
 
 
-def read_csv(filepath):
-    """Read CSV file with proper handling of embedded commas."""
+def expand_inputs(patterns):
+    """Expand CSV paths and glob patterns into a list of files, in the order given.
+
+    The matches of each pattern are sorted, and a file matched twice is
+    loaded once.
+    """
+    filepaths = []
+    for pattern in patterns:
+        if any(char in pattern for char in "*?["):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise FileNotFoundError(f"No CSV files match: {pattern}")
+        elif Path(pattern).exists():
+            matches = [pattern]
+        else:
+            raise FileNotFoundError(f"CSV file not found: {pattern}")
+
+        filepaths.extend(match for match in matches if match not in filepaths)
+    return filepaths
+
+
+def is_compressed(filepath):
+    """True for .gz, .bz2, .xz and .zst inputs."""
+    return Path(filepath).suffix.lower() in COMPRESSED_SUFFIXES
+
+
+def open_input(filepath):
+    """Open an input file for reading bytes, decompressing compressed files as a stream.
+
+    Offsets into a compressed file are offsets into its decompressed data.
+    """
+    suffix = Path(filepath).suffix.lower()
+    if suffix == ".gz":
+        return gzip.open(filepath, "rb")
+    if suffix == ".bz2":
+        return bz2.open(filepath, "rb")
+    if suffix == ".xz":
+        return lzma.open(filepath, "rb")
+    if suffix == ".zst":
+        if zstandard is None:
+            raise ImportError("Reading .zst files requires zstandard to be installed")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filepath, "rb"), read_across_frames=True,
+                                                              closefd=True)
+        # The zstandard reader cannot read lines by itself
+        return io.BufferedReader(reader)
+    return open(filepath, "rb")
+
+
+def open_csv(filepath):
+    """Open a CSV input as text, decompressing it if needed."""
+    # utf-8-sig drops the BOM the OLX export starts with
+    return io.TextIOWrapper(open_input(filepath), encoding="utf-8-sig")
+
+
+def _seek_input(f, offset, position=0):
+    """Move an input opened with open_input from position to offset.
+
+    Streams that cannot seek are read up to it.
+    """
+    if f.seekable():
+        f.seek(offset)
+        return
+    remaining = offset - position
+    while remaining > 0:
+        block = f.read(min(remaining, 1024 * 1024))
+        if not block:
+            break
+        remaining -= len(block)
+
+
+def read_csv(filepath, positions=None, start=None):
+    """Open the CSV file and return (header, rows), where rows streams (row_num, fields) pairs.
+
+    With positions, (row_num, end_offset) is appended for every record, the
+    byte offset just after it. start=(offset, row_num) continues reading at a
+    record boundary found that way, numbering rows from row_num.
+    """
     print(f"Reading CSV file: {filepath}")
 
     if not Path(filepath).exists():
         raise FileNotFoundError(f"CSV file not found: {filepath}")
 
-    rows = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader, start=2):  # start=2 because row 1 is header
-            rows.append((i, row))
+    if positions is None and start is None:
+        f = open_csv(filepath)
+        reader = csv.reader(f)
+        header = next(reader, [])
+        return header, _iter_csv_rows(f, reader)
+
+    f = open_input(filepath)
+    lines = _TrackedLines(f)
+    header = next(csv.reader(lines), [])
+    if header and header[0].startswith("\ufeff"):
+        header[0] = header[0][1:]
+
+    first_row = 2
+    if start is not None:
+        offset, first_row = start
+        _seek_input(f, offset, lines.offset)
+        lines.offset = offset
+    return header, _iter_tracked_rows(f, lines, positions, first_row)
 
-    print(f"Read {len(rows)} rows")
-    return rows
+
+class _TrackedLines:
+    """Decoded lines of a binary file, counting the bytes handed out so far.
+
+    csv.reader pulls lines only as it needs them, so after it returns a record
+    offset is the byte offset just after that record.
+    """
+
+    def __init__(self, f, offset=0):
+        self.f = f
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.f)
+        self.offset += len(line)
+        text = line.decode("utf-8")
+        # Translate line endings like a text-mode open() does
+        return text.replace("\r\n", "\n") if "\r" in text else text
+
+
+def _iter_tracked_rows(f, lines, positions, first_row):
+    """Like _iter_csv_rows, recording the end offset of every record in positions."""
+    row_num = first_row - 1
+    with f:
+        for fields in csv.reader(lines):
+            if not fields:
+                continue
+            row_num += 1
+            if positions is not None:
+                positions.append((row_num, lines.offset))
+            yield row_num, fields
+
+    print(f"Read {row_num - first_row + 1} rows")
+
+
+def _iter_csv_rows(f, reader):
+    """Yield rows one at a time so memory does not grow with the file."""
+    row_num = 1
+    with f:
+        # Blank lines are skipped without being counted, as csv.DictReader does
+        records = (fields for fields in reader if fields)
+        for row_num, fields in enumerate(records, start=2):  # start=2 because row 1 is header
+            yield row_num, fields
+
+    print(f"Read {row_num - 1} rows")
+
+
+def _nvarchar_length(sql_type):
+    """Return n for nvarchar(n), otherwise None."""
+    match = re.fullmatch(r"nvarchar\((\d+)\)", sql_type)
+    return int(match.group(1)) if match else None
+
+
+def compile_conversion_plan(header):
+    """Build the conversion plan for a CSV header once per file.
+
+    The plan is a tuple of (column index, converter, required, max length) in
+    COLUMN_DEFS order. Text columns have no converter and are cut to max length;
+    columns missing from the header have index None.
+    """
+    positions = {name: i for i, name in enumerate(header)}
+    required_fields = set(REQUIRED_FIELDS)
+
+    plan = []
+    for col_name, col_def in COLUMN_DEFS.items():
+        max_length = _nvarchar_length(col_def["sql_type"])
+        converter = None if max_length else PLAN_CONVERTERS[col_def["sql_type"]]
+        plan.append((positions.get(col_name), converter, col_name in required_fields, max_length))
+
+    return tuple(plan)
+
+
+def convert_fields(plan, fields):
+    """Convert a positional row with a compiled plan.
+
+    Returns the tuple of values, or None when the row is not valid as-is; such
+    rows go through validate_and_convert_row, which makes the final decision
+    and builds the error details.
+    """
+    values = []
+    append = values.append
+    try:
+        for index, converter, required, max_length in plan:
+            raw_value = fields[index].strip() if index is not None else ""
+            if not raw_value:
+                value = None
+            elif converter is None:
+                value = raw_value[:max_length]
+            else:
+                value = converter(raw_value)
+
+            if value is None and required:
+                return None
+            append(value)
+    except Exception:
+        return None
+
+    return tuple(values)
+
+
+def _decimal_points(raw):
+    """Replace decimal commas in a whole column with one join/replace/split."""
+    joined = "\n".join(raw)
+    if "," not in joined:
+        return raw
+    normalized = joined.replace(",", ".").split("\n")
+    if len(normalized) != len(raw):
+        # A cell contained the separator itself; fall back to cell by cell
+        return [value.replace(",", ".") for value in raw]
+    return normalized
+
+
+class _ArrayColumns:
+    """Pure-Python columnar backend: array('d') values and bytearray 0/1 masks."""
+
+    @staticmethod
+    def empty_mask(raw):
+        return bytearray(map(operator.not_, raw))
+
+    @staticmethod
+    def parse_numeric(raw, kind):
+        """Parse a column of stripped strings. Returns (values, missing, defer)."""
+        count = len(raw)
+        raw = _decimal_points(raw)
+        try:
+            # Whole column in one pass; any empty or bad cell drops to the loop below
+            floats = array("d", map(float, raw))
+            present = None
+        except ValueError:
+            floats = array("d", bytes(8 * count))
+            present = bytearray(count)
+            for i, value in enumerate(raw):
+                if value:
+                    try:
+                        floats[i] = float(value)
+                        present[i] = 1
+                    except ValueError:
+                        pass
+
+        if kind == "float":
+            if present is None:
+                return floats.tolist(), bytearray(count), None
+            values = [value if ok else None for value, ok in zip(floats, present)]
+            return values, bytearray(1 - ok for ok in present), None
+
+        if present is None:
+            try:
+                values = list(map(int, floats))
+                if kind != "tinyint" or not values or (min(values) >= 0 and max(values) <= 255):
+                    return values, bytearray(count), None
+            except (ValueError, OverflowError):
+                pass
+            present = bytearray(b"\x01" * count)
+
+        values = []
+        missing = bytearray(count)
+        defer = bytearray(count)
+        for i, (value, ok) in enumerate(zip(floats, present)):
+            if ok and not math.isfinite(value):
+                # int() raises or rejects here; let the row-wise path decide
+                defer[i] = 1
+                ok = 0
+            int_val = int(value) if ok else None
+            if int_val is not None and kind == "tinyint" and not 0 <= int_val <= 255:
+                int_val = None
+            if int_val is None:
+                missing[i] = 1
+            values.append(int_val)
+        return values, missing, defer
+
+    @staticmethod
+    def any_mask(masks, count):
+        """OR 0/1 masks together and return a list of row flags."""
+        combined = 0
+        for mask in masks:
+            combined |= int.from_bytes(mask, "little")
+        return list(combined.to_bytes(count, "little"))
+
+
+class _NumpyColumns:
+    """NumPy columnar backend: float64 arrays and boolean masks."""
+
+    @staticmethod
+    def empty_mask(raw):
+        return np.array(raw, dtype=str) == ""
+
+    @staticmethod
+    def parse_numeric(raw, kind):
+        """Parse a column of stripped strings. Returns (values, missing, defer)."""
+        raw = _decimal_points(raw)
+        try:
+            floats = np.array(raw, dtype=np.float64)
+            present = np.ones(len(raw), dtype=bool)
+        except ValueError:
+            # At least one cell is empty or not a number; parse this column cell by cell
+            parsed = [_to_float(value) if value else None for value in raw]
+            present = np.array([value is not None for value in parsed], dtype=bool)
+            floats = np.array([value if value is not None else 0.0 for value in parsed], dtype=np.float64)
+
+        if kind == "float":
+            if present.all():
+                return floats.tolist(), ~present, None
+            values = floats.astype(object)
+            values[~present] = None
+            return values.tolist(), ~present, None
+
+        truncated = np.trunc(floats)
+        finite = np.isfinite(floats)
+        # Non-finite and int64-overflowing values go to the row-wise path
+        defer = present & (~finite | (np.abs(np.where(finite, truncated, 0)) >= 2.0 ** 63))
+        ok = present & ~defer
+        if kind == "tinyint":
+            ok &= (truncated >= 0) & (truncated <= 255)
+        ints = np.where(ok, truncated, 0).astype(np.int64)
+        if ok.all():
+            return ints.tolist(), ~ok, defer
+        values = ints.astype(object)
+        values[~ok] = None
+        return values.tolist(), ~ok, defer
+
+    @staticmethod
+    def any_mask(masks, count):
+        """OR boolean masks together and return a list of row flags."""
+        combined = np.zeros(count, dtype=bool)
+        for mask in masks:
+            combined |= np.asarray(mask, dtype=bool)
+        return combined.tolist()
+
+
+# Converter -> kind of bulk numeric parse used by the columnar engine
+COLUMNAR_KINDS = {
+    _to_float: "float",
+    _to_int: "int",
+    _to_tinyint: "tinyint",
+}
+
+
+def _columnar_backend(name):
+    """Resolve a columnar backend name (auto, numpy, array)."""
+    if name == "auto":
+        name = "numpy" if np is not None else "array"
+    if name == "numpy":
+        if np is None:
+            raise ImportError("The numpy columnar backend requires numpy to be installed")
+        return _NumpyColumns
+    if name == "array":
+        return _ArrayColumns
+    raise ValueError(f"Unknown columnar backend: {name}")
+
+
+def convert_chunk_columnar(plan, chunk, backend=DEFAULT_COLUMNAR_BACKEND):
+    """Convert a list of positional rows column by column.
+
+    Numeric columns are parsed in bulk and the required/tinyint checks are
+    combined into one reject mask. Returns one tuple of values per row, or
+    None for rows that must go through validate_and_convert_row, exactly like
+    convert_fields.
+    """
+    columns = _columnar_backend(backend)
+    count = len(chunk)
+    width = max((index for index, _, _, _ in plan if index is not None), default=-1) + 1
+
+    # Short rows are left entirely to the row-wise path
+    if min(map(len, chunk)) >= width:
+        short = bytearray(count)
+    else:
+        short = bytearray(1 if len(fields) < width else 0 for fields in chunk)
+        chunk = [fields if len(fields) >= width else [""] * width for fields in chunk]
+    reject_masks = [short]
+
+    # Transpose once; zip stops at the shortest row, which is at least width long
+    raw_columns = list(zip(*chunk))
+    values_by_column = []
+    for index, converter, required, max_length in plan:
+        raw = list(map(str.strip, raw_columns[index])) if index is not None else [""] * count
+
+        if converter is None:
+            values = [value[:max_length] or None for value in raw]
+            missing = columns.empty_mask(raw) if required else None
+        else:
+            values, missing, defer = columns.parse_numeric(raw, COLUMNAR_KINDS[converter])
+            if defer is not None:
+                reject_masks.append(defer)
+
+        if required:
+            reject_masks.append(missing)
+        values_by_column.append(values)
+
+    rejected = columns.any_mask(reject_masks, count)
+    return [None if reject else values for values, reject in zip(zip(*values_by_column), rejected)]
+
+
+def _convert_columnar(plan, rows, chunk_size, backend):
+    """Yield (row_num, fields, values) using the columnar engine chunk by chunk."""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        converted = convert_chunk_columnar(plan, [fields for _, fields in chunk], backend)
+        for (row_num, fields), values in zip(chunk, converted):
+            yield row_num, fields, values
 
 
 def validate_and_convert_row(row_num, row):
@@ -138,75 +750,845 @@ def validate_and_convert_row(row_num, row):
     return converted, is_valid, error_msg, raw_values
 
 
-def insert_rows(cursor, rows):
-    """Insert converted rows into database."""
-    print("\nValidating and inserting data...")
+def new_import_stats():
+    """Return the counters shared by the convert and write stages."""
+    return {"inserted": 0, "rejected": 0, "skipped": 0, "rejected_samples": [],
+            "rejected_columns": collections.Counter(), "rejected_by_database": 0}
+
+
+def _rejected_columns(error_msg):
+    """Return the columns named in a validate_and_convert_row error message."""
+    return {line.split(":", 1)[0].strip() for line in error_msg.splitlines() if ":" in line}
+
 
-    inserted = 0
-    rejected = 0
-    rejected_samples = []
+def convert_rows(header, rows, stats, engine=DEFAULT_VALIDATION_ENGINE,
+                 columnar_backend=DEFAULT_COLUMNAR_BACKEND, chunk_size=DEFAULT_BATCH_SIZE):
+    """Validate and convert rows, yielding (row_num, values) for valid rows only.
 
-    for row_num, row in rows:
-        converted, is_valid, error_msg, raw_values = validate_and_convert_row(row_num, row)
+    engine is "plan" (row by row) or "columnar" (chunk_size rows at a time).
+    Rejected rows are counted in stats and the first MAX_REJECTED_SAMPLES are kept.
+    """
+    plan = compile_conversion_plan(header)
+
+    if engine == "columnar":
+        converted_rows = _convert_columnar(plan, rows, chunk_size, columnar_backend)
+    else:
+        converted_rows = ((row_num, fields, convert_fields(plan, fields)) for row_num, fields in rows)
+
+    for row_num, fields, values in converted_rows:
+        if values is not None:
+            yield row_num, values
+            continue
+
+        converted, is_valid, error_msg, raw_values = validate_and_convert_row(row_num, dict(zip(header, fields)))
 
         if not is_valid:
-            rejected += 1
-            if len(rejected_samples) < 20:
-                rejected_samples.append({
+            stats["rejected"] += 1
+            stats["rejected_columns"].update(_rejected_columns(error_msg))
+            if len(stats["rejected_samples"]) < MAX_REJECTED_SAMPLES:
+                stats["rejected_samples"].append({
                     "row": row_num,
                     "errors": error_msg,
                     "raw_values": raw_values
                 })
             continue
 
-        # Insert row
-        insert_sql = f"""
-        INSERT INTO {TABLE_NAME} (
-            [price], [price_per_meter], [offer_type], [floor], [area], [rooms],
-            [offer_type_of_building], [market], [city_name], [voivodeship], [month], [year],
-            [population], [longitude], [latitude]
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-
-        values = (
-            converted["price"],
-            converted["price_per_meter"],
-            converted["offer_type"],
-            converted["floor"],
-            converted["area"],
-            converted["rooms"],
-            converted["offer_type_of_building"],
-            converted["market"],
-            converted["city_name"],
-            converted["voivodeship"],
-            converted["month"],
-            converted["year"],
-            converted["population"],
-            converted["longitude"],
-            converted["latitude"]
-        )
+        yield row_num, tuple(converted[col_name] for col_name in COLUMN_DEFS)
+
+
+def batch_rows(converted_rows, batch_size):
+    """Group converted rows into lists of at most batch_size."""
+    batch = []
+    for item in converted_rows:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def write_batches(backend, cursor, batches, stats, metrics=None, on_commit=None):
+    """Insert each batch and update the inserted/rejected counts in stats.
+
+    on_commit(batch, inserted_rows) is called after each batch has been
+    committed, with the rows of the batch the database accepted.
+    """
+    for batch in batches:
+        inserted_rows, batch_rejected = _timed_insert(backend, cursor, batch, metrics)
+        stats["inserted"] += len(inserted_rows)
+        stats["rejected"] += batch_rejected
+        stats["rejected_by_database"] += batch_rejected
+        if on_commit is not None:
+            on_commit(batch, inserted_rows)
+
+
+def _timed_insert(backend, cursor, batch, metrics):
+    """Insert one batch, recording its latency in metrics when given."""
+    if metrics is None:
+        return backend.insert_batch(cursor, batch)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    result = backend.insert_batch(cursor, batch)
+    metrics.observe_batch(len(batch), time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+    return result
+
+
+def write_batches_parallel(backend, batches, stats, connections, metrics=None, on_commit=None):
+    """Insert batches over several connections, one writer thread per connection.
+
+    Each writer opens its own connection with backend.connect() and commits
+    its own batches. If any writer fails, no further batches are handed out
+    and the first error is raised once all writers have stopped.
+    on_commit(batch, inserted_rows) is called on this thread, not the
+    writers', for every committed batch, in the order the writers finish them.
+    """
+    work = queue.Queue(maxsize=connections * 2)
+    done = queue.Queue()
+    lock = threading.Lock()
+    errors = []
 
+    def report_done():
+        while True:
+            try:
+                batch, inserted_rows = done.get_nowait()
+            except queue.Empty:
+                return
+            if on_commit is not None:
+                on_commit(batch, inserted_rows)
+
+    def writer():
+        conn = None
         try:
-            cursor.execute(insert_sql, values)
-            inserted += 1
+            conn = backend.connect()
+            cursor = backend.cursor(conn)
+            while True:
+                batch = work.get()
+                if batch is None:
+                    break
+                inserted_rows, batch_rejected = _timed_insert(backend, cursor, batch, metrics)
+                with lock:
+                    stats["inserted"] += len(inserted_rows)
+                    stats["rejected"] += batch_rejected
+                    stats["rejected_by_database"] += batch_rejected
+                done.put((batch, inserted_rows))
         except Exception as e:
-            rejected += 1
-            print(f"✗ Row {row_num}: {str(e)}")
+            with lock:
+                errors.append(e)
+            # Keep draining so the producer never blocks on a full queue
+            while work.get() is not None:
+                pass
+        finally:
+            if conn is not None:
+                conn.close()
+
+    threads = [threading.Thread(target=writer, name=f"writer-{i}", daemon=True) for i in range(connections)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for batch in batches:
+            if errors:
+                break
+            work.put(batch)
+            report_done()
+    finally:
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+        report_done()
+
+    if errors:
+        raise errors[0]
+
+
+def mmap_csv_chunks(filepath, chunk_bytes=DEFAULT_CHUNK_BYTES, start=None, first_row=2):
+    """Yield (start, end, first_row) byte ranges of a CSV file that each hold whole records.
+
+    The file is memory-mapped and ranges end just after a newline that is
+    outside quotes, so quoted offer_title values with commas or line breaks
+    are never cut. first_row is the row number of the first record in the
+    range (see count_records), so a worker can parse a range on its own. The
+    header line is not part of any range. start, a record boundary, skips
+    everything before it and numbers rows from first_row.
+    """
+    with open(filepath, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if start is None:
+                start = _record_end(mm, 0, 0)
+            while start < size:
+                end = _record_end(mm, start, chunk_bytes)
+                yield start, end, first_row
+                first_row += count_records(mm[start:end])
+                start = end
+
+
+def _record_end(mm, start, chunk_bytes):
+    """Return the offset just after the first record end at or after start + chunk_bytes."""
+    pos = min(start + chunk_bytes, len(mm))
+    in_quotes = mm[start:pos].count(b'"') & 1
+    while True:
+        newline = mm.find(b"\n", pos)
+        if newline == -1:
+            return len(mm)
+        in_quotes ^= mm[pos:newline].count(b'"') & 1
+        pos = newline + 1
+        if not in_quotes:
+            return pos
+
+
+def count_records(data):
+    """Count the CSV records in data, a run of whole records, as csv.reader reads them.
+
+    Line breaks inside quoted values do not end a record, and blank lines
+    are skipped without being counted, as csv.DictReader does.
+    """
+    if not data:
+        return 0
+    quoted = b"".join(_QUOTED_VALUE.findall(data))
+    records = data.count(b"\n") - quoted.count(b"\n")
+    records -= len(_BLANK_LINE.findall(data)) - len(_BLANK_LINE.findall(quoted))
+    if data.startswith((b"\n", b"\r\n")):
+        records -= 1
+    if not data.endswith(b"\n"):
+        records += 1    # the last record has no line break
+    return records
+
+
+def iter_compressed_chunks(filepath, chunk_bytes=DEFAULT_CHUNK_BYTES, block_size=1024 * 1024, start=None,
+                           first_row=2):
+    """Yield (start, end, first_row, data) for the chunks of a compressed CSV file, decompressing it once.
+
+    The ranges are those mmap_csv_chunks finds in the decompressed data;
+    data holds their bytes, since a compressed file cannot be read from the
+    middle.
+    """
+    buffer = bytearray()
+    buffer_start = start or 0
+
+    with open_input(filepath) as f:
+        if start is not None:
+            _seek_input(f, start)
+
+        def blocks():
+            for block in iter(lambda: f.read(block_size), b""):
+                buffer.extend(block)
+                yield block
+
+        previous = None
+        for boundary in _record_boundaries(blocks(), chunk_bytes, start):
+            if previous is not None and boundary > previous:
+                data = bytes(buffer[previous - buffer_start:boundary - buffer_start])
+                yield previous, boundary, first_row, data
+                first_row += count_records(data)
+            del buffer[:boundary - buffer_start]
+            buffer_start = previous = boundary
+
+
+def _record_boundaries(blocks, chunk_bytes, start=None):
+    """Yield the offsets of the chunk boundaries in a stream of blocks, ending with its end offset."""
+    base = 0        # stream offset of the current block
+    in_quotes = 0   # quote parity at block[pos]
+    wanted = 0      # next boundary is the first record end at or after this offset
+    last = None
+    if start is not None:
+        base = last = start
+        wanted = start + chunk_bytes
+        yield start
+
+    for block in blocks:
+        pos = 0
+        while True:
+            target = wanted - base
+            if target >= len(block):
+                break
+            if target > pos:
+                in_quotes ^= block.count(b'"', pos, target) & 1
+                pos = target
+            newline = block.find(b"\n", pos)
+            if newline == -1:
+                break
+            in_quotes ^= block.count(b'"', pos, newline) & 1
+            pos = newline + 1
+            if not in_quotes:
+                last = base + pos
+                wanted = last + chunk_bytes
+                yield last
+
+        in_quotes ^= block.count(b'"', pos) & 1
+        base += len(block)
+
+    if last is None or last < base:
+        yield base
+
+
+def _convert_chunk_worker(task):
+    """Convert one byte range of the CSV in a worker process.
+
+    A range of a plain file is read from the worker's own memory map of it;
+    compressed files send the data along. Rows are numbered from the
+    first_row of the range.
+    """
+    filepath, start, end, first_row, data, header, engine, columnar_backend, chunk_size, track_offsets = task
+    if data is None:
+        with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)[start:end]
+            try:
+                records, offsets = _parse_chunk(view, start, track_offsets)
+            finally:
+                view.release()
+    else:
+        records, offsets = _parse_chunk(data, start, track_offsets)
+
+    stats = new_import_stats()
+    converted = list(convert_rows(header, enumerate(records, start=first_row), stats, engine, columnar_backend,
+                                  chunk_size))
+    if offsets is not None:
+        offsets = [offsets[row_num - first_row] for row_num, _ in converted]
+    return (len(records), converted, stats["rejected"], stats["rejected_samples"], stats["rejected_columns"],
+            offsets)
+
+
+def _parse_chunk(data, start, track_offsets):
+    """Parse the records of a chunk starting at byte offset start, with their end offsets if tracked."""
+    if not track_offsets:
+        # The chunk is decoded at once; newline=None translates line endings like open() does in read_csv
+        text = str(data, "utf-8")
+        return [fields for fields in csv.reader(io.StringIO(text, newline=None)) if fields], None
+
+    lines = _TrackedLines(io.BytesIO(data), start)
+    records = []
+    offsets = []
+    for fields in csv.reader(lines):
+        if fields:
+            records.append(fields)
+            offsets.append(lines.offset)
+    return records, offsets
+
+
+def convert_rows_parallel(filepath, stats, workers, engine=DEFAULT_VALIDATION_ENGINE,
+                          columnar_backend=DEFAULT_COLUMNAR_BACKEND, chunk_size=DEFAULT_BATCH_SIZE,
+                          chunk_bytes=DEFAULT_CHUNK_BYTES, positions=None, start=None):
+    """Convert the CSV in a pool of worker processes, yielding (row_num, values) in file order.
+
+    positions and start work as in read_csv; positions only receives the
+    valid rows, which are the only ones a batch can end with.
+    """
+    converted = convert_files_parallel([filepath], [stats], workers, engine, columnar_backend, chunk_size,
+                                       chunk_bytes, [positions], [start])
+    return ((row_num, values) for _, row_num, values in converted)
+
+
+def convert_files_parallel(filepaths, file_stats, workers, engine=DEFAULT_VALIDATION_ENGINE,
+                           columnar_backend=DEFAULT_COLUMNAR_BACKEND, chunk_size=DEFAULT_BATCH_SIZE,
+                           chunk_bytes=DEFAULT_CHUNK_BYTES, positions=None, starts=None):
+    """Convert several CSV files in one pool of worker processes.
+
+    Yields (file index, row_num, values) file after file. The pool works
+    ahead across file boundaries, so the next file is already being parsed
+    while the rows of the current one are written. file_stats, positions and
+    starts hold one entry per file.
+    """
+    sources = []
+    for i, filepath in enumerate(filepaths):
+        print(f"Reading CSV file: {filepath} ({workers} workers)")
+
+        if not Path(filepath).exists():
+            raise FileNotFoundError(f"CSV file not found: {filepath}")
+
+        with open_csv(filepath) as f:
+            header = next(csv.reader(f), [])
+        sources.append((filepath, header, file_stats[i], positions[i] if positions else None,
+                        starts[i] if starts else None))
+
+    return _iter_parallel(sources, workers, engine, columnar_backend, chunk_size, chunk_bytes)
+
+
+def _iter_parallel(sources, workers, engine, columnar_backend, chunk_size, chunk_bytes):
+    """Keep at most two chunks per worker in flight so memory stays bounded.
+
+    Workers read their byte range of a plain file themselves; compressed
+    files are decompressed here and the chunks are sent with their data.
+    """
+    def all_tasks():
+        for i, (filepath, header, _, positions, start) in enumerate(sources):
+            offset, first_row = start if start else (None, 2)   # row 1 is header
+            if is_compressed(filepath):
+                chunks = iter_compressed_chunks(filepath, chunk_bytes, start=offset, first_row=first_row)
+            else:
+                chunks = ((chunk_start, chunk_end, chunk_row, None) for chunk_start, chunk_end, chunk_row
+                          in mmap_csv_chunks(filepath, chunk_bytes, start=offset, first_row=first_row))
+
+            # Look one chunk ahead to know which one is the last of the file
+            task = None
+            for chunk_start, chunk_end, chunk_row, data in chunks:
+                if task is not None:
+                    yield i, False, task
+                task = (filepath, chunk_start, chunk_end, chunk_row, data, header, engine, columnar_backend,
+                        chunk_size, positions is not None)
+            yield i, True, task
+
+    tasks = all_tasks()
+    first_rows = [start[1] if start else 2 for _, _, _, _, start in sources]  # row 1 is header
+    row_bases = list(first_rows)
+    pending = collections.deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def submit_next():
+            for i, last, task in itertools.islice(tasks, 1):
+                pending.append((i, last, task[3] if task else None,
+                                pool.submit(_convert_chunk_worker, task) if task else None))
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while pending:
+            i, last, chunk_row, future = pending.popleft()
+            submit_next()
+            _, _, stats, positions, _ = sources[i]
+            row_base = row_bases[i]
+
+            if future is not None:
+                record_count, converted, rejected, samples, rejected_columns, offsets = future.result()
+                # Only differs from 0 if count_records miscounted an earlier chunk;
+                # the records csv.reader actually found decide the row numbers
+                shift = row_base - chunk_row
+                if shift:
+                    converted = [(row_num + shift, values) for row_num, values in converted]
+                    samples = [dict(sample, row=sample["row"] + shift) for sample in samples]
+
+                stats["rejected"] += rejected
+                stats["rejected_columns"].update(rejected_columns)
+                for sample in samples:
+                    if len(stats["rejected_samples"]) >= MAX_REJECTED_SAMPLES:
+                        break
+                    stats["rejected_samples"].append(sample)
+
+                if positions is not None:
+                    positions.extend((row_num, offset) for (row_num, _), offset in zip(converted, offsets))
+                for row_num, values in converted:
+                    yield i, row_num, values
+                row_bases[i] = row_base + record_count
+
+            if last:
+                print(f"Read {row_bases[i] - first_rows[i]} rows")
+
+
+def read_and_convert(filepath, stats, engine=DEFAULT_VALIDATION_ENGINE, columnar_backend=DEFAULT_COLUMNAR_BACKEND,
+                     chunk_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, metrics=None, positions=None,
+                     start=None):
+    """Return an iterator of (row_num, values) for the valid rows of filepath.
+
+    With metrics the read and convert stages are timed; with workers > 1 the
+    workers read and convert together, so it is all counted as convert.
+    positions and start are passed to the reader for checkpoints (see read_csv).
+    """
+    converted = read_and_convert_files([filepath], [stats], engine, columnar_backend, chunk_size, workers, metrics,
+                                       [positions], [start])
+    return ((row_num, values) for _, row_num, values in converted)
+
+
+def read_and_convert_files(filepaths, file_stats, engine=DEFAULT_VALIDATION_ENGINE,
+                           columnar_backend=DEFAULT_COLUMNAR_BACKEND, chunk_size=DEFAULT_BATCH_SIZE,
+                           workers=DEFAULT_WORKERS, metrics=None, positions=None, starts=None):
+    """Return an iterator of (file index, row_num, values) for the valid rows of several files, in order.
+
+    file_stats, positions and starts hold one entry per file (see read_and_convert).
+    """
+    if workers > 1:
+        converted = convert_files_parallel(filepaths, file_stats, workers, engine, columnar_backend, chunk_size,
+                                           positions=positions, starts=starts)
+        return metrics.timed("convert", converted) if metrics is not None else converted
+
+    converted = _iter_files(filepaths, file_stats, engine, columnar_backend, chunk_size, metrics, positions, starts)
+    return metrics.timed("convert", converted, upstream="read") if metrics is not None else converted
+
+
+def _iter_files(filepaths, file_stats, engine, columnar_backend, chunk_size, metrics, positions, starts):
+    for i, filepath in enumerate(filepaths):
+        header, rows = read_csv(filepath, positions[i] if positions else None, starts[i] if starts else None)
+        if metrics is not None:
+            rows = metrics.timed("read", rows)
+        for row_num, values in convert_rows(header, rows, file_stats[i], engine, columnar_backend, chunk_size):
+            yield i, row_num, values
+
+
+def insert_rows(backend, cursor, converted_rows, stats, batch_size=DEFAULT_BATCH_SIZE,
+                connections=DEFAULT_CONNECTIONS, metrics=None, index=None, checkpoint=None, file_index=0):
+    """Insert converted rows into database as a read -> convert -> batch -> write pipeline.
+
+    With connections > 1 the batches are spread over that many new backend
+    connections instead of going through cursor. With a FingerprintIndex only
+    rows not loaded before are inserted, and the rows the database accepted
+    are committed to the index after every batch. An
+    ImportCheckpoint is saved after every batch and needs one connection;
+    file_index says which of its input files the rows come from.
+    """
+    print("\nValidating and inserting data...")
 
-    cursor.commit()
+    def on_commit(batch, inserted_rows):
+        if index is not None:
+            index.commit(row_fingerprint(values) for _, values in inserted_rows)
+        if checkpoint is not None:
+            checkpoint.record(file_index, batch[-1][0], len(inserted_rows))
 
-    print(f"\nImport Summary:")
+    batches = batch_rows(converted_rows, batch_size)
+    if index is not None:
+        # A batch that is skipped entirely is as good as committed for the checkpoint
+        batches = index.filter_batches(batches, stats, on_commit if checkpoint is not None else None)
+
+    if connections > 1:
+        write_batches_parallel(backend, batches, stats, connections, metrics, on_commit)
+    else:
+        write_batches(backend, cursor, batches, stats, metrics, on_commit)
+        cursor.connection.commit()
+
+
+def _bcp_column_spec(sql_type):
+    """Return (host type, prefix length, data length, struct format) for a staging column."""
+    if sql_type in BCP_NATIVE_TYPES:
+        return BCP_NATIVE_TYPES[sql_type]
+
+    max_length = _nvarchar_length(sql_type)
+    if not max_length:
+        raise ValueError(f"No native BCP mapping for SQL type: {sql_type}")
+    # nvarchar is stored as UTF-16LE, two bytes per character
+    return "SQLNCHAR", 2, max_length * 2, None
+
+
+def _bcp_column_specs():
+    """Return [(col_name, host type, prefix length, data length, struct format)] in column order."""
+    return [(col_name,) + _bcp_column_spec(col_def["sql_type"]) for col_name, col_def in COLUMN_DEFS.items()]
+
+
+def build_format_file():
+    """Build a non-XML BCP format file describing the native bulk load file."""
+    lines = ["10.0", str(len(COLUMN_DEFS))]
+    for i, (col_name, host_type, prefix_len, data_len, _) in enumerate(_bcp_column_specs(), start=1):
+        lines.append(f'{i}\t{host_type}\t{prefix_len}\t{data_len}\t""\t{i}\t{col_name}\t""')
+    return "\r\n".join(lines) + "\r\n"
+
+
+def encode_native_row(values, column_specs):
+    """Encode converted values as one native BCP record.
+
+    Every field carries a length prefix; a prefix of -1 marks NULL.
+    Raises ValueError if a value cannot be represented in its column type.
+    """
+    parts = []
+    for value, (col_name, _, prefix_len, data_len, fmt) in zip(values, column_specs):
+        prefix_fmt = "<b" if prefix_len == 1 else "<h"
+
+        if value is None:
+            parts.append(struct.pack(prefix_fmt, -1))
+            continue
+
+        if fmt is None:
+            data = value.encode("utf-16-le")
+            if len(data) > data_len:
+                raise ValueError(f"{col_name}: value longer than {data_len // 2} characters")
+        else:
+            if isinstance(value, float) and not math.isfinite(value):
+                raise ValueError(f"{col_name}: non-finite value {value}")
+            try:
+                data = struct.pack(fmt, value)
+            except struct.error as e:
+                raise ValueError(f"{col_name}: {e}")
+
+        parts.append(struct.pack(prefix_fmt, len(data)) + data)
+
+    return b"".join(parts)
+
+
+def write_bulk_files(converted_rows, directory, stats, on_written=None):
+    """Write converted rows to a native BCP data file and its format file.
+
+    Rows that cannot be encoded are rejected the same way a failed insert is;
+    on_written(row_num, values) is called for every row that went into the file.
+    Returns (data_path, format_path, rows_written).
+    """
+    os.makedirs(directory, exist_ok=True)
+    data_path = os.path.join(directory, "olx_house_price.dat")
+    format_path = os.path.join(directory, "olx_house_price.fmt")
+
+    with open(format_path, "w", encoding="ascii", newline="") as f:
+        f.write(build_format_file())
+
+    column_specs = _bcp_column_specs()
+    written = 0
+    with open(data_path, "wb") as f:
+        for row_num, values in converted_rows:
+            try:
+                record = encode_native_row(values, column_specs)
+            except ValueError as e:
+                stats["rejected"] += 1
+                print(f"✗ Row {row_num}: {str(e)}")
+                continue
+            f.write(record)
+            written += 1
+            if on_written is not None:
+                on_written(row_num, values)
+
+    return data_path, format_path, written
+
+
+def build_bulk_insert_sql(data_path, format_path):
+    """Build the BULK INSERT statement for a data/format file pair.
+
+    TABLOCK into the heap staging table allows a minimally logged load
+    under the SIMPLE or BULK_LOGGED recovery model.
+    """
+    def quote(path):
+        return "'" + str(path).replace("'", "''") + "'"
+
+    return (
+        f"BULK INSERT {TABLE_NAME}\n"
+        f"FROM {quote(data_path)}\n"
+        f"WITH (FORMATFILE = {quote(format_path)}, TABLOCK, KEEPNULLS, MAXERRORS = 0)"
+    )
+
+
+def bulk_load_rows(cursor, converted_rows, stats, bulk_dir=DEFAULT_BULK_DIR, metrics=None, index=None):
+    """Validate rows into a native BCP file and load it with a single BULK INSERT.
+
+    bulk_dir must be readable by the SQL Server service as well as writable here.
+    With a FingerprintIndex only rows not loaded before go into the file.
+    """
+    metrics = metrics or ImportMetrics()
+    print("\nValidating and writing bulk load file...")
+
+    fingerprints = []
+
+    def on_written(row_num, values):
+        fingerprints.append(row_fingerprint(values))
+
+    if index is not None:
+        batches = index.filter_batches(batch_rows(converted_rows, DEFAULT_BATCH_SIZE), stats)
+        converted_rows = itertools.chain.from_iterable(batches)
+
+    with metrics.stage("write", upstream="convert") as stage:
+        data_path, format_path, written = write_bulk_files(converted_rows, bulk_dir, stats,
+                                                           on_written if index is not None else None)
+        stage["rows"] = written
+
+    bulk_sql = build_bulk_insert_sql(data_path, format_path)
+    print(f"Bulk loading {written} rows from {data_path}")
+    with metrics.stage("load") as stage:
+        cursor.execute(bulk_sql)
+        cursor.commit()
+        stage["rows"] = written
+    metrics.add_round_trips(2)
+    stats["inserted"] = written
+    if index is not None:
+        # MAXERRORS = 0: the BULK INSERT loaded every row of the file or failed
+        index.commit(fingerprints)
+
+    os.remove(data_path)
+    os.remove(format_path)
+
+
+_FLOAT_COLUMNS = [i for i, col_def in enumerate(COLUMN_DEFS.values()) if col_def["sql_type"] == "float"]
+_INTEGER_COLUMNS = [(i,) + INTEGER_RANGES[col_def["sql_type"]] for i, col_def in enumerate(COLUMN_DEFS.values())
+                    if col_def["sql_type"] in INTEGER_RANGES]
+
+
+def fits_column_types(values):
+    """False if the database would reject converted values: a non-finite float or an integer out of range."""
+    for i in _FLOAT_COLUMNS:
+        if values[i] is not None and not math.isfinite(values[i]):
+            return False
+    for i, low, high in _INTEGER_COLUMNS:
+        if values[i] is not None and not low <= values[i] <= high:
+            return False
+    return True
+
+
+def arrow_schema():
+    """Arrow schema of the staging columns, with the types declared in COLUMN_DEFS."""
+    fields = []
+    for col_name, col_def in COLUMN_DEFS.items():
+        if col_name in DICTIONARY_COLUMNS:
+            arrow_type = pa.dictionary(pa.int32(), pa.string())
+        elif col_def["sql_type"] in ARROW_TYPES:
+            arrow_type = pa.type_for_alias(ARROW_TYPES[col_def["sql_type"]])
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(col_name, arrow_type, nullable=col_def["nullable"]))
+    return pa.schema(fields)
+
+
+class ColumnarExport:
+    """Writes converted rows to a Parquet or Arrow IPC file, one row group per row_group_size rows.
+
+    Rows are buffered and turned into columns when a row group is full.
+    Rows the database would reject (non-finite floats, integers out of range
+    for their type) are left out and counted in rejected. Dictionary columns
+    keep one dictionary for the whole file that only grows, as Arrow IPC
+    files allow deltas but not replacements. The file is written under a
+    temporary name and only replaces path once close(True) is called.
+    """
+
+    def __init__(self, path, file_format="parquet", row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        if pa is None:
+            raise ImportError("--emit requires pyarrow to be installed")
+        if file_format not in EMIT_FILES:
+            raise ValueError(f"Unknown emit format: {file_format}")
+        self.path = path
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.schema = arrow_schema()
+        self.temp_path = f"{path}.tmp"
+        self.rows = []
+        self.row_count = 0
+        self.row_groups = 0
+        self.rejected = 0
+        self.dictionaries = {col_name: {} for col_name in DICTIONARY_COLUMNS}
+
+        if file_format == "parquet":
+            self.writer = pq.ParquetWriter(self.temp_path, self.schema, use_dictionary=list(DICTIONARY_COLUMNS))
+        else:
+            options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self.writer = pa.ipc.new_file(self.temp_path, self.schema, options=options)
+
+    def tee(self, converted_rows):
+        """Pass (row_num, values) pairs through, adding every row the database accepts to the file."""
+        for row in converted_rows:
+            if fits_column_types(row[1]):
+                self.rows.append(row[1])
+                if len(self.rows) >= self.row_group_size:
+                    self.flush()
+            else:
+                self.rejected += 1
+            yield row
+
+    def flush(self):
+        """Write the buffered rows as one row group (a record batch in Arrow IPC)."""
+        if not self.rows:
+            return
+        arrays = []
+        for field, values in zip(self.schema, zip(*self.rows)):
+            if field.name in self.dictionaries:
+                codes = self.dictionaries[field.name]
+                indices = [None if value is None else codes.setdefault(value, len(codes)) for value in values]
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()),
+                                                             pa.array(list(codes), pa.string())))
+            else:
+                arrays.append(pa.array(values, field.type))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self.file_format == "parquet":
+            self.writer.write_batch(batch, row_group_size=len(self.rows))
+        else:
+            self.writer.write_batch(batch)
+        self.row_count += len(self.rows)
+        self.row_groups += 1
+        self.rows = []
+
+    def close(self, complete):
+        """Finish the file and move it into place, or remove it if the import did not complete."""
+        if complete:
+            self.flush()
+        self.writer.close()
+        if complete:
+            os.replace(self.temp_path, self.path)
+            print(f"Wrote {self.row_count} rows in {self.row_groups} row groups to {self.path}"
+                  + (f" ({self.rejected} rows with values out of range left out)" if self.rejected else ""))
+        elif Path(self.temp_path).exists():
+            os.remove(self.temp_path)
+
+
+def import_files(backend, cursor, filepaths, stats, batch_size=DEFAULT_BATCH_SIZE, load_mode=DEFAULT_LOAD_MODE,
+                 bulk_dir=DEFAULT_BULK_DIR, engine=DEFAULT_VALIDATION_ENGINE, columnar_backend=DEFAULT_COLUMNAR_BACKEND,
+                 workers=DEFAULT_WORKERS, connections=DEFAULT_CONNECTIONS, metrics=None, index=None,
+                 checkpoint=None, start=None, export=None, builder=None):
+    """Load one or more CSV files as a single Import step.
+
+    Every file goes through the same batching, commit, index and checkpoint
+    path in order; with workers > 1 one process pool reads ahead across the
+    files. stats["files"] gets the counts and rejected samples of each file
+    and stats the combined counts. start=(file index, offset, row_num)
+    resumes at a checkpoint, skipping the files before it. A ColumnarExport
+    and a StarSchemaBuilder get every valid row, including rows the index
+    skips.
+    """
+    first_file = start[0] if start else 0
+    stats["files"] = [dict(new_import_stats(), file=filepath) for filepath in filepaths[first_file:]]
+
+    count = len(filepaths) - first_file
+    positions = [checkpoint.positions_for(first_file + i) for i in range(count)] if checkpoint else None
+    starts = [(start[1], start[2])] + [None] * (count - 1) if start else None
+    converted = read_and_convert_files(filepaths[first_file:], stats["files"], engine, columnar_backend, batch_size,
+                                       workers, metrics, positions, starts)
+
+    for i, rows in itertools.groupby(converted, key=operator.itemgetter(0)):
+        file_stats = stats["files"][i]
+        if len(filepaths) > 1:
+            print(f"\nFile {first_file + i + 1}/{len(filepaths)}: {file_stats['file']}")
+        rows = ((row_num, values) for _, row_num, values in rows)
+        if export is not None:
+            rows = export.tee(rows)
+        if builder is not None:
+            rows = builder.tee(rows)
+        if load_mode == "bulk":
+            bulk_load_rows(cursor, rows, file_stats, bulk_dir, metrics, index)
+        else:
+            insert_rows(backend, cursor, rows, file_stats, batch_size, connections, metrics, index, checkpoint,
+                        first_file + i)
+
+    combine_file_stats(stats)
+    print_import_summary(stats)
+
+
+def combine_file_stats(stats):
+    """Add up the per-file counts in stats["files"] into stats."""
+    files = stats["files"]
+    for key in ("inserted", "rejected", "skipped", "rejected_by_database"):
+        stats[key] = sum(file_stats[key] for file_stats in files)
+    stats["rejected_columns"] = sum((file_stats["rejected_columns"] for file_stats in files), collections.Counter())
+    samples = itertools.chain.from_iterable(file_stats["rejected_samples"] for file_stats in files)
+    stats["rejected_samples"] = list(itertools.islice(samples, MAX_REJECTED_SAMPLES))
+
+
+def print_import_summary(stats):
+    """Print inserted/rejected counts and a sample of rejected rows, per file when there are several."""
+    inserted = stats["inserted"]
+    rejected = stats["rejected"]
+    rejected_samples = stats["rejected_samples"]
+    skipped = stats.get("skipped", 0)
+    files = stats.get("files", [])
+
+    print("\nImport Summary:")
     print(f"  Rows inserted: {inserted}")
     print(f"  Rows rejected: {rejected}")
-    print(f"  Total rows: {inserted + rejected}")
-
+    if skipped:
+        print(f"  Rows skipped (already loaded): {skipped}")
+    print(f"  Total rows: {inserted + rejected + skipped}")
+
+    if len(files) > 1:
+        for file_stats in files:
+            line = f"  {file_stats['file']}: {file_stats['inserted']} inserted, {file_stats['rejected']} rejected"
+            if file_stats["skipped"]:
+                line += f", {file_stats['skipped']} skipped"
+            print(line)
+        for file_stats in files:
+            _print_rejected_samples(file_stats["rejected_samples"], f" in {file_stats['file']}")
+    else:
+        _print_rejected_samples(rejected_samples)
+
+
+def _print_rejected_samples(rejected_samples, where=""):
     if rejected_samples:
-        print(f"\nSample of rejected rows (first {len(rejected_samples)}):")
+        print(f"\nSample of rejected rows{where} (first {len(rejected_samples)}):")
         for sample in rejected_samples:
             print(f"\n  Row {sample['row']}")
-            print(f"  Validation errors:")
+            print("  Validation errors:")
             print(sample['errors'])
-            print(f"  Raw values:")
+            print("  Raw values:")
             for field in REQUIRED_FIELDS:
                 raw_val = sample['raw_values'].get(field, "")
                 if not raw_val:
@@ -217,94 +1599,1568 @@ def insert_rows(cursor, rows):
                     print(f"    {field}: {raw_val}")
 
 
-def execute_sql_file(cursor, filepath, description):
-    """Execute SQL script from file."""
-    print(f"\nExecuting {description}...")
+class ImportMetrics:
+    """Structured metrics for one importer run.
+
+    main() times every step (connect, import, schema, data, verify) with
+    step(). Inside the import step, timed() wraps the streaming read and
+    convert stages and charges each only for producing its own items,
+    observe_batch() records the write stage and the batch latency histogram,
+    and stage() times blocks such as the bulk load. Backends count database
+    round trips with add_round_trips().
+
+    Events are appended to jsonl_path as JSON lines while the run goes on, and
+    finish() writes the totals to prometheus_path in the Prometheus text format.
+    Without either path the per-row stage timing is skipped unless enabled is set.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, enabled=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.enabled = bool(jsonl_path or prometheus_path) if enabled is None else enabled
+        self.lock = threading.Lock()
+        self.steps = {}
+        self.stages = {}
+        self.batch_buckets = [0] * len(BATCH_LATENCY_BUCKETS)
+        self.batch_count = 0
+        self.batch_seconds = 0.0
+        self.round_trips = 0
+        self.rows = {"inserted": 0, "rejected": 0, "skipped": 0}
+        self.rejected_columns = collections.Counter()
+        self.rejected_by_database = 0
+
+    def emit(self, event, **fields):
+        """Append one event to the JSON lines file."""
+        if not self.jsonl_path:
+            return
+        record = {"time": datetime.now(timezone.utc).isoformat(), "event": event}
+        record.update(fields)
+        with self.lock, open(self.jsonl_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    @contextmanager
+    def step(self, name):
+        """Time one step of main() and emit it, also when it fails."""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        status = "failed"
+        try:
+            yield
+            status = "ok"
+        finally:
+            self.steps[name] = {
+                "wall_seconds": time.perf_counter() - wall_start,
+                "cpu_seconds": time.process_time() - cpu_start,
+                "status": status,
+            }
+            self.emit("step", step=name, **_rounded(self.steps[name]))
+
+    def _add_stage(self, name, wall, cpu, rows, upstream=None):
+        with self.lock:
+            stage = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0, "rows": 0, "upstream": upstream})
+            stage["wall"] += wall
+            stage["cpu"] += cpu
+            stage["rows"] += rows
+
+    def timed(self, name, iterable, upstream=None, chunk_size=1000):
+        """Wrap a streaming stage; upstream names the stage whose items it consumes.
+
+        Items are pulled chunk_size at a time so the clocks are read per chunk
+        rather than per row.
+        """
+        if not self.enabled:
+            return iterable
+        return self._timed(name, iterable, upstream, chunk_size)
+
+    def _timed(self, name, iterable, upstream, chunk_size):
+        iterator = iter(iterable)
+        wall = cpu = 0.0
+        rows = 0
+        try:
+            while True:
+                wall_start = time.perf_counter()
+                cpu_start = time.thread_time()
+                try:
+                    chunk = list(itertools.islice(iterator, chunk_size))
+                finally:
+                    wall += time.perf_counter() - wall_start
+                    cpu += time.thread_time() - cpu_start
+                if not chunk:
+                    return
+                rows += len(chunk)
+                yield from chunk
+        finally:
+            self._add_stage(name, wall, cpu, rows, upstream)
+
+    @contextmanager
+    def stage(self, name, upstream=None):
+        """Time a block as a stage; set "rows" on the yielded dict to count rows."""
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        counts = {"rows": 0}
+        try:
+            yield counts
+        finally:
+            self._add_stage(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start,
+                            counts["rows"], upstream)
+
+    def observe_batch(self, rows, wall, cpu):
+        """Record one insert batch in the write stage and the latency histogram."""
+        self._add_stage("write", wall, cpu, rows)
+        with self.lock:
+            self.batch_count += 1
+            self.batch_seconds += wall
+            for i, bound in enumerate(BATCH_LATENCY_BUCKETS):
+                if wall <= bound:
+                    self.batch_buckets[i] += 1
+                    break
+
+    def add_round_trips(self, count=1):
+        with self.lock:
+            self.round_trips += count
+
+    def stage_totals(self):
+        """Return {stage: totals}, each stage excluding the time spent in its upstream stage."""
+        totals = {}
+        for name, stage in self.stages.items():
+            wall, cpu = stage["wall"], stage["cpu"]
+            upstream = self.stages.get(stage["upstream"])
+            if upstream is not None:
+                wall = max(wall - upstream["wall"], 0.0)
+                cpu = max(cpu - upstream["cpu"], 0.0)
+            totals[name] = {
+                "wall_seconds": wall,
+                "cpu_seconds": cpu,
+                "rows": stage["rows"],
+                "rows_per_sec": stage["rows"] / wall if wall else None,
+            }
+        return totals
+
+    def batch_histogram(self):
+        """Return the cumulative batch latency buckets as {upper bound: count}."""
+        cumulative = itertools.accumulate(self.batch_buckets)
+        histogram = {str(bound): count for bound, count in zip(BATCH_LATENCY_BUCKETS, cumulative)}
+        histogram["+Inf"] = self.batch_count
+        return histogram
+
+    def record_import(self, stats):
+        """Take the final counts of the import step and emit its stages, batches and rejects."""
+        self.rows = {"inserted": stats["inserted"], "rejected": stats["rejected"], "skipped": stats["skipped"]}
+        self.rejected_columns = collections.Counter(stats["rejected_columns"])
+        self.rejected_by_database = stats["rejected_by_database"]
+
+        for name, totals in self.stage_totals().items():
+            self.emit("stage", step="import", stage=name, **_rounded(totals))
+        self.emit("batches", count=self.batch_count, sum_seconds=round(self.batch_seconds, 6),
+                  buckets=self.batch_histogram())
+        self.emit("rejected", total=stats["rejected"], by_database=self.rejected_by_database,
+                  columns=dict(self.rejected_columns))
+
+    def finish(self, status):
+        """Emit the run totals and write the Prometheus file."""
+        wall = sum(step["wall_seconds"] for step in self.steps.values())
+        cpu = sum(step["cpu_seconds"] for step in self.steps.values())
+        total_rows = sum(self.rows.values())
+        self.emit("run", status=status, wall_seconds=round(wall, 6), cpu_seconds=round(cpu, 6),
+                  rows_inserted=self.rows["inserted"], rows_rejected=self.rows["rejected"],
+                  rows_skipped=self.rows["skipped"],
+                  rows_per_sec=round(total_rows / wall, 1) if wall else None, db_round_trips=self.round_trips)
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path, status)
+
+    def write_prometheus(self, filepath, status):
+        """Write the totals in the Prometheus text format, atomically for the node exporter textfile collector."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP olx_import_{name} {help_text}")
+            lines.append(f"# TYPE olx_import_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f"olx_import_{name}{{{label_text}}} {value}" if label_text
+                             else f"olx_import_{name} {value}")
+
+        metric("success", "gauge", "1 if the last run succeeded", [({}, int(status == "ok"))])
+        metric("step_wall_seconds", "gauge", "Wall time per step",
+               [({"step": name}, round(step["wall_seconds"], 6)) for name, step in self.steps.items()])
+        metric("step_cpu_seconds", "gauge", "CPU time of the importer process per step",
+               [({"step": name}, round(step["cpu_seconds"], 6)) for name, step in self.steps.items()])
+        stages = self.stage_totals()
+        metric("stage_wall_seconds", "gauge", "Wall time per import stage",
+               [({"stage": name}, round(stage["wall_seconds"], 6)) for name, stage in stages.items()])
+        metric("stage_cpu_seconds", "gauge", "CPU time per import stage",
+               [({"stage": name}, round(stage["cpu_seconds"], 6)) for name, stage in stages.items()])
+        metric("stage_rows_per_second", "gauge", "Rows per second per import stage",
+               [({"stage": name}, round(stage["rows_per_sec"] or 0, 1)) for name, stage in stages.items()])
+        metric("rows", "gauge", "Rows in the last run by result",
+               [({"result": result}, count) for result, count in self.rows.items()])
+        metric("rejected_rows", "gauge", "Rows rejected by validation per column, or by the database",
+               [({"column": column}, count) for column, count in sorted(self.rejected_columns.items())]
+               + [({"column": "(database)"}, self.rejected_by_database)])
+        metric("db_round_trips", "gauge", "Statements and commits sent to the database", [({}, self.round_trips)])
+
+        lines.append("# HELP olx_import_batch_seconds Insert batch latency")
+        lines.append("# TYPE olx_import_batch_seconds histogram")
+        for bound, count in self.batch_histogram().items():
+            lines.append(f'olx_import_batch_seconds_bucket{{le="{bound}"}} {count}')
+        lines.append(f"olx_import_batch_seconds_sum {round(self.batch_seconds, 6)}")
+        lines.append(f"olx_import_batch_seconds_count {self.batch_count}")
+
+        temp_path = f"{filepath}.tmp"
+        with open(temp_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, filepath)
+
+
+def _rounded(totals):
+    """Round the float values of a totals dict for output."""
+    return {key: round(value, 6) if isinstance(value, float) else value for key, value in totals.items()}
+
+
+def row_fingerprint(values):
+    """Stable 64-bit fingerprint of a converted row, as a signed integer for SQLite."""
+    digest = hashlib.blake2b(repr(tuple(values)).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class FingerprintIndex:
+    """Fingerprints of the rows already in the staging table, kept in a local SQLite file.
+
+    Each fingerprint is stored with the number of staged rows that have it,
+    since the same listing can legitimately appear more than once in an
+    export. The index belongs to one backend database (owner) and remembers
+    how many rows the staging table had when it was last committed. If either
+    no longer matches, the index is rebuilt from the staging table before
+    use, so a failed or full import can never make incremental imports skip
+    rows that are not in the table.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # loaded: rows of earlier runs, added: rows committed by the current run
+        self.conn.execute("CREATE TABLE IF NOT EXISTS fingerprint_counts (fp INTEGER PRIMARY KEY, "
+                          "loaded INTEGER NOT NULL, added INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID")
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'fingerprints'").fetchone():
+            # An index without counts cannot tell how many copies of a row are staged
+            self.conn.execute("DROP TABLE fingerprints")
+            self._set_meta(rows=-1)
+        self.conn.commit()
+        self.row_count = 0
+
+    def _meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values):
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              [(key, str(value)) for key, value in values.items()])
+
+    def is_valid_for(self, owner, table_rows):
+        return self._meta("owner") == owner and self._meta("rows") == str(table_rows)
+
+    def rebuild(self, owner, rows):
+        """Replace the index with the fingerprints of rows read back from the staging table."""
+        self.conn.execute("DELETE FROM fingerprint_counts")
+        count = 0
+        for chunk in iter(lambda: list(itertools.islice(rows, 10000)), []):
+            counts = collections.Counter(row_fingerprint(values) for values in chunk)
+            self.conn.executemany(
+                "INSERT INTO fingerprint_counts (fp, loaded) VALUES (?, ?) "
+                "ON CONFLICT (fp) DO UPDATE SET loaded = loaded + excluded.loaded", counts.items())
+            count += len(chunk)
+        self.row_count = count
+        self._set_meta(owner=owner, rows=count)
+        self.conn.commit()
+
+    def open_for(self, owner, table_rows, read_table):
+        """Make the index match the staging table, rebuilding it from read_table() if needed."""
+        if self.is_valid_for(owner, table_rows):
+            self.row_count = table_rows
+            # Rows committed by the last run count as loaded for this one
+            self.conn.execute("UPDATE fingerprint_counts SET loaded = loaded + added, added = 0 WHERE added > 0")
+            self.conn.commit()
+            print(f"Fingerprint index {self.path}: {table_rows} rows already loaded")
+            return
+        print(f"Rebuilding fingerprint index {self.path} from {table_rows} staged rows...")
+        self.rebuild(owner, read_table())
+
+    def invalidate(self, owner):
+        """Mark the index stale after the staging table was reloaded by a full import."""
+        if self._meta("owner") == owner:
+            self._set_meta(rows=-1)
+            self.conn.commit()
+
+    def filter_batches(self, batches, stats, on_skipped=None):
+        """Drop rows already loaded by earlier runs, counting them in stats["skipped"].
+
+        A fingerprint that earlier runs loaded n times skips its first n
+        occurrences in this run; later occurrences, and rows whose fingerprint
+        only this run has seen, are passed on. Batches with no rows to pass
+        on are not yielded; on_skipped(batch, []) is called for them instead.
+        """
+        skipped = collections.Counter()
+        for batch in batches:
+            fingerprints = [row_fingerprint(values) for _, values in batch]
+            loaded = {}
+            unique = list(set(fingerprints))
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                loaded.update(self.conn.execute(
+                    f"SELECT fp, loaded FROM fingerprint_counts WHERE loaded > 0 "
+                    f"AND fp IN ({','.join('?' * len(chunk))})", chunk))
+
+            new_rows = []
+            for item, fp in zip(batch, fingerprints):
+                if skipped[fp] < loaded.get(fp, 0):
+                    skipped[fp] += 1
+                    continue
+                new_rows.append(item)
+
+            stats["skipped"] += len(batch) - len(new_rows)
+            if new_rows:
+                yield new_rows
+            elif on_skipped is not None:
+                on_skipped(batch, [])
+
+    def commit(self, fingerprints):
+        """Add the fingerprints of rows the database has committed and commit them with the row count."""
+        counts = collections.Counter(fingerprints)
+        self.conn.executemany(
+            "INSERT INTO fingerprint_counts (fp, loaded, added) VALUES (?, 0, ?) "
+            "ON CONFLICT (fp) DO UPDATE SET added = added + excluded.added", counts.items())
+        self.row_count += sum(counts.values())
+        self._set_meta(rows=self.row_count)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.rollback()
+        self.conn.close()
+
+
+class _FilePositions:
+    """Adds the file index to the (row_num, end_offset) pairs a reader appends."""
+
+    def __init__(self, positions, file_index):
+        self.positions = positions
+        self.file_index = file_index
+
+    def append(self, position):
+        self.positions.append((self.file_index,) + position)
+
+    def extend(self, positions):
+        self.positions.extend((self.file_index,) + position for position in positions)
+
+
+class ImportCheckpoint:
+    """Last committed position of the Import step in its CSV files, kept in a JSON file.
+
+    Readers append (file index, row_num, end_offset) to positions; after each
+    batch commits, record() moves to the position of its last row and
+    rewrites the file. A resumed run checks that the file still describes
+    the same CSV files, database and number of staged rows before seeking.
+    """
+
+    def __init__(self, path, filepaths, owner):
+        self.path = path
+        self.filepaths = filepaths
+        self.owner = owner
+        self.positions = collections.deque()
+        self.state = None
+
+    def _inputs(self):
+        inputs = []
+        for filepath in self.filepaths:
+            stat = os.stat(filepath)
+            inputs.append({"input": os.path.abspath(filepath), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+        return inputs
+
+    def positions_for(self, file_index):
+        """Return the positions sink for the reader of one input file."""
+        return _FilePositions(self.positions, file_index)
+
+    def start(self, staged_rows):
+        """Start a new import into a staging table holding staged_rows, dropping any old checkpoint."""
+        self.clear()
+        self.state = {"inputs": self._inputs(), "owner": self.owner, "file": 0, "row": 1, "offset": None,
+                      "inserted": 0, "staged_rows": staged_rows}
+
+    def resume(self, staged_rows):
+        """Load the checkpoint for a resumed run and return (file index, offset, next row_num).
+
+        Raises ValueError if there is nothing to resume or it no longer matches.
+        """
+        if not Path(self.path).exists():
+            raise ValueError(f"No checkpoint to resume from: {self.path}")
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+
+        if state.get("inputs") != self._inputs():
+            raise ValueError(f"Checkpoint {self.path} was written for other input files or versions of them")
+        if state.get("owner") != self.owner:
+            raise ValueError(f"Checkpoint {self.path} was written for another database: {state.get('owner')}")
+        if state.get("staged_rows") != staged_rows:
+            raise ValueError(f"The staging table has {staged_rows} rows, the checkpoint expects "
+                             f"{state.get('staged_rows')}; run the import again without --resume")
+
+        self.state = state
+        filepath = self.filepaths[state["file"]]
+        print(f"Resuming {filepath} after row {state['row']} (byte offset {state['offset']}), "
+              f"{state['inserted']} rows inserted before")
+        return state["file"], state["offset"], state["row"] + 1
+
+    def record(self, file_index, last_row, inserted):
+        """Save the position after last_row of file file_index once the rows up to it are committed."""
+        position = None
+        while self.positions and self.positions[0][:2] <= (file_index, last_row):
+            position = self.positions.popleft()
+        if position is None:
+            return
+
+        self.state["file"], self.state["row"], self.state["offset"] = position
+        self.state["inserted"] += inserted
+        self.state["staged_rows"] += inserted
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        """Remove the checkpoint once the import is complete."""
+        if Path(self.path).exists():
+            os.remove(self.path)
+
+
+def clean_area(area):
+    """CleanArea of OlxData.sql: an area above 1500 lost its decimal point and is divided by 100.
+
+    The result is rounded like cast(... as decimal(12,2)).
+    """
+    if area is None or area <= 1500:
+        return area
+    return float(Decimal(repr(area / 100.0)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def area_bucket(area):
+    """Return (AreaCategory, AreaCode) of a CleanArea, (None, None) when it is missing."""
+    if area is None:
+        return None, None
+    for upper, category, code in AREA_BUCKETS:
+        if area < upper:
+            return category, code
+    return "100+", 10
+
+
+def rooms_category(rooms):
+    """RoomsCategory: the number of rooms, 4 or more rooms are labeled 4+."""
+    return str(rooms) if rooms < 4 else "4+"
+
+
+def parse_month(month):
+    """Month number of a month name, like month(convert(date, [month] + ' 18, 2022', 113)).
+
+    Raises ValueError for a name SQL Server could not convert either.
+    """
+    number = MONTH_NUMBERS.get(month.strip().lower())
+    if number is None:
+        raise ValueError(f"Cannot parse month name: {month!r}")
+    return number
+
+
+def _fold_city(name):
+    """Compare city names case- and accent-insensitively, like the Polish_100_CI_AI collation."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold().replace("ł", "l"))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+_FOLDED_CITY_STATUS = {_fold_city(city): status for city, status in CITY_STATUS_MAP.items()}
+
+
+def city_status(city):
+    """Return (StatusCode, StatusLabel) of a city."""
+    return _FOLDED_CITY_STATUS.get(_fold_city(city), SMALL_TOWN_STATUS)
+
+
+class StarSchemaBuilder:
+    """Builds the OlxData.sql star schema from staging rows in one pass, without a database.
+
+    Dimension members get their surrogate keys from dicts keyed by their
+    natural keys, in the order they are first seen; DimDate is numbered in
+    YearMonth order like the SQL insert. members seeds the dicts with the
+    keys already in the database (see DimensionKeyCache), so new members are
+    numbered after them. tables() reproduces the fact joins of OlxData.sql,
+    including their quirks: DimLocation is joined on the city alone, so a
+    city with several locations gets a fact row for each; the DimProperty
+    join compares isnull(..., 'Unknown') and isnull(floor, 100) and maps 4+
+    to 4, so offers with 5 or more rooms have no fact row; and facts are
+    distinct over their keys, area and price. Only the locations and
+    properties of the rows added here take part in the joins, not members
+    left over from earlier loads.
+    """
+
+    def __init__(self, members=None):
+        members = members or {}
+        self.offers = dict(members.get("DimOffer", ()))
+        self.markets = dict(members.get("DimMarket", ()))
+        self.dates = dict(members.get("DimDate", ()))
+        self.locations = dict(members.get("DimLocation", ()))
+        self.properties = dict(members.get("DimProperty", ()))
+        self.next_keys = {table: max(keys.values(), default=0) + 1 for table, keys in self.members().items()}
+        self.first_new_keys = dict(self.next_keys)
+        self.row_locations = {}
+        self.row_properties = {}
+        self.facts = set()
+        self.statuses = {}
+
+    def members(self):
+        """Return {dimension table: {natural key: surrogate key}}."""
+        return {"DimOffer": self.offers, "DimMarket": self.markets, "DimDate": self.dates,
+                "DimLocation": self.locations, "DimProperty": self.properties}
+
+    def _new_member(self, table, keys, natural_key):
+        key = keys[natural_key] = self.next_keys[table]
+        self.next_keys[table] += 1
+        return key
+
+    def add(self, values):
+        """Add one staging row, a tuple in COLUMN_DEFS order."""
+        (price, _, offer_type, floor, area, rooms, building, market, city, region, month, year, population,
+         longitude, latitude) = values
+
+        offer_key = self.offers.get(offer_type)
+        if offer_key is None:
+            offer_key = self._new_member("DimOffer", self.offers, offer_type)
+        market_key = self.markets.get(market)
+        if market_key is None:
+            market_key = self._new_member("DimMarket", self.markets, market)
+        # DimDate keys are assigned in YearMonth order by tables()
+        if (year, month) not in self.dates:
+            self.dates[(year, month)] = None
+
+        status = self.statuses.get(city)
+        if status is None:
+            status = self.statuses[city] = city_status(city)
+        location = (city, region, longitude, latitude, population) + status
+        if location not in self.row_locations:
+            key = self.locations.get(location)
+            self.row_locations[location] = key or self._new_member("DimLocation", self.locations, location)
+
+        area = clean_area(area)
+        category, code = area_bucket(area)
+        prop = (building, floor, category, code, rooms_category(rooms))
+        if prop not in self.row_properties:
+            key = self.properties.get(prop)
+            self.row_properties[prop] = key or self._new_member("DimProperty", self.properties, prop)
+
+        # The fact row is found through the same values the SQL joins compare
+        match = ("Unknown" if building is None else building, 100 if floor is None else floor, rooms,
+                 -1 if code is None else code)
+        self.facts.add((offer_key, market_key, year, month, city, match, area, price))
+
+    def add_rows(self, rows):
+        for values in rows:
+            self.add(values)
+        return self
+
+    def tee(self, converted_rows):
+        """Pass (row_num, values) pairs through, adding the rows the staging table accepts."""
+        for row in converted_rows:
+            if fits_column_types(row[1]):
+                self.add(row[1])
+            yield row
+
+    def tables(self):
+        """Return {table name: rows} in STAR_TABLES order, with the columns of STAR_TABLES."""
+        new_dates = sorted(((year * 100 + parse_month(month), month, year)
+                            for (year, month), key in self.dates.items() if key is None),
+                           key=lambda date: (date[0], date[1]))
+        for _, month, year in new_dates:
+            self._new_member("DimDate", self.dates, (year, month))
+        date_rows = []
+        for (year, month), key in self.dates.items():
+            year_month = year * 100 + parse_month(month)
+            quarter = (year_month % 100 - 1) // 3 + 1
+            date_rows.append((key, f"{month} {year}", year_month, year, year_month % 100, month, quarter,
+                              f"Q{quarter} {year}"))
+        date_rows.sort()
+
+        city_keys = collections.defaultdict(list)
+        for location, key in self.row_locations.items():
+            city_keys[location[0]].append(key)
+
+        property_keys = collections.defaultdict(list)
+        for (building, floor, _, code, rooms), key in self.row_properties.items():
+            match = ("Unknown" if building is None else building, 100 if floor is None else floor,
+                     4 if rooms == "4+" else int(rooms), -1 if code is None else code)
+            property_keys[match].append(key)
+
+        facts = set()
+        for offer_key, market_key, year, month, city, match, area, price in self.facts:
+            date_key = self.dates[(year, month)]
+            for location_key in city_keys[city]:
+                for property_key in property_keys.get(match, ()):
+                    facts.add((offer_key, market_key, date_key, location_key, property_key, area, price))
+
+        return {
+            "DimOffer": [(key, offer_type) for offer_type, key in self.offers.items()],
+            "DimMarket": [(key, market) for market, key in self.markets.items()],
+            "DimDate": date_rows,
+            "DimLocation": [(key, "Poland") + location for location, key in self.locations.items()],
+            "DimProperty": [(key,) + prop for prop, key in self.properties.items()],
+            # order by 6 desc: largest area first, NULL last
+            "FactOfferSnapshot": sorted(facts, key=lambda fact: (fact[5] is not None, fact[5] or 0), reverse=True),
+        }
+
+    def new_members(self, tables):
+        """Return {dimension table: rows} of the members that were not in the seed members."""
+        return {table: [row for row in tables[table] if row[0] >= first_key]
+                for table, first_key in self.first_new_keys.items()}
+
+
+class DimensionKeyCache:
+    """Natural key -> surrogate key maps of the star schema dimensions, kept in a local JSON file.
+
+    The database keeps a version stamp of its dimension tables in EtlState,
+    bumped in the transaction that appends new members. The file records the
+    database (owner) and the stamp it was saved for; if either no longer
+    matches, e.g. a run failed between the commit and the save, the maps are
+    read back from the dimension tables instead.
+    """
+
+    def __init__(self, path, owner):
+        self.path = path
+        self.owner = owner
+        self.version = 0
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, backend, cursor):
+        """Return {dimension table: {natural key: surrogate key}} matching the database."""
+        self.version = backend.read_etl_state(cursor, DIMENSION_VERSION)
+        state = self._read()
+        if state and state.get("owner") == self.owner and state.get("version") == self.version:
+            members = {table: {tuple(natural) if isinstance(natural, list) else natural: key
+                               for key, natural in rows}
+                       for table, rows in state["dimensions"].items()}
+            print(f"Dimension key cache {self.path}: {sum(map(len, members.values()))} members "
+                  f"(version {self.version})")
+            return members
+        print(f"Rebuilding dimension key cache {self.path} from the dimension tables...")
+        return backend.read_dimension_members(cursor)
+
+    def save(self, members, version):
+        """Save the maps once the members they hold are committed under version."""
+        self.version = version
+        state = {"owner": self.owner, "version": version,
+                 "dimensions": {table: sorted(([key, natural] for natural, key in keys.items()), key=lambda m: m[0])
+                                for table, keys in members.items()}}
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+
+    def invalidate(self):
+        """Drop the file after the dimension tables were loaded by OlxData.sql, which does not stamp them."""
+        if Path(self.path).exists():
+            os.remove(self.path)
+
+
+def aggregate_facts(facts):
+    """Return {aggregate table: rows} summing fact rows per key, like OlxAggregates.sql.
+
+    Price / Area is summed over the facts with an area; a zero area counts as
+    missing, like nullif(Area, 0). The sums are exactly rounded (math.fsum),
+    so they do not depend on the order of the facts.
+    """
+    fact_columns = [col_name for col_name, _ in STAR_TABLES["FactOfferSnapshot"]]
+    tables = {}
+    for table, columns in AGGREGATE_TABLES.items():
+        key_index = fact_columns.index(columns[0][0])
+        prices = collections.defaultdict(list)
+        prices_m2 = collections.defaultdict(list)
+        for fact in facts:
+            area, price = fact[5], fact[6]
+            prices[fact[key_index]].append(price)
+            if area:
+                prices_m2[fact[key_index]].append(price / area)
+        tables[table] = [(key, len(values), len(prices_m2[key]), math.fsum(values), math.fsum(prices_m2[key]))
+                         for key, values in sorted(prices.items())]
+    return tables
+
+
+def write_star_files(tables, directory):
+    """Write each star schema or aggregate table to <directory>/<table>.csv with a header row."""
+    os.makedirs(directory, exist_ok=True)
+    for table, rows in tables.items():
+        path = Path(directory) / f"{table}.csv"
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([col_name for col_name, _ in STAR_TABLES.get(table) or AGGREGATE_TABLES[table]])
+            writer.writerows(rows)
+        print(f"Wrote {len(rows)} rows to {path}")
+
+
+def build_star_schema(backend, cursor, star_dir=None, builder=None, key_cache=None):
+    """Run the Data step in Python: build the star schema and write it.
+
+    builder is a StarSchemaBuilder that was fed while the Import step
+    streamed the rows in; without it the staging table is read. The tables
+    go to star_dir as CSV files, or into the star schema tables of the
+    database: the dimension members missing from key_cache (a
+    DimensionKeyCache) and the new fact rows are appended and added to the
+    aggregate tables, then the cache is saved with the new dimension
+    version. Returns the number of fact rows.
+    """
+    if builder is None:
+        print("\nBuilding the star schema from the staging table...")
+        members = key_cache.load(backend, cursor) if key_cache is not None else None
+        builder = StarSchemaBuilder(members).add_rows(backend.iter_staged_rows(cursor))
+    else:
+        print("\nBuilding the star schema from the imported rows...")
+    tables = builder.tables()
+
+    if star_dir:
+        tables.update(aggregate_facts(tables["FactOfferSnapshot"]))
+        for table, rows in tables.items():
+            print(f"  {table}: {len(rows)} rows")
+        write_star_files(tables, star_dir)
+    else:
+        new_members = builder.new_members(tables)
+        for table, rows in new_members.items():
+            print(f"  {table}: {len(tables[table])} members, {len(rows)} new")
+        print(f"  FactOfferSnapshot: {len(tables['FactOfferSnapshot'])} rows")
+        version = key_cache.version + 1 if any(new_members.values()) else key_cache.version
+        backend.write_star_schema(cursor, new_members, tables["FactOfferSnapshot"], key_cache.version, version)
+        key_cache.save(builder.members(), version)
+    print("Star schema completed")
+    return len(tables["FactOfferSnapshot"])
+
 
+def execute_sql_file(cursor, filepath, description):
+    """Execute SQL script from file. Returns the number of database round trips."""
     if not Path(filepath).exists():
+        print(f"\nExecuting {description}...")
         raise FileNotFoundError(f"SQL file not found: {filepath}")
 
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return execute_sql_text(cursor, f.read(), description)
+
 
+def execute_sql_text(cursor, sql_content, description):
+    """Execute SQL script text batch by batch. Returns the number of database round trips."""
+    print(f"\nExecuting {description}...")
+
+    try:
         # Split by GO statements (SQL Server batch separator, case-insensitive)
         # GO is not valid T-SQL, it's a command tool directive, so we need to remove it
-        import re
         batches = re.split(r'\ngo\s*$', sql_content, flags=re.MULTILINE | re.IGNORECASE)
 
+        executed = 0
         for batch in batches:
             batch = batch.strip()
             if batch:
                 cursor.execute(batch)
+                executed += 1
 
         cursor.commit()
         print(f"{description} completed")
+        return executed + 1
     except Exception as e:
         print(f"Error executing {description}: {e}")
         raise
 
 
-def main(server=None, database=None, step=None):
+def split_fact_load(filepath):
+    """Split a data script at its FactOfferSnapshot insert, returning (sql before it, fact load sql)."""
+    with open(filepath, encoding="utf-8") as f:
+        sql_content = f.read()
+    index = sql_content.lower().find(FACT_LOAD_MARKER.lower())
+    if index < 0:
+        raise ValueError(f"Cannot find the FactOfferSnapshot load in {filepath}")
+    return sql_content[:index], sql_content[index:]
+
+
+def run_fact_load(backend, cursor, fact_load, metrics=None):
+    """Run the Data step with OlxData.sql's dimension loads and the fact load strategy fact_load.
+
+    distinct is OlxData.sql as it is. setbased replaces its fact insert with
+    SET_BASED_FACT_SCRIPT, whose staging columns and index are dropped again
+    even if the load fails. compare runs both fact loads on the same staging
+    data into an emptied FactOfferSnapshot, twice each in the order distinct,
+    setbased, setbased, distinct so neither always runs on the buffer cache
+    the other one warmed, and prints their mean times and whether every run
+    loaded the same rows.
+    """
+    if fact_load == "distinct":
+        backend.execute_script(cursor, "OlxData.sql")
+        return
+
+    dimension_sql, distinct_sql = split_fact_load("OlxData.sql")
+    prepare_sql, set_based_sql = split_fact_load(SET_BASED_FACT_SCRIPT)
+    index = set_based_sql.find(FACT_CLEANUP_MARKER)
+    if index < 0:
+        raise ValueError(f"Cannot find the cleanup after the fact load in {SET_BASED_FACT_SCRIPT}")
+    set_based_sql, cleanup_sql = set_based_sql[:index], set_based_sql[index:]
+    backend.execute_sql(cursor, dimension_sql, "OlxData.sql dimension loads")
+
+    def load_distinct():
+        start = time.perf_counter()
+        backend.execute_sql(cursor, distinct_sql, "OlxData.sql fact load")
+        return time.perf_counter() - start, 0.0
+
+    def load_set_based():
+        """Return (seconds of the fact load, seconds of creating and dropping its columns and indexes)."""
+        start = time.perf_counter()
+        backend.execute_sql(cursor, prepare_sql, f"{SET_BASED_FACT_SCRIPT} columns and indexes")
+        prepared = time.perf_counter()
+        try:
+            backend.execute_sql(cursor, set_based_sql, f"{SET_BASED_FACT_SCRIPT} fact load")
+        finally:
+            loaded = time.perf_counter()
+            backend.execute_sql(cursor, cleanup_sql, f"{SET_BASED_FACT_SCRIPT} cleanup")
+        return loaded - prepared, prepared - start + time.perf_counter() - loaded
+
+    if fact_load == "setbased":
+        load_set_based()
+        return
+
+    loads = {"distinct": load_distinct, "setbased": load_set_based}
+    timings = {name: [] for name in loads}
+    checksums = set()
+    for run, name in enumerate(("distinct", "setbased", "setbased", "distinct"), start=1):
+        backend.clear_facts(cursor)
+        seconds, prepare_seconds = loads[name]()
+        checksum = backend.fact_checksum(cursor)
+        timings[name].append((seconds, prepare_seconds))
+        checksums.add(checksum)
+        if metrics is not None:
+            metrics.emit("fact_load", strategy=name, run=run, wall_seconds=round(seconds, 6),
+                         prepare_seconds=round(prepare_seconds, 6), facts=checksum[0])
+
+    print(f"\nFact load strategies on the same {backend.count_staged_rows(cursor)} staged rows "
+          f"(mean of 2 runs each, alternating):")
+    means = {}
+    for name, runs in timings.items():
+        means[name] = sum(seconds for seconds, _ in runs) / len(runs)
+        prepare = sum(prepare_seconds for _, prepare_seconds in runs) / len(runs)
+        prepare = f" (+{prepare:.3f}s columns and indexes)" if prepare else ""
+        print(f"  {name:<9} {means[name]:.3f}s{prepare}, runs: {', '.join(f'{s:.3f}s' for s, _ in runs)}")
+    if means["setbased"]:
+        print(f"  setbased is {means['distinct'] / means['setbased']:.2f}x the speed of distinct")
+    if len(checksums) != 1:
+        raise Exception("The set-based fact load did not load the same rows as OlxData.sql")
+    print(f"  Every run loaded the same {checksum[0]} fact rows")
+
+
+class DatabaseBackend:
+    """Connect, session setup, staging table, batch insert, scripts and fact count for one database."""
+
+    name = None
+    label = None
+    table_name = None
+    steps = ()
+    supports_bulk = False
+    fact_key_column = "FactKey"
+
+    def __init__(self):
+        self.insert_sql = INSERT_SQL_TEMPLATE.format(table_name=self.table_name)
+        self.metrics = None
+
+    def _round_trips(self, count=1):
+        if self.metrics is not None:
+            self.metrics.add_round_trips(count)
+
+    def describe(self):
+        """Return (label, value) pairs printed when connecting."""
+        raise NotImplementedError
+
+    def connect(self):
+        """Open a new connection with the session settings applied."""
+        conn = self._connect()
+        self._round_trips()
+        self.setup_session(conn)
+        return conn
+
+    def _connect(self):
+        raise NotImplementedError
+
+    def setup_session(self, conn):
+        pass
+
+    def cursor(self, conn):
+        return conn.cursor()
+
+    def identity(self):
+        """Return a string naming this database, used to tie local state to it."""
+        return f"{self.name}:" + ";".join(f"{label}={value}" for label, value in self.describe())
+
+    def create_staging_table(self, cursor, keep_rows=False):
+        """Create the staging table, or empty it if it exists unless keep_rows is set."""
+        raise NotImplementedError
+
+    def count_staged_rows(self, cursor):
+        self._round_trips()
+        cursor.execute(f"SELECT COUNT(*) FROM {self.table_name}")
+        return cursor.fetchone()[0]
+
+    def iter_staged_rows(self, cursor, fetch_size=DEFAULT_BATCH_SIZE):
+        """Yield every row of the staging table as a tuple in COLUMN_DEFS order."""
+        columns = ", ".join(f"[{col_name}]" for col_name in COLUMN_DEFS)
+        self._round_trips()
+        cursor.execute(f"SELECT {columns} FROM {self.table_name}")
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            self._round_trips()
+            for row in rows:
+                yield tuple(row)
+
+    def execute_script(self, cursor, filepath):
+        """Run one of the repository's SQL scripts."""
+        raise NotImplementedError(f"{filepath} cannot run on the {self.name} backend")
+
+    def execute_sql(self, cursor, sql_content, description):
+        """Run T-SQL script text, e.g. a part of one of the repository's scripts."""
+        raise NotImplementedError(f"{description} cannot run on the {self.name} backend")
+
+    def insert_batch(self, cursor, batch):
+        """Insert a batch of (row_num, values) as one parameter array.
+
+        If the batch fails it is rolled back and retried row by row, so only the
+        offending rows are rejected. Returns (inserted rows, rejected count),
+        the inserted rows being the (row_num, values) items that were committed.
+        """
+        conn = cursor.connection
+        try:
+            cursor.executemany(self.insert_sql, [values for _, values in batch])
+            conn.commit()
+            self._round_trips(2)
+            return batch, 0
+        except Exception:
+            conn.rollback()
+            self._round_trips(2)
+
+        inserted = []
+        rejected = 0
+        for row_num, values in batch:
+            try:
+                cursor.execute(self.insert_sql, values)
+                inserted.append((row_num, values))
+            except Exception as e:
+                rejected += 1
+                print(f"✗ Row {row_num}: {str(e)}")
+
+        conn.commit()
+        self._round_trips(len(batch) + 1)
+        return inserted, rejected
+
+    def count_facts(self, cursor):
+        self._round_trips()
+        cursor.execute("SELECT COUNT(*) FROM FactOfferSnapshot")
+        return cursor.fetchone()[0]
+
+    def clear_facts(self, cursor):
+        # Facts loaded again must be summed into the aggregate tables from scratch
+        cursor.execute("DELETE FROM FactOfferSnapshot")
+        cursor.execute("DELETE FROM EtlState WHERE Name = ?", (AGGREGATED_FACT_KEY,))
+        cursor.connection.commit()
+        self._round_trips(3)
+
+    def fact_checksum(self, cursor):
+        """Return (row count, checksum) of FactOfferSnapshot, equal for tables with the same rows."""
+        raise NotImplementedError
+
+    def create_star_tables(self, cursor):
+        """Create the star schema tables if they do not exist."""
+        self.execute_script(cursor, "OlxSchema.sql")
+
+    def table_exists(self, cursor, table):
+        raise NotImplementedError
+
+    def read_etl_state(self, cursor, name):
+        """Return the EtlState value of name, 0 if it was never set."""
+        if not self.table_exists(cursor, "EtlState"):
+            return 0
+        self._round_trips()
+        cursor.execute("SELECT Value FROM EtlState WHERE Name = ?", (name,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def write_etl_state(self, cursor, name, value):
+        """Set the EtlState value of name in the caller's transaction.
+
+        Whether the row exists is read first: with SET NOCOUNT ON the
+        rowcount of an UPDATE is not reported.
+        """
+        self._round_trips(2)
+        cursor.execute("SELECT COUNT(*) FROM EtlState WHERE Name = ?", (name,))
+        if cursor.fetchone()[0]:
+            cursor.execute("UPDATE EtlState SET Value = ? WHERE Name = ?", (value, name))
+        else:
+            cursor.execute("INSERT INTO EtlState (Name, Value) VALUES (?, ?)", (name, value))
+
+    def max_fact_key(self, cursor):
+        """Return the highest key of FactOfferSnapshot, which grows with every fact inserted; 0 without facts."""
+        self._round_trips()
+        cursor.execute(f"SELECT MAX({self.fact_key_column}) FROM FactOfferSnapshot")
+        return cursor.fetchone()[0] or 0
+
+    def bump_load_generation(self, cursor):
+        """Count one more committed load in EtlState, in the caller's transaction. Returns the new generation.
+
+        Without an EtlState table (the schema was not created yet) nothing
+        is stamped and 0 is returned.
+        """
+        if not self.table_exists(cursor, "EtlState"):
+            return 0
+        generation = self.read_etl_state(cursor, LOAD_GENERATION) + 1
+        if generation > 1:
+            cursor.execute("UPDATE EtlState SET Value = ? WHERE Name = ?", (generation, LOAD_GENERATION))
+        else:
+            cursor.execute("INSERT INTO EtlState (Name, Value) VALUES (?, ?)", (LOAD_GENERATION, generation))
+        self._round_trips()
+        return generation
+
+    def read_dimension_members(self, cursor):
+        """Return {dimension table: {natural key: surrogate key}} read from the dimension tables."""
+        members = {}
+        for table, columns in DIMENSION_NATURAL_KEYS.items():
+            members[table] = {}
+            if not self.table_exists(cursor, table):
+                continue
+            key_column = STAR_TABLES[table][0][0]
+            self._round_trips()
+            cursor.execute(f"SELECT [{key_column}], " + ", ".join(f"[{col_name}]" for col_name in columns)
+                           + f" FROM {table} ORDER BY [{key_column}]")
+            for row in cursor.fetchall():
+                members[table][row[1] if len(columns) == 1 else tuple(row[1:])] = row[0]
+        return members
+
+    def write_star_schema(self, cursor, new_members, facts, version, new_version):
+        """Append new_members ({dimension table: rows}) and the new facts, and stamp new_version.
+
+        Only the facts not yet in FactOfferSnapshot are inserted, and their
+        totals (see aggregate_facts) are added to the aggregate tables. If
+        the table holds a fact that is no longer among facts (a full import
+        replaced the staged rows), the fact rows are replaced; if that
+        happened, or the aggregate tables do not cover every fact, they are
+        summed from all facts and only the rows that changed are written.
+        Everything is committed in one transaction, with AggregatedFactKey
+        and the load generation bumped, which fails if another load changed
+        the dimensions since version was read.
+        """
+        print("\nWriting the star schema...")
+        if self.read_etl_state(cursor, DIMENSION_VERSION) != version:
+            raise RuntimeError("The dimension tables were changed by another load, run the Data step again")
+        current = self._read_facts(cursor)
+        wanted = set(facts)
+        replace = not current <= wanted
+        rebuild = replace or self.read_etl_state(cursor, AGGREGATED_FACT_KEY) != self.max_fact_key(cursor)
+        if replace:
+            cursor.execute("DELETE FROM FactOfferSnapshot")
+            self._round_trips()
+            current = set()
+        added = [fact for fact in facts if fact not in current]
+        for table, rows in new_members.items():
+            self._insert_star_rows(cursor, table, rows)
+        self._insert_star_rows(cursor, "FactOfferSnapshot", added)
+        print(f"  FactOfferSnapshot: {len(added)} rows added" + (", all replaced" if replace else ""))
+
+        for table, rows in aggregate_facts(facts if rebuild else added).items():
+            changed = self._refresh_aggregate(cursor, table, rows) if rebuild else self._add_aggregate(cursor, table, rows)
+            print(f"  {table}: {changed} rows {'changed' if rebuild else 'added to'}")
+        if new_version != version:
+            if version:
+                cursor.execute("UPDATE EtlState SET Value = ? WHERE Name = ?", (new_version, DIMENSION_VERSION))
+            else:
+                cursor.execute("INSERT INTO EtlState (Name, Value) VALUES (?, ?)", (DIMENSION_VERSION, new_version))
+            self._round_trips()
+        self.write_etl_state(cursor, AGGREGATED_FACT_KEY, self.max_fact_key(cursor))
+        self.bump_load_generation(cursor)
+        cursor.connection.commit()
+        self._round_trips()
+
+    def _read_facts(self, cursor):
+        """Return the rows of FactOfferSnapshot as a set of tuples with the STAR_TABLES columns."""
+        self._round_trips()
+        cursor.execute("SELECT " + ", ".join(f"[{col_name}]" for col_name, _ in STAR_TABLES["FactOfferSnapshot"])
+                       + " FROM FactOfferSnapshot")
+        return {tuple(row) for row in cursor.fetchall()}
+
+    def _refresh_aggregate(self, cursor, table, rows):
+        """Make an aggregate table hold rows, touching only the keys whose totals changed."""
+        columns = [col_name for col_name, _ in AGGREGATE_TABLES[table]]
+        self._round_trips()
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table}")
+        current = {row[0]: tuple(row) for row in cursor.fetchall()}
+        wanted = {row[0]: row for row in rows}
+
+        removed = [(key,) for key in current if key not in wanted]
+        updated = [row[1:] + row[:1] for key, row in wanted.items() if key in current and current[key] != row]
+        added = [row for key, row in wanted.items() if key not in current]
+        if removed:
+            cursor.executemany(f"DELETE FROM {table} WHERE {columns[0]} = ?", removed)
+        if updated:
+            cursor.executemany(f"UPDATE {table} SET " + ", ".join(f"{col_name} = ?" for col_name in columns[1:])
+                               + f" WHERE {columns[0]} = ?", updated)
+        if added:
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ("
+                               + ", ".join("?" for _ in columns) + ")", added)
+        self._round_trips(sum(1 for changes in (removed, updated, added) if changes))
+        return len(removed) + len(updated) + len(added)
+
+    def _add_aggregate(self, cursor, table, rows):
+        """Add the totals of rows (see aggregate_facts) to an aggregate table, inserting the keys it lacks."""
+        columns = [col_name for col_name, _ in AGGREGATE_TABLES[table]]
+        self._round_trips()
+        cursor.execute(f"SELECT {columns[0]} FROM {table}")
+        keys = {row[0] for row in cursor.fetchall()}
+
+        updated = [row[1:] + row[:1] for row in rows if row[0] in keys]
+        added = [row for row in rows if row[0] not in keys]
+        if updated:
+            cursor.executemany(f"UPDATE {table} SET "
+                               + ", ".join(f"{col_name} = {col_name} + ?" for col_name in columns[1:])
+                               + f" WHERE {columns[0]} = ?", updated)
+        if added:
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ("
+                               + ", ".join("?" for _ in columns) + ")", added)
+        self._round_trips(sum(1 for changes in (updated, added) if changes))
+        return len(updated) + len(added)
+
+    def _insert_star_rows(self, cursor, table, rows, batch_size=DEFAULT_BATCH_SIZE):
+        columns = [col_name for col_name, _ in STAR_TABLES[table]]
+        sql = (f"INSERT INTO {table} (" + ", ".join(f"[{col_name}]" for col_name in columns)
+               + ") VALUES (" + ", ".join("?" for _ in columns) + ")")
+        for i in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[i:i + batch_size])
+            self._round_trips()
+
+
+class SqlServerBackend(DatabaseBackend):
+    """SQL Server through pyodbc and ODBC Driver 17, the production target."""
+
+    name = "sqlserver"
+    label = "SQL Server"
+    table_name = TABLE_NAME
+    steps = ("import", "schema", "data")
+    supports_bulk = True
+
+    def __init__(self, server, database):
+        super().__init__()
+        self.server = server
+        self.database = database
+        self.conn_string = f"Driver={{ODBC Driver 17 for SQL Server}};Server={server};Database={database};Trusted_Connection=yes;"
+
+    def describe(self):
+        return [("Server", self.server), ("Database", self.database)]
+
+    def _connect(self):
+        if pyodbc is None:
+            raise ImportError("The sqlserver backend requires pyodbc to be installed")
+        return pyodbc.connect(self.conn_string)
+
+    def setup_session(self, conn):
+        # Set locale-independent settings
+        cursor = conn.cursor()
+        cursor.execute("SET LANGUAGE us_english")
+        cursor.execute("SET DATEFORMAT mdy")
+        cursor.execute("SET NOCOUNT ON")
+        conn.commit()
+        cursor.close()
+        self._round_trips(4)
+
+    def cursor(self, conn):
+        cursor = conn.cursor()
+        # Send each batch as a single parameter array instead of one round trip per row
+        cursor.fast_executemany = True
+        return cursor
+
+    def create_staging_table(self, cursor, keep_rows=False):
+        if keep_rows:
+            if self.table_exists(cursor, self.table_name):
+                print(f"\nKeeping the rows of {self.table_name}")
+                return
+        # Creates the table if it does not exist, otherwise truncates it
+        self._round_trips(execute_sql_file(cursor, "OlxImportTable.sql", "OlxImportTable.sql"))
+
+    def execute_script(self, cursor, filepath):
+        self._round_trips(execute_sql_file(cursor, filepath, filepath))
+
+    def execute_sql(self, cursor, sql_content, description):
+        self._round_trips(execute_sql_text(cursor, sql_content, description))
+
+    def fact_checksum(self, cursor):
+        self._round_trips()
+        cursor.execute("SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM(OfferKey, MarketKey, DateKey, LocationKey, "
+                       "PropertyKey, Area, Price)) FROM FactOfferSnapshot")
+        return tuple(cursor.fetchone())
+
+    def table_exists(self, cursor, table):
+        self._round_trips()
+        cursor.execute("SELECT OBJECT_ID(?, 'U')", table)
+        return cursor.fetchone()[0] is not None
+
+    def _insert_star_rows(self, cursor, table, rows, batch_size=DEFAULT_BATCH_SIZE):
+        if not rows:
+            return
+        # The dimension keys are identity columns
+        identity = table != "FactOfferSnapshot"
+        if identity:
+            cursor.execute(f"SET IDENTITY_INSERT {table} ON")
+        super()._insert_star_rows(cursor, table, rows, batch_size)
+        if identity:
+            cursor.execute(f"SET IDENTITY_INSERT {table} OFF")
+            self._round_trips(2)
+
+
+class SqliteBackend(DatabaseBackend):
+    """SQLite stand-in that runs the Import step end-to-end without SQL Server.
+
+    The staging table is created from COLUMN_DEFS with CHECK constraints that
+    reject the same out-of-range values SQL Server would. The T-SQL schema and
+    data scripts cannot run here; the star schema is built with
+    --data-engine python instead.
+    """
+
+    name = "sqlite"
+    label = "SQLite"
+    table_name = "[olx_house_price]"
+    steps = ("import",)
+    # Facts are only ever appended, or all deleted, so the rowid grows like FactKey
+    fact_key_column = "rowid"
+
+    def __init__(self, database):
+        super().__init__()
+        path = Path(database)
+        if database != ":memory:" and not path.suffix:
+            path = path.with_suffix(".db")
+        self.path = path
+
+    def describe(self):
+        return [("Database file", str(self.path))]
+
+    def _connect(self):
+        # A generous busy timeout lets several writer connections share the file
+        return sqlite3.connect(str(self.path), timeout=60)
+
+    def setup_session(self, conn):
+        if str(self.path) != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+    def create_staging_table(self, cursor, keep_rows=False):
+        print("\nCreating staging table...")
+        columns = []
+        for col_name, col_def in COLUMN_DEFS.items():
+            sql_type = col_def["sql_type"]
+            max_length = _nvarchar_length(sql_type)
+            if max_length:
+                column_type, check = "TEXT", f"length([{col_name}]) <= {max_length}"
+            else:
+                column_type, check = SQLITE_TYPES[sql_type]
+                check = f"[{col_name}] {check}"
+            null = "NULL" if col_def["nullable"] else "NOT NULL"
+            columns.append(f"[{col_name}] {column_type} {null} CHECK ({check})")
+
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {self.table_name} (\n    " + ",\n    ".join(columns) + "\n)")
+        if not keep_rows:
+            cursor.execute(f"DELETE FROM {self.table_name}")
+        cursor.connection.commit()
+        self._round_trips(3)
+        print("Staging table ready" if not keep_rows else "Staging table ready, existing rows kept")
+
+    def create_star_tables(self, cursor):
+        print("\nCreating star schema tables...")
+        tables = list(STAR_TABLES.items()) + list(AGGREGATE_TABLES.items()) + [("EtlState", ETL_STATE_TABLE)]
+        for table, columns in tables:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n    "
+                           + ",\n    ".join(f"[{col_name}] {col_type}" for col_name, col_type in columns) + "\n)")
+        cursor.connection.commit()
+        self._round_trips(len(tables) + 1)
+        print("Star schema tables ready")
+
+    def table_exists(self, cursor, table):
+        self._round_trips()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cursor.fetchone() is not None
+
+    def write_star_schema(self, cursor, new_members, facts, version, new_version):
+        self.create_star_tables(cursor)
+        super().write_star_schema(cursor, new_members, facts, version, new_version)
+
+
+BACKENDS = {
+    "sqlserver": SqlServerBackend,
+    "sqlite": SqliteBackend,
+}
+
+DATABASE_ERRORS = (sqlite3.Error,) + ((pyodbc.Error,) if pyodbc is not None else ())
+
+
+def get_backend(name, server=DEFAULT_SERVER, database=DEFAULT_DATABASE):
+    """Create the backend for name (sqlserver, sqlite)."""
+    if name == "sqlserver":
+        return SqlServerBackend(server, database)
+    if name == "sqlite":
+        return SqliteBackend(database)
+    raise ValueError(f"Unknown backend: {name}")
+
+
+def main(server=None, database=None, step=None, *, batch_size=None, load_mode=None, bulk_dir=None,
+         engine=None, columnar_backend=None, workers=None, connections=None, backend=None,
+         metrics_file=None, prometheus_file=None, incremental=False, fingerprint_index=None, resume=False,
+         checkpoint_file=None, inputs=None, emit=None, emit_file=None, row_group_size=None, data_engine=None,
+         star_dir=None, dimension_cache=None, fact_load=None):
     """Main execution."""
+    metrics = None
     try:
         # Use provided arguments or defaults
         sql_server = server or DEFAULT_SERVER
         sql_database = database or DEFAULT_DATABASE
+        backend_name = (backend or DEFAULT_BACKEND).strip().lower()
         step_value = (step or DEFAULT_STEP).strip().lower()
+        batch_size = DEFAULT_BATCH_SIZE if batch_size is None else batch_size
+        load_mode = (load_mode or DEFAULT_LOAD_MODE).strip().lower()
+        bulk_dir = bulk_dir or DEFAULT_BULK_DIR
+        engine = (engine or DEFAULT_VALIDATION_ENGINE).strip().lower()
+        columnar_backend = (columnar_backend or DEFAULT_COLUMNAR_BACKEND).strip().lower()
+        workers = DEFAULT_WORKERS if workers is None else workers
+        connections = DEFAULT_CONNECTIONS if connections is None else connections
+        fingerprint_index = fingerprint_index or DEFAULT_FINGERPRINT_INDEX
+        checkpoint_file = checkpoint_file or DEFAULT_CHECKPOINT_FILE
+        inputs = inputs or [CSV_FILE]
+        emit = emit.strip().lower() if emit else None
+        row_group_size = DEFAULT_ROW_GROUP_SIZE if row_group_size is None else row_group_size
+        data_engine = (data_engine or DEFAULT_DATA_ENGINE).strip().lower()
+        dimension_cache = dimension_cache or DEFAULT_DIMENSION_CACHE
+        fact_load = (fact_load or DEFAULT_FACT_LOAD).strip().lower()
 
         valid_steps = {"all", "import", "schema", "data"}
         if step_value not in valid_steps:
-            print(f"Invalid step, allowed: All, Import, Schema, Data")
+            print("Invalid step, allowed: All, Import, Schema, Data")
             return 1
 
+        if backend_name not in BACKENDS:
+            print("Invalid backend, allowed: sqlserver, sqlite")
+            return 1
+
+        db = get_backend(backend_name, sql_server, sql_database)
+
+        if batch_size < 1:
+            print("Invalid batch size, must be at least 1")
+            return 1
+
+        if load_mode not in ("rows", "bulk"):
+            print("Invalid load mode, allowed: rows, bulk")
+            return 1
+
+        if engine not in ("plan", "columnar"):
+            print("Invalid validation engine, allowed: plan, columnar")
+            return 1
+
+        if data_engine not in ("sql", "python"):
+            print("Invalid data engine, allowed: sql, python")
+            return 1
+
+        if star_dir and data_engine != "python":
+            print("--star-dir needs --data-engine python")
+            return 1
+
+        if fact_load not in ("distinct", "setbased", "compare"):
+            print("Invalid fact load, allowed: distinct, setbased, compare")
+            return 1
+
+        if fact_load != DEFAULT_FACT_LOAD and data_engine != "sql":
+            print("--fact-load needs --data-engine sql")
+            return 1
+
+        if workers < 1:
+            print("Invalid number of workers, must be at least 1")
+            return 1
+
+        if connections < 1:
+            print("Invalid number of connections, must be at least 1")
+            return 1
+
+        if connections > 1 and load_mode == "bulk":
+            print("Multiple connections are only supported with load mode rows")
+            return 1
+
+        # Batches only commit in file order with load mode rows on one connection
+        use_checkpoint = load_mode == "rows" and connections == 1
+        if resume and not use_checkpoint:
+            print("Resume needs load mode rows with one connection")
+            return 1
+
+        if emit is not None:
+            if emit not in EMIT_FILES:
+                print("Invalid emit format, allowed: parquet, arrow")
+                return 1
+            if resume:
+                print("--emit writes the whole input and cannot be combined with --resume")
+                return 1
+            if row_group_size < 1:
+                print("Invalid row group size, must be at least 1")
+                return 1
+            if pa is None:
+                raise ImportError("--emit requires pyarrow to be installed")
+            emit_file = emit_file or EMIT_FILES[emit]
+
+        if engine == "columnar":
+            # Fail before connecting if the requested backend is not available
+            _columnar_backend(columnar_backend)
+
         do_import = step_value in ("all", "import")
         do_schema = step_value in ("all", "schema")
         do_data = step_value in ("all", "data")
 
+        # The Python data engine runs the schema and data steps on any backend
+        engine_steps = ("schema", "data") if data_engine == "python" else ()
+        unsupported = [name for name, wanted in (("import", do_import), ("schema", do_schema), ("data", do_data))
+                       if wanted and name not in db.steps and name not in engine_steps]
+        if unsupported:
+            print(f"The {db.name} backend does not support step(s): {', '.join(unsupported)}")
+            return 1
+
+        if load_mode == "bulk" and not db.supports_bulk:
+            print(f"Load mode bulk is not supported by the {db.name} backend")
+            return 1
+
+        input_files = expand_inputs(inputs) if do_import else []
+
         print("=" * 70)
         print("CSV to SQL Server Importer")
         print(f"  Step: {step_value}")
+        if len(input_files) > 1:
+            print(f"  Input: {len(input_files)} files")
+        print(f"  Backend: {db.name}")
+        print(f"  Load mode: {load_mode}")
+        print(f"  Batch size: {batch_size}")
+        print(f"  Validation engine: {engine}" + (f" ({columnar_backend})" if engine == "columnar" else ""))
+        print(f"  Workers: {workers}")
+        print(f"  Connections: {connections}")
+        if incremental:
+            print(f"  Incremental: yes (index {fingerprint_index})")
+        if emit is not None and do_import:
+            print(f"  Emit: {emit_file} ({emit}, {row_group_size} rows per row group)")
+        if do_schema or do_data:
+            print(f"  Data engine: {data_engine}" + (f" (tables written to {star_dir})" if star_dir else "")
+                  + (f" (dimension keys cached in {dimension_cache})"
+                     if data_engine == "python" and do_data and not star_dir else "")
+                  + (f" (fact load {fact_load})" if data_engine == "sql" and do_data else ""))
+        if use_checkpoint:
+            print(f"  Checkpoint: {checkpoint_file}" + (" (resume)" if resume else ""))
+        if metrics_file or prometheus_file:
+            print(f"  Metrics: {', '.join(path for path in (metrics_file, prometheus_file) if path)}")
         print("=" * 70)
 
-        # Connect to SQL Server
-        print(f"\nConnecting to SQL Server...")
-        print(f"  Server: {sql_server}")
-        print(f"  Database: {sql_database}")
+        metrics = ImportMetrics(metrics_file, prometheus_file)
+        db.metrics = metrics
 
-        conn_string = f"Driver={{ODBC Driver 17 for SQL Server}};Server={sql_server};Database={sql_database};Trusted_Connection=yes;"
-        conn = pyodbc.connect(conn_string)
-        cursor = conn.cursor()
+        # Connect to the database
+        print(f"\nConnecting to {db.label}...")
+        for label, value in db.describe():
+            print(f"  {label}: {value}")
 
-        # Set locale-independent settings
-        cursor.execute("SET LANGUAGE us_english")
-        cursor.execute("SET DATEFORMAT mdy")
-        cursor.execute("SET NOCOUNT ON")
-        conn.commit()
+        with metrics.step("connect"):
+            conn = db.connect()
+            cursor = db.cursor(conn)
         print("Connected")
 
+        key_cache = None
+        if data_engine == "python" and do_data and not star_dir:
+            key_cache = DimensionKeyCache(dimension_cache, db.identity())
+
+        # With the Python data engine the dimension keys are assigned while the rows stream in
+        builder = None
+        if data_engine == "python" and do_import and do_data:
+            builder = StarSchemaBuilder(key_cache.load(db, cursor) if key_cache is not None else None)
+
         # Import step (creates import table, reads CSV, inserts rows)
         if do_import:
             print("\n--- Running import step ---")
-            execute_sql_file(cursor, "OlxImportTable.sql", "OlxImportTable.sql")
-            rows = read_csv(CSV_FILE)
-            insert_rows(cursor, rows)
+            index = None
+            checkpoint = None
+            start = None
+            with metrics.step("import"):
+                db.create_staging_table(cursor, keep_rows=incremental or resume)
+                if use_checkpoint:
+                    checkpoint = ImportCheckpoint(checkpoint_file, input_files, db.identity())
+                    if resume:
+                        start = checkpoint.resume(db.count_staged_rows(cursor))
+                    else:
+                        checkpoint.start(db.count_staged_rows(cursor) if incremental else 0)
+                if incremental:
+                    index = FingerprintIndex(fingerprint_index)
+                    index.open_for(db.identity(), db.count_staged_rows(cursor), lambda: db.iter_staged_rows(cursor))
+                elif Path(fingerprint_index).exists():
+                    # The staging table was reloaded, so the index no longer describes it
+                    stale = FingerprintIndex(fingerprint_index)
+                    stale.invalidate(db.identity())
+                    stale.close()
+
+                if builder is not None and (incremental or resume):
+                    # Rows loaded by earlier runs are part of the star schema too
+                    builder.add_rows(db.iter_staged_rows(cursor))
+
+                stats = new_import_stats()
+                export = ColumnarExport(emit_file, emit, row_group_size) if emit is not None else None
+                complete = False
+                try:
+                    import_files(db, cursor, input_files, stats, batch_size, load_mode, bulk_dir, engine,
+                                 columnar_backend, workers, connections, metrics, index, checkpoint, start, export,
+                                 builder)
+                    complete = True
+                finally:
+                    if index is not None:
+                        index.close()
+                    if export is not None:
+                        export.close(complete)
+                if checkpoint is not None:
+                    checkpoint.clear()
+                db.bump_load_generation(cursor)
+                conn.commit()
+            metrics.record_import(stats)
 
         # Schema step
         if do_schema:
             print("\n--- Running schema step ---")
-            execute_sql_file(cursor, "OlxSchema.sql", "OlxSchema.sql")
+            with metrics.step("schema"):
+                if data_engine == "python":
+                    db.create_star_tables(cursor)
+                else:
+                    db.execute_script(cursor, "OlxSchema.sql")
 
         # Data step
         if do_data:
             print("\n--- Running data step ---")
-            execute_sql_file(cursor, "OlxData.sql", "OlxData.sql")
+            with metrics.step("data"):
+                if data_engine == "python":
+                    fact_count = build_star_schema(db, cursor, star_dir, builder, key_cache)
+                else:
+                    run_fact_load(db, cursor, fact_load, metrics)
+                    db.execute_script(cursor, "OlxAggregates.sql")
+                    db.bump_load_generation(cursor)
+                    conn.commit()
+                    # The keys OlxData.sql assigned are not known to the Python data engine's cache
+                    DimensionKeyCache(dimension_cache, db.identity()).invalidate()
 
         # Verify fact table is not empty only if data step was executed
         if do_data:
             print("\nVerifying data...")
-            cursor.execute("SELECT COUNT(*) FROM FactOfferSnapshot")
-            fact_count = cursor.fetchone()[0]
+            with metrics.step("verify"):
+                if not star_dir:
+                    fact_count = db.count_facts(cursor)
 
             if fact_count > 0:
                 print(f"Fact table contains {fact_count} records")
@@ -314,25 +3170,59 @@ def main(server=None, database=None, step=None):
 
         cursor.close()
         conn.close()
+        metrics.finish("ok")
 
         print("\n" + "=" * 70)
         print("Import completed successfully!")
         print("=" * 70)
         return 0
 
-    except pyodbc.Error as e:
+    except DATABASE_ERRORS as e:
         print(f"\nDatabase error: {e}")
+        if metrics is not None:
+            metrics.finish("failed")
         return 1
     except Exception as e:
         print(f"\nError: {e}")
+        if metrics is not None:
+            metrics.finish("failed")
         return 1
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Import OLX house price data to SQL Server")
+    parser.add_argument("--input", nargs="+", help=f"CSV files or glob patterns to import as one load (default: {CSV_FILE})")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=list(BACKENDS), help=f"Database backend (default: {DEFAULT_BACKEND})")
     parser.add_argument("--server", default=DEFAULT_SERVER, help=f"SQL Server name (default: {DEFAULT_SERVER})")
-    parser.add_argument("--database", default=DEFAULT_DATABASE, help=f"Database name (default: {DEFAULT_DATABASE})")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help=f"Database name, or database file for sqlite (default: {DEFAULT_DATABASE})")
     parser.add_argument("--step", default=DEFAULT_STEP, help=f"Step to execute (default: {DEFAULT_STEP}). Valid: All, Import, Schema, Data")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Rows sent per insert batch (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--load-mode", default=DEFAULT_LOAD_MODE, choices=["rows", "bulk"], help=f"rows: batched ODBC inserts, bulk: native BCP file + BULK INSERT (default: {DEFAULT_LOAD_MODE})")
+    parser.add_argument("--bulk-dir", default=DEFAULT_BULK_DIR, help="Directory for the bulk load files, must be readable by SQL Server (default: system temp dir)")
+    parser.add_argument("--validation-engine", default=DEFAULT_VALIDATION_ENGINE, choices=["plan", "columnar"], help=f"plan: row by row, columnar: --batch-size rows at a time (default: {DEFAULT_VALIDATION_ENGINE})")
+    parser.add_argument("--columnar-backend", default=DEFAULT_COLUMNAR_BACKEND, choices=["auto", "numpy", "array"], help=f"Backend for the columnar engine, auto picks numpy when installed (default: {DEFAULT_COLUMNAR_BACKEND})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Processes that parse and validate the CSV, 1 = in-process (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS, help=f"Connections inserting batches in parallel (default: {DEFAULT_CONNECTIONS})")
+    parser.add_argument("--metrics-file", help="Append per-step/per-stage metrics to this file as JSON lines")
+    parser.add_argument("--prometheus-file", help="Write the run metrics to this file in the Prometheus text format")
+    parser.add_argument("--incremental", action="store_true", help="Keep the staging table and insert only rows not loaded before")
+    parser.add_argument("--fingerprint-index", default=DEFAULT_FINGERPRINT_INDEX, help=f"Local file with the fingerprints of loaded rows (default: {DEFAULT_FINGERPRINT_INDEX})")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted import after its last committed batch")
+    parser.add_argument("--checkpoint-file", default=DEFAULT_CHECKPOINT_FILE, help=f"Where the last committed CSV position is kept (default: {DEFAULT_CHECKPOINT_FILE})")
+    parser.add_argument("--emit", choices=list(EMIT_FILES), help="Also write the validated rows to a Parquet or Arrow IPC file")
+    parser.add_argument("--emit-file", help=f"File for --emit (default: {EMIT_FILES['parquet']} or {EMIT_FILES['arrow']})")
+    parser.add_argument("--data-engine", default=DEFAULT_DATA_ENGINE, choices=["sql", "python"], help=f"sql: run OlxSchema.sql/OlxData.sql on the server, python: build the star schema locally from the staging table (default: {DEFAULT_DATA_ENGINE})")
+    parser.add_argument("--star-dir", help="With --data-engine python, write the star schema tables to CSV files in this directory instead of the database")
+    parser.add_argument("--dimension-cache", default=DEFAULT_DIMENSION_CACHE, help=f"With --data-engine python, local file with the dimension keys already in the database (default: {DEFAULT_DIMENSION_CACHE})")
+    parser.add_argument("--fact-load", default=DEFAULT_FACT_LOAD, choices=["distinct", "setbased", "compare"], help=f"With --data-engine sql, distinct: OlxData.sql as is, setbased: {SET_BASED_FACT_SCRIPT} for the facts, compare: time both on the same data (default: {DEFAULT_FACT_LOAD})")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE, help=f"Rows per row group / record batch of the --emit file (default: {DEFAULT_ROW_GROUP_SIZE})")
 
     args = parser.parse_args()
-    sys.exit(main(args.server, args.database, args.step))
+    sys.exit(main(server=args.server, database=args.database, step=args.step, batch_size=args.batch_size,
+                  load_mode=args.load_mode, bulk_dir=args.bulk_dir, engine=args.validation_engine,
+                  columnar_backend=args.columnar_backend, workers=args.workers, connections=args.connections,
+                  backend=args.backend, metrics_file=args.metrics_file, prometheus_file=args.prometheus_file,
+                  incremental=args.incremental, fingerprint_index=args.fingerprint_index, resume=args.resume,
+                  checkpoint_file=args.checkpoint_file, inputs=args.input, emit=args.emit, emit_file=args.emit_file,
+                  row_group_size=args.row_group_size, data_engine=args.data_engine, star_dir=args.star_dir,
+                  dimension_cache=args.dimension_cache, fact_load=args.fact_load))
@@ -0,0 +1,83 @@
+-- Add the facts loaded since the last run to the aggregate tables. Each table holds one
+-- row per dimension key with the totals the price reports average: AVG(Price / Area) is
+-- SumPriceM2 / OffersWithArea, AVG(Price) is SumPrice / Offers. The AggregatedFactKey row
+-- of EtlState is the highest FactKey already summed; only the facts above it are read,
+-- and their totals are added to the rows of their keys. Without the stamp (the first run,
+-- or the facts were deleted and loaded again, which resets it) the tables are emptied and
+-- summed from every fact.
+
+declare @from bigint = isnull((select Value from EtlState where Name = 'AggregatedFactKey'), 0);
+declare @to bigint = isnull((select max(FactKey) from FactOfferSnapshot), 0);
+
+-- A truncate starts the FactKey identity over; below the stamp, every fact is summed again
+if @to < @from
+    set @from = 0;
+
+if @from = 0
+begin
+    delete from FactOfferByLocation;
+    delete from FactOfferByDate;
+    delete from FactOfferByProperty;
+end;
+
+if @to > @from
+begin
+    merge FactOfferByLocation as a
+    using (
+        select LocationKey,
+            count(*) as Offers,
+            count(nullif(Area, 0)) as OffersWithArea,
+            sum(Price) as SumPrice,
+            isnull(sum(Price / nullif(Area, 0)), 0) as SumPriceM2
+        from FactOfferSnapshot
+        where FactKey > @from and FactKey <= @to
+        group by LocationKey
+    ) as f on a.LocationKey = f.LocationKey
+    when matched then
+        update set Offers = a.Offers + f.Offers, OffersWithArea = a.OffersWithArea + f.OffersWithArea,
+            SumPrice = a.SumPrice + f.SumPrice, SumPriceM2 = a.SumPriceM2 + f.SumPriceM2
+    when not matched by target then
+        insert (LocationKey, Offers, OffersWithArea, SumPrice, SumPriceM2)
+        values (f.LocationKey, f.Offers, f.OffersWithArea, f.SumPrice, f.SumPriceM2);
+
+    merge FactOfferByDate as a
+    using (
+        select DateKey,
+            count(*) as Offers,
+            count(nullif(Area, 0)) as OffersWithArea,
+            sum(Price) as SumPrice,
+            isnull(sum(Price / nullif(Area, 0)), 0) as SumPriceM2
+        from FactOfferSnapshot
+        where FactKey > @from and FactKey <= @to
+        group by DateKey
+    ) as f on a.DateKey = f.DateKey
+    when matched then
+        update set Offers = a.Offers + f.Offers, OffersWithArea = a.OffersWithArea + f.OffersWithArea,
+            SumPrice = a.SumPrice + f.SumPrice, SumPriceM2 = a.SumPriceM2 + f.SumPriceM2
+    when not matched by target then
+        insert (DateKey, Offers, OffersWithArea, SumPrice, SumPriceM2)
+        values (f.DateKey, f.Offers, f.OffersWithArea, f.SumPrice, f.SumPriceM2);
+
+    merge FactOfferByProperty as a
+    using (
+        select PropertyKey,
+            count(*) as Offers,
+            count(nullif(Area, 0)) as OffersWithArea,
+            sum(Price) as SumPrice,
+            isnull(sum(Price / nullif(Area, 0)), 0) as SumPriceM2
+        from FactOfferSnapshot
+        where FactKey > @from and FactKey <= @to
+        group by PropertyKey
+    ) as f on a.PropertyKey = f.PropertyKey
+    when matched then
+        update set Offers = a.Offers + f.Offers, OffersWithArea = a.OffersWithArea + f.OffersWithArea,
+            SumPrice = a.SumPrice + f.SumPrice, SumPriceM2 = a.SumPriceM2 + f.SumPriceM2
+    when not matched by target then
+        insert (PropertyKey, Offers, OffersWithArea, SumPrice, SumPriceM2)
+        values (f.PropertyKey, f.Offers, f.OffersWithArea, f.SumPrice, f.SumPriceM2);
+end;
+
+update EtlState set Value = @to where Name = 'AggregatedFactKey';
+if @@rowcount = 0
+    insert into EtlState (Name, Value) values ('AggregatedFactKey', @to);
+go
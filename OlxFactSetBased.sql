@@ -0,0 +1,143 @@
+-- Set-based alternative to the FactOfferSnapshot insert at the end of OlxData.sql.
+-- The values the DimProperty join compares become persisted computed columns on
+-- both sides, so every join is an equality between plain, indexed columns. The
+-- rows OlxData.sql collapses with select distinct over the joined result are
+-- grouped on the narrow staging columns instead, and the order by is dropped.
+-- The staging columns and their index only exist for the duration of the load and
+-- are dropped at the end, so imports do not maintain the index and BULK INSERT into
+-- the heap stays minimally logged. The DimProperty columns and indexes are kept.
+-- Loads the same fact rows as OlxData.sql (run the importer with --fact-load compare).
+
+set ansi_nulls, ansi_padding, ansi_warnings, arithabort, concat_null_yields_null, quoted_identifier on;
+set numeric_roundabort off;
+
+-- Same rule as OlxData.sql: an area above 1500 is missing its decimal point
+if col_length('dbo.olx_house_price', 'CleanArea') is null
+alter table dbo.olx_house_price add CleanArea as
+    case
+        when area is null then null
+        when area > 1500 then cast(area / 100.0 as decimal(12,2))
+        else area
+    end persisted
+go
+
+-- AreaCode of the clean area, -1 when it is missing (the isnull of the old join)
+if col_length('dbo.olx_house_price', 'AreaCode') is null
+alter table dbo.olx_house_price add AreaCode as
+    case
+        when area is null then -1
+        when area > 1500 then
+            case
+                when cast(area / 100.0 as decimal(12,2)) < 20 then 1
+                when cast(area / 100.0 as decimal(12,2)) < 100 then cast(cast(area / 100.0 as decimal(12,2)) as int) / 10
+                else 10
+            end
+        when area < 20 then 1
+        when area < 100 then cast(area as int) / 10
+        else 10
+    end persisted
+go
+
+-- Numeric rooms bucket, null for 5+ rooms, which have no DimProperty member to join
+if col_length('dbo.olx_house_price', 'RoomsCode') is null
+alter table dbo.olx_house_price add RoomsCode as
+    cast(case when rooms <= 4 then rooms end as tinyint) persisted
+go
+
+if col_length('dbo.olx_house_price', 'PropertyTypeMatch') is null
+alter table dbo.olx_house_price add PropertyTypeMatch as isnull(offer_type_of_building, N'Unknown') persisted
+go
+
+if col_length('dbo.olx_house_price', 'FloorMatch') is null
+alter table dbo.olx_house_price add FloorMatch as isnull(cast(floor as int), 100) persisted
+go
+
+if col_length('DimProperty', 'RoomsCode') is null
+alter table DimProperty add RoomsCode as
+    cast(case when RoomsCategory = '4+' then 4 else cast(RoomsCategory as int) end as tinyint) persisted
+go
+
+if col_length('DimProperty', 'PropertyTypeMatch') is null
+alter table DimProperty add PropertyTypeMatch as isnull(PropertyType, N'Unknown') persisted
+go
+
+if col_length('DimProperty', 'FloorMatch') is null
+alter table DimProperty add FloorMatch as isnull(cast(Floor as int), 100) persisted
+go
+
+if col_length('DimProperty', 'AreaCodeMatch') is null
+alter table DimProperty add AreaCodeMatch as isnull(AreaCode, -1) persisted
+go
+
+-- Covers the grouping below, so it streams in index order without a sort
+if not exists (select 1 from sys.indexes where name = 'IX_olx_house_price_FactLoad' and object_id = object_id('dbo.olx_house_price'))
+create index IX_olx_house_price_FactLoad on dbo.olx_house_price
+    (offer_type, market, [year], [month], city_name, PropertyTypeMatch, FloorMatch, RoomsCode, AreaCode, CleanArea, price)
+go
+
+if not exists (select 1 from sys.indexes where name = 'IX_DimProperty_Match' and object_id = object_id('DimProperty'))
+create index IX_DimProperty_Match on DimProperty (PropertyTypeMatch, FloorMatch, RoomsCode, AreaCodeMatch)
+go
+
+if not exists (select 1 from sys.indexes where name = 'IX_DimLocation_City' and object_id = object_id('DimLocation'))
+create index IX_DimLocation_City on DimLocation (City)
+go
+
+if not exists (select 1 from sys.indexes where name = 'IX_DimDate_YearMonthLabel' and object_id = object_id('DimDate'))
+create index IX_DimDate_YearMonthLabel on DimDate ([Year], MonthLabel)
+go
+
+if not exists (select 1 from FactOfferSnapshot)
+insert into FactOfferSnapshot with (tablock) (OfferKey, MarketKey, DateKey, LocationKey, PropertyKey, Area, Price)
+select
+    o.OfferKey,
+    m.MarketKey,
+    d.DateKey,
+    l.LocationKey,
+    p.PropertyKey,
+    olx.CleanArea,
+    olx.price
+from (
+    -- One row per distinct combination of the values a fact row is made of:
+    -- the duplicates the distinct of OlxData.sql collapses after the joins
+    select offer_type, market, [year], [month], city_name, PropertyTypeMatch, FloorMatch, RoomsCode, AreaCode,
+        CleanArea, price
+    from dbo.olx_house_price
+    where RoomsCode is not null
+    group by offer_type, market, [year], [month], city_name, PropertyTypeMatch, FloorMatch, RoomsCode, AreaCode,
+        CleanArea, price
+) olx
+join DimDate d on d.Year = olx.year and d.MonthLabel = olx.month
+join DimLocation l on l.City = olx.city_name
+join DimMarket m on m.MarketLabel = olx.market
+join DimOffer o on o.OfferType = olx.offer_type
+join DimProperty p on p.PropertyTypeMatch = olx.PropertyTypeMatch
+    and p.FloorMatch = olx.FloorMatch
+    and p.RoomsCode = olx.RoomsCode
+    and p.AreaCodeMatch = olx.AreaCode
+go
+
+-- Drop the staging columns and index of the fact load
+if exists (select 1 from sys.indexes where name = 'IX_olx_house_price_FactLoad' and object_id = object_id('dbo.olx_house_price'))
+drop index IX_olx_house_price_FactLoad on dbo.olx_house_price
+go
+
+if col_length('dbo.olx_house_price', 'CleanArea') is not null
+alter table dbo.olx_house_price drop column CleanArea
+go
+
+if col_length('dbo.olx_house_price', 'AreaCode') is not null
+alter table dbo.olx_house_price drop column AreaCode
+go
+
+if col_length('dbo.olx_house_price', 'RoomsCode') is not null
+alter table dbo.olx_house_price drop column RoomsCode
+go
+
+if col_length('dbo.olx_house_price', 'PropertyTypeMatch') is not null
+alter table dbo.olx_house_price drop column PropertyTypeMatch
+go
+
+if col_length('dbo.olx_house_price', 'FloorMatch') is not null
+alter table dbo.olx_house_price drop column FloorMatch
+go
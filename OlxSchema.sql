@@ -58,6 +58,7 @@ go
 if not exists (select 1 from sysobjects where name='FactOfferSnapshot' and xtype='U')
 create table FactOfferSnapshot
 (
+	FactKey bigint identity(1,1) not null constraint PK_FactOfferSnapshot primary key clustered, -- load order, see OlxAggregates.sql
 	OfferKey int foreign key references DimOffer(OfferKey) not null,
 	MarketKey int foreign key references DimMarket(MarketKey) not null,
 	DateKey int foreign key references DimDate(DateKey) not null,
@@ -66,4 +67,53 @@ create table FactOfferSnapshot
 	Area float null,
 	Price float not null
 )
-go
\ No newline at end of file
+go
+
+-- Fact tables created before the aggregates were summed incrementally
+if col_length('FactOfferSnapshot', 'FactKey') is null
+alter table FactOfferSnapshot add FactKey bigint identity(1,1) not null constraint PK_FactOfferSnapshot primary key clustered
+go
+
+-- FactOfferSnapshot summed per LocationKey for the report datasets, refreshed by OlxAggregates.sql
+if not exists (select 1 from sysobjects where name='FactOfferByLocation' and xtype='U')
+create table FactOfferByLocation
+(
+	LocationKey int primary key foreign key references DimLocation(LocationKey),
+	Offers int not null,
+	OffersWithArea int not null, -- facts with an area, the ones SumPriceM2 is summed over
+	SumPrice float not null,
+	SumPriceM2 float not null -- sum(Price / Area)
+)
+go
+
+-- FactOfferSnapshot summed per DateKey for the report datasets, refreshed by OlxAggregates.sql
+if not exists (select 1 from sysobjects where name='FactOfferByDate' and xtype='U')
+create table FactOfferByDate
+(
+	DateKey int primary key foreign key references DimDate(DateKey),
+	Offers int not null,
+	OffersWithArea int not null, -- facts with an area, the ones SumPriceM2 is summed over
+	SumPrice float not null,
+	SumPriceM2 float not null -- sum(Price / Area)
+)
+go
+
+-- FactOfferSnapshot summed per PropertyKey for the report datasets, refreshed by OlxAggregates.sql
+if not exists (select 1 from sysobjects where name='FactOfferByProperty' and xtype='U')
+create table FactOfferByProperty
+(
+	PropertyKey int primary key foreign key references DimProperty(PropertyKey),
+	Offers int not null,
+	OffersWithArea int not null, -- facts with an area, the ones SumPriceM2 is summed over
+	SumPrice float not null,
+	SumPriceM2 float not null -- sum(Price / Area)
+)
+go
+
+if not exists (select 1 from sysobjects where name='EtlState' and xtype='U')
+create table EtlState
+(
+	Name nvarchar(64) primary key, -- e.g. DimensionVersion, bumped by the importer when it appends dimension members
+	Value bigint not null
+)
+go
@@ -0,0 +1,850 @@
+"""
+In-memory query engine for the OLX star schema
+Loads FactOfferSnapshot into compact column arrays (int32 keys, float64 Price
+and Area) and the dimension tables into dicts, then answers the group-by /
+average queries of the OlxReports datasets in memory: AvgPriceM2 by City
+filtered by Region, by month Label and by property category. --check runs the
+CommandText of each dataset's .rdl file against the database, and the same
+dataset scanned from FactOfferSnapshot (FACT_SCAN_SQL), and compares both
+with the engine's answer.
+"""
+
+import argparse
+import csv
+import math
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+from ImportOlxHousePrice import (
+    BACKENDS, DEFAULT_BACKEND, DEFAULT_BATCH_SIZE, DEFAULT_COLUMNAR_BACKEND, DEFAULT_DATABASE, DEFAULT_SERVER,
+    LOAD_GENERATION, STAR_TABLES, get_backend, np,
+)
+
+REPORTS_DIR = Path(__file__).parent / "OlxReports"
+DIMENSION_TABLES = [table for table in STAR_TABLES if table != "FactOfferSnapshot"]
+FACT_COLUMNS = [col_name for col_name, _ in STAR_TABLES["FactOfferSnapshot"]]
+KEY_COLUMNS = FACT_COLUMNS[:5]
+# Roaring containers hold 2^16 rows; up to 4096 rows (8 KB as uint16) an array is smaller than a bitmap
+CONTAINER_BITS = 16
+CONTAINER_SIZE = 1 << CONTAINER_BITS
+ARRAY_CONTAINER_MAX = 4096
+DEFAULT_CACHE_SIZE = 256
+
+
+def resolve_backend(name):
+    """Resolve a columnar backend name (auto, numpy, array) like the importer's columnar engine."""
+    if name == "auto":
+        return "numpy" if np is not None else "array"
+    if name == "numpy" and np is None:
+        raise ImportError("The numpy columnar backend requires numpy to be installed")
+    if name not in ("numpy", "array"):
+        raise ValueError(f"Unknown columnar backend: {name}")
+    return name
+
+
+def _csv_value(text, col_type):
+    if text == "":
+        return None
+    if col_type.startswith("INTEGER"):
+        return int(text)
+    if col_type.startswith("REAL"):
+        return float(text)
+    return text
+
+
+def read_star_dir(directory):
+    """Read the tables written by ImportOlxHousePrice.py --star-dir as {table: row iterable}."""
+    tables = {}
+    for table, columns in STAR_TABLES.items():
+        types = [col_type for _, col_type in columns]
+
+        def rows(path=Path(directory) / f"{table}.csv", types=types):
+            with open(path, encoding="utf-8", newline="") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for fields in reader:
+                    yield tuple(_csv_value(text, col_type) for text, col_type in zip(fields, types))
+
+        tables[table] = rows()
+    return tables
+
+
+def read_database(cursor, fetch_size=DEFAULT_BATCH_SIZE):
+    """Read the star schema tables through a DB-API cursor as {table: row iterable}."""
+    def rows(table):
+        cursor.execute("SELECT " + ", ".join(f"[{col_name}]" for col_name, _ in STAR_TABLES[table]) + f" FROM {table}")
+        for chunk in iter(lambda: cursor.fetchmany(fetch_size), []):
+            for row in chunk:
+                yield tuple(row)
+
+    # Dimensions are read completely before the fact rows are streamed on the same cursor
+    tables = {table: list(rows(table)) for table in DIMENSION_TABLES}
+    tables["FactOfferSnapshot"] = rows("FactOfferSnapshot")
+    return tables
+
+
+class ReportQueries:
+    """The dataset shapes of the OlxReports, on top of summarize(table, column, where)."""
+
+    def avg_price_m2(self, table, column, where=None):
+        """[(value, AvgPriceM2, offers)] of the values with a price per m², ordered by AvgPriceM2.
+
+        The shape of the price report datasets: group by ..., having AvgPriceM2 is not null, order by 2.
+        """
+        rows = [(value, sum_price_m2 / offers_with_area, offers)
+                for value, offers, offers_with_area, _, sum_price_m2 in self.summarize(table, column, where)
+                if offers_with_area]
+        rows.sort(key=lambda row: row[1])
+        return rows
+
+    def price_m2_by(self, table, column, where=None):
+        """[(value, AvgPriceM2)] of every value, None where no fact has an area, like AVG(Price / Area)."""
+        return [(value, sum_price_m2 / offers_with_area if offers_with_area else None)
+                for value, _, offers_with_area, _, sum_price_m2 in self.summarize(table, column, where)]
+
+    def price_by(self, table, column, where=None):
+        """[(value, AVG(Price))] of every value."""
+        return [(value, sum_price / offers) for value, offers, _, sum_price, _ in self.summarize(table, column, where)]
+
+
+class ColumnarFacts(ReportQueries):
+    """FactOfferSnapshot as column arrays, with the dimension tables as {key: row} dicts.
+
+    The five keys are int32 columns and Price/Area float64 columns with NaN
+    for a missing area. Grouping by a dimension column maps every dimension
+    key to a dense group code once, so a query is a gather of the fact keys
+    into codes and a handful of sums per group (np.bincount with numpy, one
+    loop over the columns with the array backend). Like the report SQL, a
+    fact only counts toward a group through an existing dimension row, and
+    Price / Area skips facts without an area; a zero area counts as missing,
+    like nullif(Area, 0) in the aggregate tables.
+    """
+
+    def __init__(self, tables, backend=DEFAULT_COLUMNAR_BACKEND):
+        self.backend = resolve_backend(backend)
+        self.columns = {table: [col_name for col_name, _ in columns] for table, columns in STAR_TABLES.items()}
+        self.dimensions = {table: {row[0]: row for row in tables[table]} for table in DIMENSION_TABLES}
+
+        keys = [array("i") for _ in KEY_COLUMNS]
+        area = array("d")
+        price = array("d")
+        nan = math.nan
+        for row in tables["FactOfferSnapshot"]:
+            for column, key in zip(keys, row):
+                column.append(key)
+            area.append(nan if row[5] is None else row[5])
+            price.append(row[6])
+
+        if self.backend == "numpy":
+            keys = [np.frombuffer(column, dtype=np.int32) for column in keys]
+            area = np.frombuffer(area, dtype=np.float64)
+            price = np.frombuffer(price, dtype=np.float64)
+        self.keys = dict(zip(KEY_COLUMNS, keys))
+        self.area = area
+        self.price = price
+        self.index = None
+
+    def __len__(self):
+        return len(self.price)
+
+    def take(self, rows):
+        """Return a ColumnarFacts of the fact rows numbered rows, sharing the dimensions."""
+        facts = ColumnarFacts.__new__(ColumnarFacts)
+        facts.backend = self.backend
+        facts.columns = self.columns
+        facts.dimensions = self.dimensions
+        facts.index = None
+        if self.backend == "numpy":
+            rows = np.asarray(rows)
+            facts.keys = {name: column[rows] for name, column in self.keys.items()}
+            facts.area = self.area[rows]
+            facts.price = self.price[rows]
+        else:
+            facts.keys = {name: array("i", (column[row] for row in rows)) for name, column in self.keys.items()}
+            facts.area = array("d", (self.area[row] for row in rows))
+            facts.price = array("d", (self.price[row] for row in rows))
+        return facts
+
+    def use_bitmap_index(self):
+        """Build a BitmapIndex and answer the where filters of later queries with it. Returns the index."""
+        self.index = BitmapIndex(self)
+        return self.index
+
+    @staticmethod
+    def _key_column(table):
+        return STAR_TABLES[table][0][0]
+
+    def group_codes(self, table, column):
+        """Return (codes, values): codes[key] is the index in values of the key's column value, -1 for no row."""
+        index = self.columns[table].index(column)
+        rows = self.dimensions[table]
+        codes = array("i", [-1]) * (max(rows, default=0) + 1)
+        positions = {}
+        values = []
+        for key, row in rows.items():
+            code = positions.get(row[index])
+            if code is None:
+                code = positions[row[index]] = len(values)
+                values.append(row[index])
+            codes[key] = code
+        return codes, values
+
+    def key_filter(self, table, column, allowed):
+        """Return flags[key], true for the keys of table whose column value is in allowed."""
+        index = self.columns[table].index(column)
+        rows = self.dimensions[table]
+        flags = array("b", [0]) * (max(rows, default=0) + 1)
+        for key, row in rows.items():
+            if row[index] in allowed:
+                flags[key] = 1
+        return flags
+
+    def dimension_keys(self, table, column, allowed):
+        """Return the keys of table whose column value is in allowed."""
+        index = self.columns[table].index(column)
+        return [key for key, row in self.dimensions[table].items() if row[index] in allowed]
+
+    def fact_filter(self, where):
+        """Return the facts matching where ({(table, column): allowed values}) as a mask, None for all.
+
+        With a bitmap index (see use_bitmap_index) the mask comes from its
+        bitmaps, otherwise every filtered key column is scanned.
+        """
+        if self.index is not None:
+            return self.index.mask(where)
+        mask = None
+        for (table, column), allowed in where.items():
+            flags = self.key_filter(table, column, set(allowed))
+            keys = self.keys[self._key_column(table)]
+            if self.backend == "numpy":
+                matches = np.frombuffer(flags, dtype=np.int8).astype(bool)[keys]
+                mask = matches if mask is None else mask & matches
+            else:
+                matches = [flags[key] for key in keys]
+                mask = matches if mask is None else [a and b for a, b in zip(mask, matches)]
+        return mask
+
+    def summarize(self, table, column, where=None, mask=None):
+        """Group the facts by a dimension column.
+
+        Returns [(value, offers, offers with area, sum of Price, sum of Price / Area)]
+        for every value with at least one matching fact, in dimension key order.
+        mask preselects facts (see fact_filter); where adds filters to it.
+        With a bitmap index only the facts the where filters select are read.
+        """
+        codes, values = self.group_codes(table, column)
+        keys = self.keys[self._key_column(table)]
+        if where and self.index is not None:
+            rows = self.index.rows(where)
+            if self.backend == "numpy":
+                if mask is not None:
+                    rows = rows[mask[rows]]
+                totals = self._summarize_numpy(codes, len(values), keys[rows], self.price[rows], self.area[rows])
+            else:
+                if mask is not None:
+                    rows = [row for row in rows if mask[row]]
+                totals = self._summarize_array(codes, len(values), [keys[row] for row in rows],
+                                               [self.price[row] for row in rows], [self.area[row] for row in rows])
+            return [(value,) + total for value, total in zip(values, totals) if total[0]]
+
+        if where:
+            filtered = self.fact_filter(where)
+            if mask is None:
+                mask = filtered
+            elif self.backend == "numpy":
+                mask = mask & filtered
+            else:
+                mask = [a and b for a, b in zip(mask, filtered)]
+        if self.backend == "numpy":
+            totals = self._summarize_numpy(codes, len(values), keys, self.price, self.area, mask)
+        else:
+            totals = self._summarize_array(codes, len(values), keys, self.price, self.area, mask)
+        return [(value,) + total for value, total in zip(values, totals) if total[0]]
+
+    @staticmethod
+    def _summarize_numpy(codes, size, keys, price, area, mask=None):
+        fact_codes = np.frombuffer(codes, dtype=np.int32)[keys]
+        selected = fact_codes >= 0
+        if mask is not None:
+            selected &= mask
+        fact_codes = fact_codes[selected]
+        price = price[selected]
+        area = area[selected]
+        with_area = ~np.isnan(area) & (area != 0)
+        offers = np.bincount(fact_codes, minlength=size)
+        offers_with_area = np.bincount(fact_codes[with_area], minlength=size)
+        sum_price = np.bincount(fact_codes, weights=price, minlength=size)
+        sum_price_m2 = np.bincount(fact_codes[with_area], weights=price[with_area] / area[with_area], minlength=size)
+        return [(int(a), int(b), float(c), float(d))
+                for a, b, c, d in zip(offers, offers_with_area, sum_price, sum_price_m2)]
+
+    @staticmethod
+    def _summarize_array(codes, size, keys, prices, areas, mask=None):
+        offers = [0] * size
+        offers_with_area = [0] * size
+        sum_price = [0.0] * size
+        sum_price_m2 = [0.0] * size
+        selected = mask if mask is not None else [True] * len(keys)
+        for key, price, area, wanted in zip(keys, prices, areas, selected):
+            code = codes[key]
+            if code < 0 or not wanted:
+                continue
+            offers[code] += 1
+            sum_price[code] += price
+            # NaN != NaN, so facts without an area are skipped here too
+            if area == area and area != 0:
+                offers_with_area[code] += 1
+                sum_price_m2[code] += price / area
+        return list(zip(offers, offers_with_area, sum_price, sum_price_m2))
+
+
+def _int_container(*containers):
+    """Return the union of containers as a 2^16-bit int."""
+    dense = 0
+    lows = []
+    for container in containers:
+        if isinstance(container, int):
+            dense |= container
+        else:
+            lows.append(container)
+    if not lows:
+        return dense
+    if np is not None:
+        bits = np.zeros(CONTAINER_SIZE, dtype=bool)
+        for container in lows:
+            bits[np.frombuffer(container, dtype=np.uint16)] = True
+        return dense | int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+    bits = bytearray(CONTAINER_SIZE // 8)
+    for container in lows:
+        for low in container:
+            bits[low >> 3] |= 1 << (low & 7)
+    return dense | int.from_bytes(bits, "little")
+
+
+def _container_bits(container):
+    """Return an int container as 2^16 little-endian bits in a uint8 numpy array."""
+    return np.unpackbits(np.frombuffer(container.to_bytes(CONTAINER_SIZE // 8, "little"), np.uint8),
+                         bitorder="little")
+
+
+def _container_rows(container):
+    """Return the low 16 bits of the rows in a container as a sorted array('H')."""
+    if not isinstance(container, int):
+        return container
+    if np is not None:
+        return array("H", np.flatnonzero(_container_bits(container)).astype(np.uint16).tobytes())
+    rows = array("H")
+    for position, byte in enumerate(container.to_bytes(CONTAINER_SIZE // 8, "little")):
+        while byte:
+            low_bit = byte & -byte
+            rows.append(position * 8 + low_bit.bit_length() - 1)
+            byte ^= low_bit
+    return rows
+
+
+# int.bit_count is Python 3.10+
+_popcount = getattr(int, "bit_count", lambda value: bin(value).count("1"))
+
+
+def _container_len(container):
+    return _popcount(container) if isinstance(container, int) else len(container)
+
+
+def _compact(container):
+    """Return an int container holding few enough rows as an array container, None when empty."""
+    if isinstance(container, int):
+        if not container:
+            return None
+        if _container_len(container) <= ARRAY_CONTAINER_MAX:
+            return _container_rows(container)
+        return container
+    return container if len(container) else None
+
+
+def _and_containers(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return _compact(a & b)
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        bits = b.to_bytes(CONTAINER_SIZE // 8, "little")
+        return _compact(array("H", (low for low in a if bits[low >> 3] >> (low & 7) & 1)))
+    return _compact(array("H", sorted(set(a).intersection(b))))
+
+
+def _or_containers(containers):
+    if len(containers) == 1:
+        return containers[0]
+    if any(isinstance(container, int) for container in containers):
+        return _int_container(*containers)
+    if sum(len(container) for container in containers) > ARRAY_CONTAINER_MAX:
+        return _compact(_int_container(*containers))
+    return array("H", sorted(set().union(*containers)))
+
+
+class RoaringBitmap:
+    """A set of fact row numbers in the roaring layout.
+
+    Rows are split by their high 16 bits into containers of up to 2^16 rows.
+    A container of at most ARRAY_CONTAINER_MAX rows is a sorted array('H') of
+    the low 16 bits; a fuller one is a 2^16-bit Python int, so and/or of
+    dense containers run in C. Containers are kept in the smaller form after
+    every operation, and empty ones are dropped.
+    """
+
+    __slots__ = ("containers",)
+
+    def __init__(self, containers=None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a bitmap from ascending row numbers."""
+        containers = {}
+        for row in rows:
+            containers.setdefault(row >> CONTAINER_BITS, array("H")).append(row & 0xFFFF)
+        return cls({high: container if len(container) <= ARRAY_CONTAINER_MAX else _int_container(container)
+                    for high, container in containers.items()})
+
+    @classmethod
+    def from_numpy(cls, rows):
+        """Build a bitmap from an ascending numpy array of row numbers."""
+        containers = {}
+        highs = rows >> CONTAINER_BITS
+        starts = np.flatnonzero(np.diff(highs)) + 1
+        for segment in np.split(rows, starts):
+            lows = (segment & 0xFFFF).astype(np.uint16)
+            if len(lows) <= ARRAY_CONTAINER_MAX:
+                container = array("H", lows.tobytes())
+            else:
+                bits = np.zeros(CONTAINER_SIZE, dtype=bool)
+                bits[lows] = True
+                container = int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+            containers[int(segment[0]) >> CONTAINER_BITS] = container
+        return cls(containers)
+
+    def __len__(self):
+        return sum(_container_len(container) for container in self.containers.values())
+
+    def __and__(self, other):
+        containers = {}
+        for high in self.containers.keys() & other.containers.keys():
+            container = _and_containers(self.containers[high], other.containers[high])
+            if container is not None:
+                containers[high] = container
+        return RoaringBitmap(containers)
+
+    def __or__(self, other):
+        return RoaringBitmap.union([self, other])
+
+    @classmethod
+    def union(cls, bitmaps):
+        """OR several bitmaps at once, merging each container position in one pass."""
+        grouped = {}
+        for bitmap in bitmaps:
+            for high, container in bitmap.containers.items():
+                grouped.setdefault(high, []).append(container)
+        return cls({high: _or_containers(containers) for high, containers in grouped.items()})
+
+    def __iter__(self):
+        for high in sorted(self.containers):
+            base = high << CONTAINER_BITS
+            for low in _container_rows(self.containers[high]):
+                yield base + low
+
+    def nbytes(self):
+        """Approximate size of the containers: 2 bytes per array entry, 8 KB per bitmap."""
+        return sum(CONTAINER_SIZE // 8 if isinstance(container, int) else 2 * len(container)
+                   for container in self.containers.values())
+
+    def to_rows(self, backend):
+        """Return the row numbers in ascending order: an int64 array with numpy, else an array('q')."""
+        if backend != "numpy":
+            return array("q", self)
+        parts = []
+        for high in sorted(self.containers):
+            container = self.containers[high]
+            if isinstance(container, int):
+                lows = np.flatnonzero(_container_bits(container))
+            else:
+                lows = np.frombuffer(container, dtype=np.uint16).astype(np.int64)
+            parts.append(lows + (high << CONTAINER_BITS))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def to_mask(self, size, backend):
+        """Return a fact mask for ColumnarFacts.summarize: a bool array with numpy, else a bytearray."""
+        if backend == "numpy":
+            mask = np.zeros(size, dtype=bool)
+            for high, container in self.containers.items():
+                base = high << CONTAINER_BITS
+                if isinstance(container, int):
+                    mask[base:base + CONTAINER_SIZE] = _container_bits(container).view(bool)[:size - base]
+                else:
+                    mask[base + np.frombuffer(container, dtype=np.uint16).astype(np.int64)] = True
+            return mask
+        mask = bytearray(size)
+        for row in self:
+            mask[row] = 1
+        return mask
+
+
+class BitmapIndex:
+    """A RoaringBitmap of the fact rows of every key in the five FactOfferSnapshot key columns.
+
+    A filter on a dimension column is the OR of the bitmaps of its matching
+    keys, and several filters are ANDed, so a query touches only the rows of
+    the keys it asks for instead of scanning each key column. The OR of the
+    keys of one dimension value (a region is many cities) is kept once it has
+    been asked for, like a bitmap join index on that column.
+    """
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.bitmaps = {column: self._build(facts.keys[column]) for column in KEY_COLUMNS}
+        self.value_bitmaps = {}
+
+    def _build(self, keys):
+        if self.facts.backend == "numpy":
+            order = np.argsort(keys, kind="stable")
+            starts = np.flatnonzero(np.diff(keys[order])) + 1
+            return {int(keys[rows[0]]): RoaringBitmap.from_numpy(rows)
+                    for rows in np.split(order, starts) if len(rows)}
+        rows = {}
+        for row, key in enumerate(keys):
+            rows.setdefault(key, []).append(row)
+        return {key: RoaringBitmap.from_rows(key_rows) for key, key_rows in rows.items()}
+
+    def nbytes(self):
+        return sum(bitmap.nbytes() for bitmaps in self.bitmaps.values() for bitmap in bitmaps.values())
+
+    def value_bitmap(self, table, column, value):
+        """Return the RoaringBitmap of the facts whose table row has value in column."""
+        bitmap = self.value_bitmaps.get((table, column, value))
+        if bitmap is None:
+            bitmaps = self.bitmaps[STAR_TABLES[table][0][0]]
+            bitmap = RoaringBitmap.union(bitmaps[key] for key in self.facts.dimension_keys(table, column, {value})
+                                         if key in bitmaps)
+            self.value_bitmaps[(table, column, value)] = bitmap
+        return bitmap
+
+    def select(self, where):
+        """Return the RoaringBitmap of the facts matching where ({(table, column): allowed values}), None for all.
+
+        The filters are ANDed from the one matching the fewest facts, so the
+        intermediate results stay small.
+        """
+        matched = [RoaringBitmap.union(self.value_bitmap(table, column, value) for value in set(allowed))
+                   for (table, column), allowed in where.items()]
+        if not matched:
+            return None
+        matched.sort(key=len)
+        result = matched[0]
+        for bitmap in matched[1:]:
+            result = result & bitmap
+        return result
+
+    def rows(self, where):
+        """Return the row numbers of the facts matching where (see RoaringBitmap.to_rows), None for all."""
+        selected = self.select(where)
+        return None if selected is None else selected.to_rows(self.facts.backend)
+
+    def mask(self, where):
+        """Return the facts matching where as a mask for ColumnarFacts.summarize, None for all."""
+        selected = self.select(where)
+        return None if selected is None else selected.to_mask(len(self.facts), self.facts.backend)
+
+
+# (report file, dataset name) -> (engine query, whether the SQL orders its rows by the average)
+REPORT_DATASETS = {
+    ("Prices in regions.rdl", "AveragePriceM2"): (
+        lambda facts, params: facts.avg_price_m2("DimLocation", "City", {("DimLocation", "Region"): params["Region"]}),
+        True),
+    ("Property categories.rdl", "Floor"): (lambda facts, params: facts.avg_price_m2("DimProperty", "Floor"), True),
+    ("Property categories.rdl", "Area"): (lambda facts, params: facts.avg_price_m2("DimProperty", "AreaCategory"),
+                                          True),
+    ("Property categories.rdl", "Rooms"): (lambda facts, params: facts.avg_price_m2("DimProperty", "RoomsCategory"),
+                                           True),
+    ("Offers by Month.rdl", "PriceAvgM2"): (lambda facts, params: facts.price_m2_by("DimDate", "Label"), False),
+    ("Offers by Month.rdl", "DataSet1"): (lambda facts, params: facts.price_by("DimDate", "Label"), False),
+}
+
+
+_PRICE_M2_SCAN = """with PricePerM2({key}, PriceM2) as (
+    select {key}, Price / nullif(Area, 0) as PriceM2
+    from FactOfferSnapshot
+)
+select {column}, AVG(ppm.PriceM2) as AvgPriceM2, count(*) offers
+from PricePerM2 ppm
+join {table} on ppm.{key} = {table}.{key}
+{where}group by {column}
+having AVG(ppm.PriceM2) is not null
+order by 2"""
+
+# The datasets as the .rdl files queried them before the FactOfferBy* aggregates: averages scanned from
+# FactOfferSnapshot, which the aggregates must not change. A zero area counts as missing, as in the aggregates.
+FACT_SCAN_SQL = {
+    ("Prices in regions.rdl", "AveragePriceM2"): _PRICE_M2_SCAN.format(
+        key="LocationKey", table="DimLocation", column="DimLocation.City",
+        where="where DimLocation.Region in (@Region)\n"),
+    ("Property categories.rdl", "Floor"): _PRICE_M2_SCAN.format(
+        key="PropertyKey", table="DimProperty", column="DimProperty.Floor", where=""),
+    ("Property categories.rdl", "Area"): _PRICE_M2_SCAN.format(
+        key="PropertyKey", table="DimProperty", column="DimProperty.AreaCategory", where=""),
+    ("Property categories.rdl", "Rooms"): _PRICE_M2_SCAN.format(
+        key="PropertyKey", table="DimProperty", column="DimProperty.RoomsCategory", where=""),
+    ("Offers by Month.rdl", "PriceAvgM2"): """with PricePerM2(DateKey, PriceM2) as (
+    select DateKey, Price / nullif(Area, 0) as PriceM2
+    from FactOfferSnapshot
+)
+select d.Label, AVG(f.PriceM2)
+from PricePerM2 f
+join DimDate d on f.DateKey = d.DateKey
+group by d.Label""",
+    ("Offers by Month.rdl", "DataSet1"): """select d.Label, AVG(f.Price)
+from FactOfferSnapshot f
+join DimDate d on f.DateKey = d.DateKey
+group by d.Label""",
+}
+
+
+def report_command_text(report, dataset):
+    """Return the CommandText of a dataset in one of the OlxReports .rdl files."""
+    root = ET.parse(REPORTS_DIR / report).getroot()
+    for element in root.iterfind(".//{*}DataSet"):
+        if element.get("Name") == dataset:
+            return element.find("{*}Query/{*}CommandText").text
+    raise ValueError(f"{report} has no dataset {dataset}")
+
+
+def run_report_sql(cursor, sql, params):
+    """Run report SQL with its @parameters; a list value expands like an SSRS multi-value parameter."""
+    values = []
+
+    def placeholder(match):
+        value = params[match.group(1)]
+        if isinstance(value, (list, tuple, set)):
+            values.extend(value)
+            return ", ".join("?" for _ in value)
+        values.append(value)
+        return "?"
+
+    cursor.execute(re.sub(r"@(\w+)", placeholder, sql), values)
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+class ReportCache:
+    """LRU cache of report query results, emptied when the load generation changes.
+
+    A result is keyed by the query text with its whitespace collapsed and
+    the parameters sorted by name; a multi-value parameter is a sorted tuple,
+    since the order of an IN list does not change the result. At most
+    max_entries results are kept, the least recently used one is evicted
+    first. The Import and Data steps of ImportOlxHousePrice.py bump the
+    LoadGeneration row of EtlState when they commit; the caller reloads its
+    facts when that changes and passes the new generation to
+    set_generation, which drops every cached result.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        if max_entries < 1:
+            raise ValueError("A report cache needs room for at least one result")
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.generation = None
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @staticmethod
+    def key(query, params):
+        def normalize(value):
+            if isinstance(value, (list, tuple, set)):
+                return tuple(sorted(set(value), key=repr))
+            return value
+
+        return " ".join(query.split()), tuple(sorted((name, normalize(value)) for name, value in params.items()))
+
+    def set_generation(self, generation):
+        """Drop the cached results if they were computed at another load generation (see read_load_generation)."""
+        if generation != self.generation:
+            if self.entries:
+                self.invalidations += 1
+                self.entries.clear()
+            self.generation = generation
+
+    def get(self, query, params, compute):
+        """Return the cached result of query with params, or compute() it and cache it."""
+        key = self.key(query, params)
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = self.entries[key] = compute()
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+
+def read_load_generation(db, cursor):
+    """Return the LoadGeneration stamp of the database, 0 before the first stamped load."""
+    return db.read_etl_state(cursor, LOAD_GENERATION)
+
+
+def _same_rows(expected, actual, ordered):
+    """Compare dataset rows by group value: counts exactly, averages to 1e-9 (SQL sums in no fixed order)."""
+    if ordered and [row[1] for row in actual] != sorted(row[1] for row in actual):
+        return False
+    expected = {row[0]: row[1:] for row in expected}
+    actual = {row[0]: row[1:] for row in actual}
+    if expected.keys() != actual.keys():
+        return False
+    for value, row in expected.items():
+        for a, b in zip(row, actual[value]):
+            if a is None or b is None or isinstance(a, int):
+                if a != b:
+                    return False
+            elif not math.isclose(a, b, rel_tol=1e-9):
+                return False
+    return True
+
+
+def compare_with_sql(cursor, report, dataset, params, rows):
+    """Compare a dataset's rows with its .rdl CommandText and its fact scan. Returns [(SQL, SQL rows, same)]."""
+    ordered = REPORT_DATASETS[(report, dataset)][1]
+    results = []
+    for source, sql in (("report SQL", report_command_text(report, dataset)),
+                        ("fact scan", FACT_SCAN_SQL[(report, dataset)])):
+        expected = run_report_sql(cursor, sql, params)
+        results.append((source, expected, _same_rows(expected, rows, ordered)))
+    return results
+
+
+def timed(func, repeat):
+    """Run func repeat times, returning (best seconds, last result)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(backend_name=DEFAULT_BACKEND, server=DEFAULT_SERVER, database=DEFAULT_DATABASE, star_dir=None,
+         columnar_backend=DEFAULT_COLUMNAR_BACKEND, regions=None, check=False, repeat=3, bitmap_index=False,
+         cache_size=0, passes=1):
+    """Load the star schema, answer every report dataset and optionally check it against the .rdl SQL.
+
+    Every dataset is answered passes times. Before each pass the load
+    generation of the database is read once; if a load committed since the
+    facts were read, they are read again and the result cache is emptied.
+    """
+    if check and star_dir:
+        print("--check runs the report SQL and needs a database, not --star-dir")
+        return 1
+
+    if cache_size < 0:
+        print(f"Invalid --cache-size: {cache_size}")
+        return 1
+
+    if passes < 1:
+        print(f"Invalid --passes: {passes}")
+        return 1
+
+    conn = cursor = None
+    if star_dir:
+        source = star_dir
+    else:
+        db = get_backend(backend_name, server, database)
+        conn = db.connect()
+        cursor = db.cursor(conn)
+        source = ", ".join(f"{label}: {value}" for label, value in db.describe())
+
+    def load():
+        start = time.perf_counter()
+        if star_dir:
+            facts = ColumnarFacts(read_star_dir(star_dir), columnar_backend)
+        else:
+            facts = ColumnarFacts(read_database(cursor), columnar_backend)
+        print(f"Loaded {len(facts):,} facts from {source} in {time.perf_counter() - start:.3f}s ({facts.backend})")
+        if bitmap_index:
+            start = time.perf_counter()
+            index = facts.use_bitmap_index()
+            print(f"Built the bitmap index in {time.perf_counter() - start:.3f}s ({index.nbytes() / 1024:,.0f} KB)")
+        return facts
+
+    cache = ReportCache(cache_size) if cache_size else None
+
+    def answer(query, command, params):
+        if cache is None:
+            return query(facts, params)
+        return cache.get(command, params, lambda: query(facts, params))
+
+    facts = None
+    generation = None
+    mismatches = 0
+    for pass_num in range(1, passes + 1):
+        # The star-dir files carry no load generation, so they are read once
+        if cursor is not None or facts is None:
+            current = read_load_generation(db, cursor) if cursor is not None else None
+            if facts is None or current != generation:
+                facts = load()
+                generation = current
+            if cache is not None:
+                cache.set_generation(generation)
+        if passes > 1:
+            print(f"Pass {pass_num} of {passes} (load generation {generation})")
+
+        all_regions = sorted({row[3] for row in facts.dimensions["DimLocation"].values()})
+        region_sets = [regions] if regions else [all_regions] + ([[region] for region in all_regions] if check else [])
+
+        for (report, dataset), (query, _) in REPORT_DATASETS.items():
+            command = report_command_text(report, dataset) if cache is not None or check else None
+            uses_region = dataset == "AveragePriceM2"
+            for region_set in region_sets if uses_region else [None]:
+                params = {"Region": region_set} if uses_region else {}
+                elapsed, rows = timed(lambda: answer(query, command, params), repeat)
+                label = f"{report}: {dataset}"
+                if uses_region and len(region_set) < len(all_regions):
+                    label += f" (Region: {', '.join(region_set)})"
+                status = ""
+                if check:
+                    results = compare_with_sql(cursor, report, dataset, params, rows)
+                    different = [f"{source}: {len(expected)} rows" for source, expected, same in results if not same]
+                    mismatches += bool(different)
+                    status = f"  MISMATCH ({', '.join(different)})" if different else "  same as SQL"
+                print(f"  {label:<60} {len(rows):>5} rows  {elapsed * 1000:8.2f} ms{status}")
+
+    if conn is not None:
+        conn.close()
+    if cache is not None:
+        print(f"  result cache: {cache.hits} hits, {cache.misses} misses, {cache.evictions} evictions, "
+              f"{cache.invalidations} invalidations (load generation {cache.generation})")
+    if check:
+        print(f"  mismatched datasets: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer the OlxReports datasets from an in-memory columnar star schema")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=list(BACKENDS), help=f"Database backend (default: {DEFAULT_BACKEND})")
+    parser.add_argument("--server", default=DEFAULT_SERVER, help=f"SQL Server name (default: {DEFAULT_SERVER})")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help=f"Database name, or database file for sqlite (default: {DEFAULT_DATABASE})")
+    parser.add_argument("--star-dir", help="Load the CSV files written by ImportOlxHousePrice.py --star-dir instead of a database")
+    parser.add_argument("--columnar-backend", default=DEFAULT_COLUMNAR_BACKEND, choices=["auto", "numpy", "array"], help=f"Column arrays, auto picks numpy when installed (default: {DEFAULT_COLUMNAR_BACKEND})")
+    parser.add_argument("--region", action="append", help="Region parameter of Prices in regions, repeat for several (default: all)")
+    parser.add_argument("--check", action="store_true", help="Compare every dataset with its .rdl CommandText and its FactOfferSnapshot scan run on the database (all regions, then each region)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query, best time is reported (default: 3)")
+    parser.add_argument("--bitmap-index", action="store_true", help="Answer the Region filter from roaring bitmaps of the fact keys instead of a scan")
+    parser.add_argument("--cache-size", type=int, default=0, help=f"Keep up to N results in an LRU cache dropped when the load generation changes, e.g. {DEFAULT_CACHE_SIZE} (default: 0, off)")
+    parser.add_argument("--passes", type=int, default=1, help="Answer every dataset N times, reloading the facts before a pass if a load committed since (default: 1)")
+
+    args = parser.parse_args()
+    sys.exit(main(args.backend, args.server, args.database, args.star_dir, args.columnar_backend, args.region,
+                  args.check, args.repeat, args.bitmap_index, args.cache_size, args.passes))